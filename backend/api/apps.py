@@ -1,5 +1,13 @@
 from django.apps import AppConfig
+from django.core import checks
 
 
 class ApiConfig(AppConfig):
     name = 'api'
+
+    def ready(self):
+        """Register system checks."""
+
+        from foodgram.middleware import check_shared_cache
+
+        checks.register(check_shared_cache, checks.Tags.caches)
@@ -0,0 +1,10 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class PreconditionFailed(APIException):
+    """The object has changed since the client has seen it."""
+
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'The recipe has been changed by someone else.'
+    default_code = 'precondition_failed'
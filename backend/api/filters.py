@@ -1,6 +1,9 @@
+from django.db.models import Q
 from django_filters import FilterSet, filters
 from django_filters.widgets import BooleanWidget
 
+POPULAR = 'popular'
+
 
 class RecipeFilter(FilterSet):
     """Required filters for RecipeViewSet."""
@@ -9,3 +12,29 @@ class RecipeFilter(FilterSet):
     is_favorited = filters.BooleanFilter(widget=BooleanWidget)
     is_in_shopping_cart = filters.BooleanFilter(widget=BooleanWidget)
     author = filters.AllValuesFilter(field_name='author__id')
+    ordering = filters.ChoiceFilter(
+        choices=((POPULAR, 'Most popular first'),), method='order'
+    )
+
+    def order(self, queryset, name, value):
+        """Most popular recipes first, newer ones on ties."""
+
+        return queryset.order_by('-popularity', '-pub_date')
+
+
+class UserFilter(FilterSet):
+    """Prefix search for CustomUserViewSet."""
+
+    search = filters.CharFilter(method='prefix')
+
+    def prefix(self, queryset, name, value):
+        """Users with the username, first or last name starting with it.
+
+        Case-insensitive, backed by UPPER() indexes on PostgreSQL.
+        """
+
+        return queryset.filter(
+            Q(username__istartswith=value)
+            | Q(first_name__istartswith=value)
+            | Q(last_name__istartswith=value)
+        )
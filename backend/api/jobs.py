@@ -0,0 +1,56 @@
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import File
+
+from api.recipebook import draw_recipe_book, get_recipe_book
+from api.utils import SHOPPING_CART_FILENAME, draw_pdf, get_grocery_list
+from jobs.bootstrap import in_pool
+from jobs.registry import register
+from recipes.purge import purge, recipe_steps, user_steps
+
+
+@register('shopping_cart_pdf')
+def shopping_cart_pdf(job):
+    """Render the user's shopping cart in a PDF format."""
+
+    return SHOPPING_CART_FILENAME, bytes(draw_pdf(get_grocery_list(job.user)))
+
+
+@register('recipe_book_pdf')
+def recipe_book_pdf(job):
+    """Render the user's favorite recipes as a book.
+
+    Workers of the run_jobs pool render the book by themselves, the pool
+    already spreads jobs over the cores and processes are not nested.
+    """
+
+    ofile = tempfile.NamedTemporaryFile()
+    workers = 1 if in_pool() else settings.RECIPE_BOOK_WORKERS
+    filename = draw_recipe_book(
+        get_recipe_book(job.user), ofile.name, workers
+    )
+    return filename, File(ofile)
+
+
+def run_purge(job, steps):
+    """Delete in batches, the rows deleted so far are the job progress."""
+
+    deleted = {}
+    for step, rows in purge(steps, settings.PURGE_BATCH_SIZE):
+        deleted[step] = deleted.get(step, 0) + rows
+        job.report(step=step, deleted=deleted)
+
+
+@register('purge_recipe')
+def purge_recipe(job):
+    """Delete a deactivated recipe and everything pointing to it."""
+
+    run_purge(job, recipe_steps(pk=job.params['pk']))
+
+
+@register('purge_user')
+def purge_user(job):
+    """Delete a deactivated user, their recipes and relations."""
+
+    run_purge(job, user_steps(job.params['pk']))
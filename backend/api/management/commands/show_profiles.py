@@ -0,0 +1,71 @@
+import io
+import os
+import pstats
+
+from django.core.management import BaseCommand, CommandError
+
+from foodgram.profiling import load, offenders, stats_path
+
+
+class Command(BaseCommand):
+    help = (
+        'List the routes which took the most time in the stored request '
+        'profiles, the slowest profiles of a route, or the functions of '
+        'a single profile.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('profile', nargs='?', help='Profile id.')
+        parser.add_argument(
+            '--route', help='Show the profiles of routes containing this.'
+        )
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument(
+            '--sort',
+            default='cumulative',
+            help='Sort order of the functions of a profile.',
+        )
+
+    def handle(self, *args, **options):
+        if options['profile']:
+            self.show_profile(options)
+        elif options['route'] is not None:
+            self.show_route(options)
+        else:
+            self.show_offenders(options)
+
+    def show_offenders(self, options):
+        profiles = load()
+        for row in offenders(profiles)[:options['limit']]:
+            self.stdout.write(
+                f'{row["seconds"]:8.3f}s  {row["count"]:5d} requests  '
+                f'max {row["max_seconds"]:.3f}s  '
+                f'{row["queries"]:7.1f} queries  '
+                f'{row["method"]} {row["route"]}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(profiles)} profiles stored.'
+        ))
+
+    def show_route(self, options):
+        profiles = [
+            profile for profile in load()
+            if options['route'] in profile['route']
+        ]
+        for profile in profiles[:options['limit']]:
+            self.stdout.write(
+                f'{profile["id"]}  {profile["seconds"]:8.3f}s  '
+                f'{profile["queries"]:5d} queries  {profile["status"]}  '
+                f'{profile["method"]} {profile["path"]}'
+            )
+
+    def show_profile(self, options):
+        path = stats_path(options['profile'])
+        if not os.path.exists(path):
+            raise CommandError(f'No profile {options["profile"]}.')
+        output = io.StringIO()
+        stats = pstats.Stats(path, stream=output)
+        stats.strip_dirs().sort_stats(options['sort']).print_stats(
+            options['limit']
+        )
+        self.stdout.write(output.getvalue())
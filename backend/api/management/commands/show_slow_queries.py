@@ -0,0 +1,62 @@
+import shutil
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+from foodgram.sqlstats import load, load_plan
+
+
+class Command(BaseCommand):
+    help = (
+        'List SQL fingerprints by total, p95 or count of their executions, '
+        'or show the captured EXPLAIN plan of one of them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('fingerprint', nargs='?', help='Fingerprint id.')
+        parser.add_argument(
+            '--sort', choices=('seconds', 'p95', 'count'), default='seconds'
+        )
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Delete the flushed stats and the captured plans.',
+        )
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            shutil.rmtree(settings.SQL_STATS_DIR, ignore_errors=True)
+            self.stdout.write(self.style.SUCCESS('SQL stats deleted.'))
+        elif options['fingerprint']:
+            self.show_plan(options['fingerprint'])
+        else:
+            self.show_stats(options)
+
+    def show_stats(self, options):
+        statements = sorted(
+            load(), key=lambda stats: -stats[options['sort']]
+        )
+        for stats in statements[:options['limit']]:
+            plan = '*' if load_plan(stats['id']) else ' '
+            self.stdout.write(
+                f'{stats["id"]}{plan} {stats["count"]:7d}  '
+                f'{stats["seconds"]:9.3f}s  '
+                f'p95 {stats["p95"] * 1000:8.1f}ms  '
+                f'max {stats["max"] * 1000:8.1f}ms  '
+                f'{stats["fingerprint"][:120]}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(statements)} fingerprints, * marks captured plans.'
+        ))
+
+    def show_plan(self, key_id):
+        captured = load_plan(key_id)
+        if captured is None:
+            raise CommandError(f'No plan captured for {key_id}.')
+        self.stdout.write(captured['fingerprint'])
+        self.stdout.write(
+            f'{captured["seconds"] * 1000:.1f}ms on {captured["alias"]}, '
+            f'params {captured["params"]}'
+        )
+        self.stdout.write(captured['plan'])
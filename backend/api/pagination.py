@@ -1,5 +1,14 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
 from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class PageLimitPagination(PageNumberPagination):
@@ -14,3 +23,71 @@ class RecipesLimitPagination(PageNumberPagination):
     page_size = settings.DEFAULT_RECIPES_LIMIT
     page_size_query_param = 'recipes_limit'
     page_query_param = None
+
+
+class UserCursorPagination(PageLimitPagination):
+    """Page numbers by default, a (username, id) keyset with a cursor.
+
+    An empty cursor query param starts from the first user, the next link
+    carries the position of the last user of the page. Nothing is
+    counted and no rows are skipped, so every page costs the same.
+    """
+
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        position = self.decode_cursor(
+            request.query_params[self.cursor_query_param]
+        )
+        if position is not None:
+            username, pk = position
+            queryset = queryset.filter(
+                Q(username__gt=username) | Q(username=username, id__gt=pk)
+            )
+        page_size = self.get_page_size(request)
+        rows = list(queryset.order_by('username', 'id')[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.rows = rows[:page_size]
+        return self.rows
+
+    def decode_cursor(self, cursor):
+        """Username and id encoded in the cursor, None for the start."""
+
+        if not cursor:
+            return None
+        try:
+            username, pk = json.loads(base64.urlsafe_b64decode(cursor))
+            return str(username), int(pk)
+        except (binascii.Error, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, user):
+        """Cursor pointing right after the user."""
+
+        return base64.urlsafe_b64encode(
+            json.dumps([user.username, user.id]).encode()
+        ).decode()
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.rows[-1]),
+        )
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict((
+            ('next', self.get_next_link()),
+            ('results', data),
+        )))
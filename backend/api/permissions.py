@@ -21,4 +21,8 @@ class IsAuthorizedOrListCreateOnly(permissions.BasePermission):
         )
 
     def has_object_permission(self, request, view, obj):
-        return request.user.is_authenticated
+        return request.user.is_authenticated and (
+            request.method != 'DELETE'
+            or obj == request.user
+            or request.user.is_staff
+        )
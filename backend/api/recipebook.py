@@ -0,0 +1,247 @@
+import hashlib
+import os
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from typing import Iterable, List, NamedTuple, Optional
+
+from django.conf import settings
+from django.db.models import Prefetch
+from fpdf import FPDF
+from PIL import Image
+
+from api.utils import ShoppingCartItem
+from recipes.models import Recipe, RecipeIngredient
+from users.models import User
+
+RECIPE_BOOK_FILENAME = 'RecipeBook.pdf'
+RECIPE_BOOK_ARCHIVE_FILENAME = 'RecipeBook.zip'
+
+
+class RecipeBookEntry(NamedTuple):
+    name: str
+    author: str
+    cooking_time: int
+    text: str
+    image: Optional[str]
+    ingredients: List[ShoppingCartItem]
+
+
+def prepare_image(path: Optional[str], cache_dir: str, max_size: int):
+    """Downscale an image to a cached JPEG, return the cached path.
+
+    The cache key depends on the file modification time and size, so
+    replaced images are picked up. Missing images give None.
+    """
+
+    if not path or not os.path.isfile(path):
+        return None
+    stat = os.stat(path)
+    key = hashlib.sha1(
+        f'{path}:{stat.st_mtime_ns}:{stat.st_size}:{max_size}'.encode()
+    ).hexdigest()
+    cached = os.path.join(cache_dir, f'{key}.jpg')
+    if not os.path.exists(cached):
+        with Image.open(path) as image:
+            image = image.convert('RGB')
+            image.thumbnail((max_size, max_size))
+            tmp_path = f'{cached}.{os.getpid()}.tmp'
+            image.save(tmp_path, 'JPEG', quality=85, optimize=True)
+        os.replace(tmp_path, cached)
+    return cached
+
+
+def prepare_images(
+    paths: Iterable[Optional[str]], workers: int = 0
+) -> List[Optional[str]]:
+    """Prepare images in chunks over a process pool (or inline)."""
+
+    paths = list(paths)
+    cache_dir = os.path.join(settings.MEDIA_ROOT, 'cache', 'recipebook')
+    os.makedirs(cache_dir, exist_ok=True)
+    args = (
+        paths,
+        [cache_dir] * len(paths),
+        [settings.RECIPE_BOOK_IMAGE_SIZE] * len(paths),
+    )
+    if workers < 2 or len(paths) < 2:
+        return list(map(prepare_image, *args))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(
+            prepare_image, *args,
+            chunksize=max(1, len(paths) // (workers * 4)),
+        ))
+
+
+class RecipeBookPDF:
+    """A printable book of recipes, one recipe per page."""
+
+    fonts_dir = f'{settings.STATIC_ROOT}/fonts'
+    default_format = 'a4'
+    default_font = 'DejaVuSans.ttf'
+    default_bold_font = 'DejaVuSansCondensed-Bold.ttf'
+    title_increment = 8
+    image_height_ratio = 0.4
+    line_height_ratio = 0.6
+
+    def __init__(self, font_size=11) -> None:
+        """Initialization and setup."""
+
+        self.font_size = font_size
+        self.line_h = font_size * self.line_height_ratio
+        self.pdf = FPDF(format=self.default_format)
+        self.pdf.set_auto_page_break(True, margin=15)
+        self.pdf.add_font(
+            'Regular', uni=True, fname=f'{self.fonts_dir}/{self.default_font}'
+        )
+        self.pdf.add_font(
+            'Bold',
+            uni=True,
+            fname=f'{self.fonts_dir}/{self.default_bold_font}',
+        )
+
+    def __repr__(self) -> str:
+        return 'Recipe book PDF'
+
+    def _paragraph(self, text: str, height: float, **kwargs) -> None:
+        self.pdf.multi_cell(
+            0, height, text, new_x='LMARGIN', new_y='NEXT', **kwargs
+        )
+
+    def _render_image(self, path: str) -> None:
+        with Image.open(path) as image:
+            width, height = image.size
+        max_h = self.pdf.eph * self.image_height_ratio
+        img_h = min(max_h, self.pdf.epw * height / width)
+        img_w = img_h * width / height
+        self.pdf.image(path, x=(self.pdf.w - img_w) / 2, h=img_h)
+        self.pdf.ln(self.line_h)
+
+    def add_recipe(self, entry: RecipeBookEntry) -> None:
+        """Render a recipe on a new page."""
+
+        self.pdf.add_page()
+        self.pdf.set_font('Bold', size=self.font_size + self.title_increment)
+        self._paragraph(entry.name, self.line_h * 2, align='C')
+        self.pdf.set_font('Regular', size=self.font_size)
+        self._paragraph(
+            f'by {entry.author}, {entry.cooking_time} min.',
+            self.line_h * 2,
+            align='C',
+        )
+        if entry.image:
+            self._render_image(entry.image)
+        self.pdf.set_font('Bold', size=self.font_size + 2)
+        self._paragraph('Ingredients', self.line_h * 2)
+        self.pdf.set_font('Regular', size=self.font_size)
+        for item in entry.ingredients:
+            self._paragraph(
+                f'•  {item.name} — {item.amount} {item.measurement_unit}',
+                self.line_h * 1.5,
+            )
+        self.pdf.ln(self.line_h)
+        self.pdf.set_font('Bold', size=self.font_size + 2)
+        self._paragraph('Instructions', self.line_h * 2)
+        self.pdf.set_font('Regular', size=self.font_size)
+        self._paragraph(entry.text, self.line_h * 1.5, align='L')
+
+    def output(self, path: str) -> None:
+        """Write the book into a file."""
+
+        self.pdf.output(path)
+
+
+def get_recipe_book(user: User) -> List[RecipeBookEntry]:
+    """User's visible favorites with their ingredients in two queries."""
+
+    recipes = Recipe.objects.visible().filter(
+        favorites__user=user
+    ).select_related('author').prefetch_related(Prefetch(
+        'recipeingredients',
+        RecipeIngredient.objects.select_related('ingredient').order_by(
+            'ingredient__name'
+        ),
+    )).order_by('name')
+    return [
+        RecipeBookEntry(
+            recipe.name,
+            recipe.author.get_full_name() or recipe.author.username,
+            recipe.cooking_time,
+            recipe.text,
+            recipe.image.path if recipe.image else None,
+            [
+                ShoppingCartItem(
+                    row.ingredient.name,
+                    row.ingredient.measurement_unit,
+                    row.amount,
+                )
+                for row in recipe.recipeingredients.all()
+            ],
+        )
+        for recipe in recipes
+    ]
+
+
+def lay_out(
+    entries: List[RecipeBookEntry], images: List[Optional[str]], path: str
+) -> str:
+    """Lay recipes with their prepared images out into a PDF file."""
+
+    pdf = RecipeBookPDF()
+    for entry, image in zip(entries, images):
+        pdf.add_recipe(entry._replace(image=image))
+    pdf.output(path)
+    return path
+
+
+def draw_volume(entries: List[RecipeBookEntry], path: str) -> str:
+    """Render a volume of a big book, images are prepared inline."""
+
+    return lay_out(
+        entries, prepare_images(entry.image for entry in entries), path
+    )
+
+
+def draw_recipe_book(
+    entries: List[RecipeBookEntry], path: str, workers: int = 0
+) -> str:
+    """Render a recipe book into a file, return its download name.
+
+    fpdf2 keeps a whole document in memory until it is written, so books
+    of more than RECIPE_BOOK_VOLUME_SIZE recipes are split into volumes,
+    rendered concurrently in a process pool and stored in a zip file.
+    A process holds one volume at most. Smaller books are a single PDF,
+    with their images prepared in the pool. With fewer than two workers
+    everything is rendered in this process, one volume at a time.
+    """
+
+    size = settings.RECIPE_BOOK_VOLUME_SIZE
+    if len(entries) <= size:
+        lay_out(
+            entries,
+            prepare_images((entry.image for entry in entries), workers),
+            path,
+        )
+        return RECIPE_BOOK_FILENAME
+    volumes = [
+        entries[start:start + size] for start in range(0, len(entries), size)
+    ]
+    workers = min(workers, len(volumes))
+    with ExitStack() as stack:
+        tmp_dir = stack.enter_context(tempfile.TemporaryDirectory())
+        archive = stack.enter_context(zipfile.ZipFile(path, 'w'))
+        paths = [
+            os.path.join(tmp_dir, f'RecipeBook-{number:03d}.pdf')
+            for number in range(1, len(volumes) + 1)
+        ]
+        if workers < 2:
+            rendered = map(draw_volume, volumes, paths)
+        else:
+            rendered = stack.enter_context(
+                ProcessPoolExecutor(max_workers=workers)
+            ).map(draw_volume, volumes, paths)
+        for volume in rendered:
+            archive.write(volume, os.path.basename(volume))
+            os.remove(volume)
+    return RECIPE_BOOK_ARCHIVE_FILENAME
@@ -1,5 +1,7 @@
+from api.serializers.batches import BatchSerializer
 from api.serializers.favorites import FavoriteSerializer
 from api.serializers.ingredients import IngredientSerializer
+from api.serializers.jobs import JobSerializer
 from api.serializers.recipeingredients import RecipeIngredientSerializer
 from api.serializers.recipes import RecipeMiniSerializer, RecipeSerializer
 from api.serializers.shoppingcarts import ShoppingCartSerializer
@@ -8,9 +10,11 @@ from api.serializers.tags import TagSerializer
 from api.serializers.users import CustomUserSerializer
 
 __all__ = (
+    'BatchSerializer',
     'TagSerializer',
     'FavoriteSerializer',
     'IngredientSerializer',
+    'JobSerializer',
     'RecipeSerializer',
     'RecipeMiniSerializer',
     'RecipeIngredientSerializer',
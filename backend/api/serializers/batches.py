@@ -0,0 +1,12 @@
+from django.conf import settings
+from rest_framework import serializers
+
+
+class BatchSerializer(serializers.Serializer):
+    """Serializer for lists of ids sent to batch endpoints."""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BATCH_MAX_SIZE,
+    )
@@ -1,5 +1,4 @@
 from rest_framework import serializers
-from rest_framework.validators import UniqueTogetherValidator
 
 from api.serializers.fields import Base64ImageField
 from recipes.models import Favorite, Recipe
@@ -9,6 +8,8 @@ from users.models import User
 class FavoriteSerializer(serializers.ModelSerializer):
     """Serializer for the Favorite model."""
 
+    conflict_message = 'You have already favorited this recipe.'
+
     name = serializers.CharField(source='recipe.name', read_only=True)
     cooking_time = serializers.IntegerField(
         source='recipe.cooking_time', read_only=True
@@ -32,10 +33,3 @@ class FavoriteSerializer(serializers.ModelSerializer):
             'user',
             'recipe',
         )
-        validators = (
-            UniqueTogetherValidator(
-                queryset=Favorite.objects.all(),
-                fields=('user', 'recipe'),
-                message='You have already favorited this recipe.',
-            ),
-        )
@@ -3,6 +3,7 @@ import datetime
 
 from django.core.files.base import ContentFile
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
 
 from api.serializers.tags import TagSerializer
 
@@ -28,8 +29,48 @@ class Base64ImageField(serializers.ImageField):
         return self.context['request'].build_absolute_uri(value.url)
 
 
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """Many related field resolving all the ids in a single query."""
+
+    def to_internal_value(self, data):
+        """Validate the ids and fetch the objects with one IN query."""
+
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        child = self.child_relation
+        ids = []
+        for pk in data:
+            if isinstance(pk, bool):
+                child.fail('incorrect_type', data_type=type(pk).__name__)
+            try:
+                ids.append(int(pk))
+            except (TypeError, ValueError):
+                child.fail('incorrect_type', data_type=type(pk).__name__)
+        ids = list(dict.fromkeys(ids))
+        found = child.get_queryset().in_bulk(ids)
+        missing = [pk for pk in ids if pk not in found]
+        if missing:
+            raise serializers.ValidationError([
+                child.error_messages['does_not_exist'].format(pk_value=pk)
+                for pk in missing
+            ])
+        return [found[pk] for pk in ids]
+
+
 class TagRelatedField(serializers.PrimaryKeyRelatedField):
     """Custom representation field for tags in recipes."""
 
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        """Use a bulk many related field for lists of tags."""
+
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
     def to_representation(self, value):
         return TagSerializer(instance=value).data
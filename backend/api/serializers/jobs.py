@@ -0,0 +1,43 @@
+import json
+
+from rest_framework import serializers
+from rest_framework.reverse import reverse
+
+from jobs.models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """Serializer for the Job model."""
+
+    result = serializers.SerializerMethodField()
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = (
+            'id',
+            'kind',
+            'status',
+            'created',
+            'finished',
+            'expires',
+            'result',
+            'progress',
+        )
+        read_only_fields = fields
+
+    def get_result(self, job):
+        """Download url of a finished job result."""
+
+        if job.status != Job.DONE or not job.result:
+            return None
+        return reverse(
+            'jobs-result',
+            kwargs={'pk': job.pk},
+            request=self.context['request'],
+        )
+
+    def get_progress(self, job):
+        """What a running job has done so far."""
+
+        return json.loads(job.progress)
@@ -1,15 +1,13 @@
 from rest_framework import serializers
 from rest_framework.serializers import ValidationError
 
-from recipes.models import Ingredient, RecipeIngredient
+from recipes.models import RecipeIngredient
 
 
 class RecipeIngredientSerializer(serializers.ModelSerializer):
     """Serializer for the RecipeIngredient model."""
 
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all().values_list('id', flat=True)
-    )
+    id = serializers.IntegerField(min_value=1)
     name = serializers.StringRelatedField(
         read_only=True, source='ingredient.name'
     )
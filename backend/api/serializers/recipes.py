@@ -1,11 +1,16 @@
+from collections import Counter
+
 from django.db import transaction
+from django.db.models import F
 from rest_framework import serializers
 from rest_framework.serializers import ValidationError
 
+from api.exceptions import PreconditionFailed
 from api.serializers.fields import Base64ImageField, TagRelatedField
 from api.serializers.recipeingredients import RecipeIngredientSerializer
 from api.serializers.users import CustomUserSerializer
-from recipes.models import Recipe, RecipeIngredient, Tag
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.similarity import index
 
 
 class RecipeSerializer(serializers.ModelSerializer):
@@ -21,6 +26,9 @@ class RecipeSerializer(serializers.ModelSerializer):
         read_only=True, default=False
     )
     author = CustomUserSerializer(read_only=True)
+    version = serializers.IntegerField(
+        write_only=True, required=False, min_value=1
+    )
 
     class Meta:
         model = Recipe
@@ -35,6 +43,7 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'cooking_time',
+            'version',
         )
 
     def __init__(self, instance=None, **kwargs):
@@ -52,10 +61,26 @@ class RecipeSerializer(serializers.ModelSerializer):
         return data
 
     def validate_ingredients(self, data):
-        """Tags validation."""
+        """Ingredients validation, all ids are resolved in one query."""
 
         if not data:
             raise ValidationError('Ingredients list cannot be empty.')
+        ids = [item['id'] for item in data]
+        duplicates = sorted(
+            pk for pk, count in Counter(ids).items() if count > 1
+        )
+        if duplicates:
+            raise ValidationError(
+                f'Duplicate ingredients: {", ".join(map(str, duplicates))}.'
+            )
+        found = Ingredient.objects.in_bulk(ids)
+        missing = [pk for pk in ids if pk not in found]
+        if missing:
+            raise ValidationError(
+                f'Ingredients do not exist: {", ".join(map(str, missing))}.'
+            )
+        for item in data:
+            item['ingredient'] = found[item['id']]
         return data
 
     def _stash_data(self, data):
@@ -65,33 +90,86 @@ class RecipeSerializer(serializers.ModelSerializer):
         self._ingredients = data.pop('recipeingredients')
 
     def _apply_data(self, recipe):
-        """Extra fields processing."""
+        """Extra fields processing.
+
+        Ingredients are diffed against the current rows, so only new
+        ones are inserted, changed amounts updated and the rest deleted.
+        The similarity index is updated when the set of ingredients has
+        changed.
+        """
 
         recipe.tags.set(self._tags)
-        recipe_ingredients = [
+        amounts = {
+            item['id']: item['amount'] for item in self._ingredients
+        }
+        current = {
+            row.ingredient_id: row for row in recipe.recipeingredients.all()
+        }
+        stale = current.keys() - amounts.keys()
+        if stale:
+            recipe.recipeingredients.filter(ingredient_id__in=stale).delete()
+        changed = []
+        for ingredient_id, row in current.items():
+            amount = amounts.get(ingredient_id, row.amount)
+            if row.amount != amount:
+                row.amount = amount
+                changed.append(row)
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ('amount',))
+        new = [
             RecipeIngredient(
-                ingredient_id=ingredient['id'],
                 recipe=recipe,
-                amount=ingredient['amount'],
+                ingredient=item['ingredient'],
+                amount=item['amount'],
             )
-            for ingredient in self._ingredients
+            for item in self._ingredients
+            if item['id'] not in current
         ]
-        with transaction.atomic():
-            recipe.recipeingredients.all().delete()
-            RecipeIngredient.objects.bulk_create(recipe_ingredients)
+        if new:
+            RecipeIngredient.objects.bulk_create(new)
+        if stale or new:
+            index({recipe.id: amounts.keys()})
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """An upgraded update method."""
 
         self._stash_data(validated_data)
+        versions = validated_data.pop('versions', None)
+        if 'version' in validated_data:
+            versions = [validated_data.pop('version')]
+        if versions is None:
+            instance.version = F('version') + 1
+        else:
+            self._claim_version(instance, versions)
         super().update(instance, validated_data)
         self._apply_data(instance)
+        if versions is None:
+            instance.refresh_from_db(fields=('version',))
         return instance
 
+    def _claim_version(self, instance, versions):
+        """Bump the version if it is still one of the expected ones.
+
+        A conditional UPDATE, so a concurrent writer fails fast instead
+        of waiting for a lock taken before the request was validated.
+        """
+
+        if not Recipe.objects.filter(
+            pk=instance.pk, version__in=versions
+        ).update(version=F('version') + 1):
+            raise PreconditionFailed
+        if len(versions) == 1:
+            instance.version = versions[0] + 1
+        else:
+            instance.refresh_from_db(fields=('version',))
+
+    @transaction.atomic
     def create(self, validated_data):
         """An upgraded create method."""
 
         self._stash_data(validated_data)
+        validated_data.pop('version', None)
         recipe = Recipe.objects.create(**validated_data)
         self._apply_data(recipe)
         return recipe
@@ -1,5 +1,4 @@
 from rest_framework import serializers
-from rest_framework.serializers import ValidationError
 
 from api.serializers.recipes import RecipeMiniSerializer
 from recipes.models import ShoppingCart
@@ -8,19 +7,12 @@ from recipes.models import ShoppingCart
 class ShoppingCartSerializer(serializers.ModelSerializer):
     """Serializer for the ShoppingCart model."""
 
+    conflict_message = 'This recipe is already in the shopping cart.'
+
     class Meta:
         model = ShoppingCart
         fields = ('recipe', 'user')
 
-    def validate(self, data):
-        """Isn't this recipe already in a shopping cart?"""
-
-        if not ShoppingCart.objects.filter(
-            user=data['user'], recipe=data['recipe']
-        ).exists():
-            return data
-        raise ValidationError('This recipe is already in the shopping cart.')
-
     def to_representation(self, instance):
         """Let's serialize the cart object as requested."""
 
@@ -1,17 +1,23 @@
+from django.db.models import OuterRef, Prefetch, Subquery
 from rest_framework import serializers
-from rest_framework.validators import UniqueTogetherValidator
 
 from api.pagination import RecipesLimitPagination
 from api.serializers import RecipeMiniSerializer
+from recipes.models import Recipe
 from users.models import Subscription
 
 
 class SubscriptionSerializer(serializers.ModelSerializer):
     """Serializer for the Subscription model."""
 
+    conflict_message = 'You can only subscribe once.'
+    forbidden_message = 'Say no to self-subscriptions.'
+
     email = serializers.EmailField(source='author.email', read_only=True)
     id = serializers.IntegerField(source='author.id', read_only=True)
-    recipes_count = serializers.IntegerField(read_only=True)
+    recipes_count = serializers.IntegerField(
+        source='author.recipes_count', read_only=True
+    )
     username = serializers.CharField(source='author.username', read_only=True)
     recipes = serializers.SerializerMethodField()
     first_name = serializers.CharField(
@@ -42,13 +48,6 @@ class SubscriptionSerializer(serializers.ModelSerializer):
             'author': {'write_only': True},
         }
         model = Subscription
-        validators = (
-            UniqueTogetherValidator(
-                queryset=Subscription.objects.all(),
-                fields=('user', 'author'),
-                message='You can only subscribe once.',
-            ),
-        )
 
     def to_representation(self, instance):
         """Return correct unannotated fields upon subscription."""
@@ -56,24 +55,40 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         data = super().to_representation(instance)
         if self.context['request'].method == 'POST':
             data['is_subscribed'] = True
-            data['recipes_count'] = self.instance.author.recipes.count()
         return data
 
-    def validate_author(self, value):
-        """Author field validation."""
+    @staticmethod
+    def latest_recipes(request):
+        """Prefetch of the latest recipes of every author in one query.
 
-        if self.context['request'].user == value:
-            raise serializers.ValidationError('Say no to self-subscriptions.')
-        return value
+        Sliced prefetches are not supported, so the recipes are limited
+        per author by a correlated subquery.
+        """
+
+        limit = RecipesLimitPagination().get_page_size(request)
+        latest = Recipe.objects.filter(
+            author=OuterRef('author'), is_active=True
+        ).order_by('-pub_date').values('pk')[:limit]
+        return Prefetch(
+            'author__recipes',
+            queryset=Recipe.objects.filter(
+                pk__in=Subquery(latest)
+            ).order_by('-pub_date'),
+            to_attr='latest_recipes',
+        )
 
     def get_recipes(self, subscription):
         """Nested recipes serializer with recipes_limit arg."""
 
-        paginator = RecipesLimitPagination()
-        queryset = subscription.author.recipes.order_by('-pub_date')
-        page = paginator.paginate_queryset(
-            queryset, request=self.context['request']
-        )
+        page = getattr(subscription.author, 'latest_recipes', None)
+        if page is None:
+            paginator = RecipesLimitPagination()
+            page = paginator.paginate_queryset(
+                subscription.author.recipes.filter(
+                    is_active=True
+                ).order_by('-pub_date'),
+                request=self.context['request'],
+            )
         serializer = RecipeMiniSerializer(
             many=True,
             instance=page,
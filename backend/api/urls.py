@@ -2,7 +2,8 @@ from django.urls import include, path
 from djoser.views import UserViewSet
 from rest_framework.routers import DefaultRouter
 
-from api.views import (CustomUserViewSet, IngredientViewSet, RecipeViewSet,
+from api.views import (CustomUserViewSet, DatabaseMetricsView,
+                       IngredientViewSet, JobViewSet, RecipeViewSet,
                        TagViewSet)
 
 router = DefaultRouter()
@@ -11,6 +12,7 @@ router.register('users', CustomUserViewSet, basename='users')
 router.register('tags', TagViewSet, basename='tags')
 router.register('ingredients', IngredientViewSet, basename='ingredients')
 router.register('recipes', RecipeViewSet, basename='recipes')
+router.register('jobs', JobViewSet, basename='jobs')
 
 djoser_urlpatterns = [
     path('auth/', include('djoser.urls.authtoken')),
@@ -24,5 +26,6 @@ djoser_urlpatterns = [
 
 urlpatterns = [
     path('', include(djoser_urlpatterns)),
+    path('metrics/db/', DatabaseMetricsView.as_view(), name='metrics-db'),
     path('', include(router.urls)),
 ]
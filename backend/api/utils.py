@@ -8,6 +8,8 @@ from fpdf import FPDF
 from recipes.models import RecipeIngredient
 from users.models import User
 
+SHOPPING_CART_FILENAME = 'ShoppingCart.pdf'
+
 
 class ShoppingCartItem(NamedTuple):
     name: str
@@ -1,12 +1,16 @@
 from api.views.handlers import custom404
 from api.views.ingredients import IngredientViewSet
+from api.views.jobs import JobViewSet
+from api.views.metrics import DatabaseMetricsView
 from api.views.recipes import RecipeViewSet
 from api.views.tags import TagViewSet
 from api.views.users import CustomUserViewSet
 
 __all__ = (
     'custom404',
+    'DatabaseMetricsView',
     'IngredientViewSet',
+    'JobViewSet',
     'RecipeViewSet',
     'TagViewSet',
     'CustomUserViewSet',
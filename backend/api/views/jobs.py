@@ -0,0 +1,34 @@
+import os
+
+from django.http import FileResponse, Http404
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.viewsets import ReadOnlyModelViewSet
+
+from api.serializers import JobSerializer
+from jobs.models import Job
+
+
+class JobViewSet(ReadOnlyModelViewSet):
+    """Viewset for the background jobs of the current user."""
+
+    serializer_class = JobSerializer
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        """Only the user's own jobs."""
+
+        return Job.objects.filter(user=self.request.user)
+
+    @action(detail=True)
+    def result(self, request, pk):
+        """Download the result of a finished job."""
+
+        job = self.get_object()
+        if job.status != Job.DONE or not job.result:
+            raise Http404
+        return FileResponse(
+            job.result.open('rb'),
+            as_attachment=True,
+            filename=os.path.basename(job.result.name),
+        )
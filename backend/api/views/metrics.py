@@ -0,0 +1,24 @@
+from django.conf import settings
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from foodgram.routers import query_metrics
+
+
+class DatabaseMetricsView(APIView):
+    """Per database alias query metrics.
+
+    Counters live in the memory of the worker which serves the request,
+    so with several workers every response shows one process only.
+    """
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        """Queries, errors and seconds spent per alias."""
+
+        return Response({
+            'replicas': settings.DATABASE_REPLICAS,
+            'databases': query_metrics(),
+        })
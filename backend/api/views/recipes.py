@@ -1,27 +1,43 @@
 import io
+import tempfile
 
+from django.conf import settings
+from django.core.cache import cache
 from django.db.models import Exists, OuterRef, Prefetch
-from django.http import HttpResponse
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_etags
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 
+from api.exceptions import PreconditionFailed
 from api.filters import RecipeFilter
 from api.permissions import IsAuthorOrObjectReadOnly
-from api.serializers import (FavoriteSerializer, RecipeSerializer,
+from api.recipebook import (RECIPE_BOOK_FILENAME, draw_recipe_book,
+                            get_recipe_book)
+from api.serializers import (FavoriteSerializer, JobSerializer,
+                             RecipeMiniSerializer, RecipeSerializer,
                              ShoppingCartSerializer)
-from api.utils import draw_pdf, get_grocery_list
+from api.utils import SHOPPING_CART_FILENAME, draw_pdf, get_grocery_list
 from api.views.viewsets import CustomModelViewsSet
+from jobs.models import Job
+from recipes.catalogs import last_change
+from recipes.feeds import Timeline, fan_out
 from recipes.models import Favorite, Recipe, ShoppingCart
+from recipes.popularity import bump
+from recipes.purge import deactivate_recipe
+from recipes.similarity import nearest
 from users.models import Subscription, User
 
 
 class RecipeViewSet(CustomModelViewsSet):
     """Viewset for recipes."""
 
-    shopping_cart_filename = 'ShoppingCart.pdf'
+    shopping_cart_filename = SHOPPING_CART_FILENAME
     serializer_class = RecipeSerializer
     permission_classes = (IsAuthorOrObjectReadOnly,)
     filter_backends = (DjangoFilterBackend,)
@@ -32,13 +48,38 @@ class RecipeViewSet(CustomModelViewsSet):
     def shopping_cart(self, request, pk):
         """Add a recipe to the shopping cart."""
 
-        return self.generic_create(ShoppingCartSerializer, Recipe, 'recipe')
+        return self.generic_create(
+            ShoppingCartSerializer, ShoppingCart, Recipe.objects.visible(),
+            'recipe',
+        )
 
     @shopping_cart.mapping.delete
     def delete_shopping_cart(self, request, pk):
         """Delete a recipe from the shopping cart."""
 
-        return self.generic_delete(ShoppingCart, Recipe, 'recipe')
+        return self.generic_delete(ShoppingCart, 'recipe')
+
+    @action(
+        ('post',),
+        detail=False,
+        url_path='shopping_cart',
+        url_name='shopping-cart-batch',
+        permission_classes=(IsAuthenticated,),
+    )
+    def shopping_cart_batch(self, request):
+        """Add a list of recipes to the shopping cart."""
+
+        return self.generic_batch(
+            ShoppingCart, Recipe.objects.visible(), 'recipe'
+        )
+
+    @shopping_cart_batch.mapping.delete
+    def delete_shopping_cart_batch(self, request):
+        """Delete a list of recipes from the shopping cart."""
+
+        return self.generic_batch(
+            ShoppingCart, Recipe.objects.visible(), 'recipe'
+        )
 
     @action(detail=False)
     def download_shopping_cart(self, request):
@@ -49,6 +90,8 @@ class RecipeViewSet(CustomModelViewsSet):
             return Response(
                 'The shopping list is empty', status=status.HTTP_204_NO_CONTENT
             )
+        if len(data) > settings.INLINE_EXPORT_MAX_ITEMS:
+            return self.enqueue_export('shopping_cart_pdf')
         buffer = io.BytesIO(bytes(draw_pdf(data)))
         response = HttpResponse(buffer, content_type='application/pdf')
         response[
@@ -56,22 +99,222 @@ class RecipeViewSet(CustomModelViewsSet):
         ] = f'attachment; filename={self.shopping_cart_filename}'
         return response
 
+    @action(detail=False, permission_classes=(IsAuthenticated,))
+    def download_favorites(self, request):
+        """Download favorite recipes as a PDF book."""
+
+        entries = get_recipe_book(request.user)
+        if not entries:
+            return Response(
+                'There are no favorite recipes',
+                status=status.HTTP_204_NO_CONTENT,
+            )
+        if len(entries) > settings.RECIPE_BOOK_INLINE_MAX:
+            return self.enqueue_export('recipe_book_pdf')
+        ofile = tempfile.NamedTemporaryFile(suffix='.pdf')
+        draw_recipe_book(entries, ofile.name)
+        return FileResponse(
+            ofile,
+            as_attachment=True,
+            filename=RECIPE_BOOK_FILENAME,
+            content_type='application/pdf',
+        )
+
+    def enqueue_export(self, kind, **payload):
+        """Queue an export job, answer with its status."""
+
+        job = Job.objects.enqueue(kind, self.request.user, **payload)
+        data = JobSerializer(job, context={'request': self.request}).data
+        return Response(
+            data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': reverse(
+                'jobs-detail', kwargs={'pk': job.pk}, request=self.request
+            )},
+        )
+
+    @action(detail=True)
+    def recommendations(self, request, pk):
+        """Recipes favorited by the same people, most similar first.
+
+        Recommendations are precomputed by build_recommendations, this
+        is a single query.
+        """
+
+        try:
+            recipes = Recipe.objects.visible().filter(
+                recommended_for__recipe_id=int(pk)
+            ).order_by('-recommended_for__score', 'id')
+        except ValueError:
+            raise Http404
+        serializer = RecipeMiniSerializer(
+            recipes, many=True, context=self.get_serializer_context()
+        )
+        return Response(serializer.data)
+
+    @action(detail=True)
+    def similar(self, request, pk):
+        """Recipes with the most similar ingredients, approximately."""
+
+        try:
+            ranked = nearest(int(pk), settings.SIMILARITY_TOP_K)
+        except ValueError:
+            raise Http404
+        recipes = Recipe.objects.visible().in_bulk(
+            [pk for pk, _ in ranked]
+        )
+        serializer = RecipeMiniSerializer(
+            [recipes[pk] for pk, _ in ranked if pk in recipes],
+            many=True,
+            context=self.get_serializer_context(),
+        )
+        return Response(serializer.data)
+
     @action(('post',), detail=True)
     def favorite(self, request, pk):
         """Add a recipe to favorites."""
 
-        return self.generic_create(FavoriteSerializer, Recipe, 'recipe')
+        return self.generic_create(
+            FavoriteSerializer, Favorite, Recipe.objects.visible(), 'recipe'
+        )
 
     @favorite.mapping.delete
     def delete_favorite(self, request, pk):
         """Delete from favorites."""
 
-        return self.generic_delete(Favorite, Recipe, 'recipe')
+        return self.generic_delete(Favorite, 'recipe')
+
+    @action(
+        ('post',),
+        detail=False,
+        url_path='favorite',
+        url_name='favorite-batch',
+        permission_classes=(IsAuthenticated,),
+    )
+    def favorite_batch(self, request):
+        """Add a list of recipes to favorites."""
+
+        return self.generic_batch(
+            Favorite, Recipe.objects.visible(), 'recipe'
+        )
+
+    @favorite_batch.mapping.delete
+    def delete_favorite_batch(self, request):
+        """Delete a list of recipes from favorites."""
+
+        return self.generic_batch(
+            Favorite, Recipe.objects.visible(), 'recipe'
+        )
+
+    def relations_changed(self, klass, ids, added):
+        """Drop cached favorites counters, update popularity scores."""
+
+        super().relations_changed(klass, ids, added)
+        if klass is Favorite:
+            cache.delete_many([Recipe.favorited_cache_key(pk) for pk in ids])
+        if klass in (Favorite, ShoppingCart):
+            bump(klass, ids, added)
+
+    def recipe_validators(self, version, modified, catalog, author):
+        """ETag and Last-Modified of a recipe as seen by the user.
+
+        The author, tags and ingredients are embedded, so the last change
+        of the author and of the catalogs is mixed in. Favorited and
+        shopping cart flags are part of the representation too, so for
+        authenticated users the stamp of their relations is mixed in.
+        """
+
+        catalog = catalog.timestamp() if catalog else 0.0
+        author = author.timestamp()
+        etag = f'{version}-{catalog:.6f}-{author:.6f}'
+        last_modified = max(modified.timestamp(), catalog, author)
+        stamp = self.relations_stamp(self.request.user)
+        if stamp is not None:
+            etag = f'{etag}-{stamp:.6f}'
+            last_modified = max(last_modified, stamp)
+        return f'"{etag}"', int(last_modified)
+
+    @staticmethod
+    def validator_values(queryset):
+        """Version and change times of a recipe, its author and catalogs."""
+
+        return queryset.annotate(catalog=last_change()).values_list(
+            'version', 'modified', 'catalog', 'author__modified'
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        """Recipe details, 304 if the client copy is still valid."""
+
+        try:
+            current = self.validator_values(
+                Recipe.objects.visible().filter(pk=int(kwargs['pk']))
+            ).first()
+        except ValueError:
+            current = None
+        if current is None:
+            raise Http404
+        etag, last_modified = self.recipe_validators(*current)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def perform_update(self, serializer):
+        """Update a recipe, If-Match makes the update conditional."""
+
+        if_match = self.request.META.get('HTTP_IF_MATCH')
+        if if_match is None or if_match.strip() == '*':
+            return serializer.save()
+        try:
+            versions = [
+                int(etag.replace('W/', '', 1).strip('"').split('-')[0])
+                for etag in parse_etags(if_match)
+            ]
+        except ValueError:
+            raise PreconditionFailed
+        return serializer.save(versions=versions)
+
+    def update(self, request, *args, **kwargs):
+        """Update a recipe and return its new validators."""
+
+        response = super().update(request, *args, **kwargs)
+        recipe = self.validator_values(Recipe.objects).get(pk=kwargs['pk'])
+        etag, last_modified = self.recipe_validators(*recipe)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
 
     def perform_create(self, serializer):
-        """Create a recipe."""
+        """Create a recipe and push it into the followers feeds."""
 
-        return serializer.save(author=self.request.user)
+        recipe = serializer.save(author=self.request.user)
+        fan_out(recipe)
+        return recipe
+
+    def destroy(self, request, *args, **kwargs):
+        """Hide the recipe at once, a job deletes it with its relations."""
+
+        recipe = self.get_object()
+        deactivate_recipe(recipe)
+        return self.purge_later('purge_recipe', recipe)
+
+    @action(detail=False, permission_classes=(IsAuthenticated,))
+    def feed(self, request):
+        """Recipes of the followed authors, newest first."""
+
+        ids = self.paginator.paginate_queryset(
+            Timeline(request.user), request, view=self
+        )
+        recipes = self.get_queryset().in_bulk(ids)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in ids if pk in recipes], many=True
+        )
+        return self.paginator.get_paginated_response(serializer.data)
 
     def get_queryset(self):
         """Recipes queryset for the serializer."""
@@ -87,7 +330,7 @@ class RecipeViewSet(CustomModelViewsSet):
             user_id=user.id or None, author=OuterRef('id'))
         )
 
-        queryset = (Recipe.objects.all().order_by(
+        queryset = (Recipe.objects.visible().order_by(
             '-pub_date'
         ).prefetch_related(
             'tags',
@@ -1,10 +1,14 @@
-from django.db.models import BooleanField, Count, Exists, OuterRef, Value
+from django.db.models import BooleanField, Value
 from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
 
-from api.pagination import PageLimitPagination
+from api.filters import UserFilter
+from api.pagination import PageLimitPagination, UserCursorPagination
 from api.permissions import IsAuthorizedOrListCreateOnly
 from api.serializers import CustomUserSerializer, SubscriptionSerializer
 from api.views.viewsets import CustomModelViewsSet
+from recipes.feeds import backfill, trim
+from recipes.purge import deactivate_user
 from users.models import Subscription, User
 
 
@@ -13,44 +17,108 @@ class CustomUserViewSet(CustomModelViewsSet):
 
     serializer_class = CustomUserSerializer
     permission_classes = (IsAuthorizedOrListCreateOnly,)
+    pagination_class = UserCursorPagination
+    filterset_class = UserFilter
     http_method_names = ('get', 'post', 'delete')
 
     @action(('post',), detail=True)
     def subscribe(self, request, pk):
         """Subscription creation."""
 
-        return self.generic_create(SubscriptionSerializer, User, 'author')
+        return self.generic_create(
+            SubscriptionSerializer,
+            Subscription,
+            User.objects.filter(is_active=True),
+            'author',
+            forbidden={request.user.id},
+        )
 
     @subscribe.mapping.delete
     def delete_subscribe(self, request, pk):
         """Subscription deletion."""
 
-        return self.generic_delete(Subscription, User, 'author')
+        return self.generic_delete(Subscription, 'author')
+
+    @action(
+        ('post',),
+        detail=False,
+        url_path='subscribe',
+        url_name='subscribe-batch',
+        permission_classes=(IsAuthenticated,),
+    )
+    def subscribe_batch(self, request):
+        """Subscribe to a list of authors."""
+
+        return self.generic_batch(
+            Subscription,
+            User.objects.filter(is_active=True),
+            'author',
+            forbidden={request.user.id},
+        )
+
+    @subscribe_batch.mapping.delete
+    def delete_subscribe_batch(self, request):
+        """Unsubscribe from a list of authors."""
+
+        return self.generic_batch(
+            Subscription, User.objects.filter(is_active=True), 'author'
+        )
 
     @action(detail=False)
     def subscriptions(self, request):
         """Subscriptions list."""
 
         paginator = PageLimitPagination()
-        qs = (request.user.follower.annotate(is_subscribed=Value(
+        qs = request.user.follower.annotate(is_subscribed=Value(
             True, output_field=BooleanField()
-        )).prefetch_related(
-            'author__recipes'
-        ).annotate(recipes_count=Count(
-            'author__recipes'
-        )).order_by('-id')
-        )
+        )).select_related('author').prefetch_related(
+            SubscriptionSerializer.latest_recipes(request)
+        ).order_by('-id')
         page = paginator.paginate_queryset(qs, request=request)
         context = {'request': request}
         serializer = SubscriptionSerializer(page, many=True, context=context)
         return paginator.get_paginated_response(serializer.data)
 
-    def get_queryset(self):
-        """Annotated queryset for the serializer."""
+    def relations_changed(self, klass, ids, added):
+        """Backfill or trim the feed after (un)subscribing."""
+
+        super().relations_changed(klass, ids, added)
+        if added:
+            backfill(self.request.user.id, ids)
+        else:
+            trim(self.request.user.id, ids)
+
+    def stamp_subscriptions(self, users):
+        """Set is_subscribed of the users with one query of followed ids."""
 
         user = self.request.user
-        queryset = User.objects.order_by('username')
-        value = Exists(Subscription.objects.filter(
-            user_id=user.id or None, author=OuterRef('id')
-        ))
-        return queryset.annotate(is_subscribed=value)
+        followed = set()
+        if user.is_authenticated and users:
+            followed = set(Subscription.objects.filter(
+                user=user, author_id__in=[author.id for author in users]
+            ).values_list('author_id', flat=True))
+        for author in users:
+            author.is_subscribed = author.id in followed
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            self.stamp_subscriptions(page)
+        return page
+
+    def get_object(self):
+        obj = super().get_object()
+        self.stamp_subscriptions([obj])
+        return obj
+
+    def destroy(self, request, *args, **kwargs):
+        """Deactivate the user at once, a job deletes everything else."""
+
+        user = self.get_object()
+        deactivate_user(user)
+        return self.purge_later('purge_user', user)
+
+    def get_queryset(self):
+        """Active users for the directory, (username, id) is indexed."""
+
+        return User.objects.filter(is_active=True).order_by('username', 'id')
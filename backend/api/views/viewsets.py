@@ -1,39 +1,174 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from rest_framework import status
 from rest_framework.permissions import AllowAny
+from rest_framework.reverse import reverse
 from rest_framework.response import Response
+from rest_framework.serializers import ValidationError
+from rest_framework.settings import api_settings
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
+from api.serializers import BatchSerializer
+from jobs.models import Job
+from recipes.catalogs import cache_key, touch_relations
+
 
 class CustomReadOnlyModelViewSet(ReadOnlyModelViewSet):
-    """ReadOnly model viewset with presets."""
+    """ReadOnly model viewset with presets.
+
+    Unfiltered lists of catalogs are served from the cache.
+    """
 
     permission_classes = (AllowAny,)
     pagination_class = None
     http_method_names = ('get',)
 
+    @classmethod
+    def catalog(cls):
+        """Serialized catalog, cached until its model changes."""
+
+        key = cache_key(cls.queryset.model)
+        data = cache.get(key)
+        if data is None:
+            data = list(
+                cls.serializer_class(cls.queryset.all(), many=True).data
+            )
+            cache.set(key, data, settings.CATALOG_CACHE_SECONDS)
+        return data
+
+    def list(self, request, *args, **kwargs):
+        """The whole catalog without filters, a regular list otherwise."""
+
+        if request.query_params:
+            return super().list(request, *args, **kwargs)
+        return Response(self.catalog())
+
 
 class CustomModelViewsSet(ModelViewSet):
     """Common methods for foodgram views."""
 
-    def generic_create(self, serializer, klass, outer_field):
-        """Generic create an authenticated user."""
+    def generic_create(
+        self, serializer, klass, parents, outer_field, forbidden=()
+    ):
+        """Generic create for an authenticated user.
 
-        data = {
-            outer_field: get_object_or_404(klass, id=self.kwargs['pk']).id,
-            'user': self.request.user.id,
-        }
-        serializer = serializer(data=data, context={'request': self.request})
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+        The parent is fetched once from the parents queryset, so hidden
+        ones are not found, and the relation is inserted right away, a
+        unique constraint violation means it already exists.
+        """
+
+        outer = get_object_or_404(parents, id=self.kwargs['pk'])
+        if outer.id in forbidden:
+            raise ValidationError(
+                {outer_field: [serializer.forbidden_message]}
+            )
+        try:
+            with transaction.atomic():
+                obj = klass.objects.create(
+                    user=self.request.user, **{outer_field: outer}
+                )
+        except IntegrityError:
+            raise ValidationError(
+                {api_settings.NON_FIELD_ERRORS_KEY: [
+                    serializer.conflict_message
+                ]}
+            )
+        self.relations_changed(klass, {outer.id}, True)
+        serializer = serializer(obj, context={'request': self.request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-    def generic_delete(self, klass, outer_klass, outer_field):
-        """Generic delete for an authenticated user."""
+    def generic_delete(self, klass, outer_field):
+        """Generic delete for an authenticated user in one statement."""
 
-        obj = get_object_or_404(klass, **{
+        deleted, _ = klass.objects.filter(**{
             'user': self.request.user,
-            outer_field: get_object_or_404(outer_klass, id=self.kwargs['pk']),
-        })
-        obj.delete()
+            f'{outer_field}_id': self.kwargs['pk'],
+        }).delete()
+        if not deleted:
+            raise Http404
+        self.relations_changed(klass, {int(self.kwargs['pk'])}, False)
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def generic_batch(self, klass, parents, outer_field, forbidden=()):
+        """Add (POST) or remove (DELETE) a list of relations at once.
+
+        Everything happens in one transaction with a bulk insert or a
+        single delete, and every id gets its own status in the response.
+        Relations are added to the parents queryset only, but removed
+        from hidden parents as well.
+        """
+
+        serializer = BatchSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data['ids']))
+        user = self.request.user
+        lookup = {'user': user, f'{outer_field}_id__in': ids}
+        if self.request.method == 'DELETE':
+            parents = parents.model.objects.all()
+        with transaction.atomic():
+            found = set(parents.filter(
+                id__in=ids
+            ).values_list('id', flat=True))
+            linked = set(klass.objects.filter(**lookup).values_list(
+                f'{outer_field}_id', flat=True
+            ))
+            if self.request.method == 'DELETE':
+                changed = linked
+                klass.objects.filter(**lookup).delete()
+                done, skipped = 'deleted', 'not_linked'
+            else:
+                changed = found - linked - set(forbidden)
+                klass.objects.bulk_create(
+                    [
+                        klass(user=user, **{f'{outer_field}_id': pk})
+                        for pk in changed
+                    ],
+                    ignore_conflicts=True,
+                )
+                if changed:
+                    touch_relations((user.id,))
+                done, skipped = 'created', 'exists'
+        if changed:
+            self.relations_changed(
+                klass, changed, self.request.method != 'DELETE'
+            )
+        results = []
+        for pk in ids:
+            if pk not in found:
+                result = 'not_found'
+            elif pk in forbidden:
+                result = 'forbidden'
+            else:
+                result = done if pk in changed else skipped
+            results.append({'id': pk, 'status': result})
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    def relations_stamp(self, user):
+        """Time of the last change of user's favorites, cart or follows.
+
+        Kept on the user row, which authentication has loaded already,
+        and stamped by the signals of the relation models.
+        """
+
+        if not user.is_authenticated:
+            return None
+        if user.relations_modified is None:
+            return 0.0
+        return user.relations_modified.timestamp()
+
+    def relations_changed(self, klass, ids, added):
+        """Hook to refresh caches and counters after relations change."""
+
+    def purge_later(self, kind, obj):
+        """Queue the purge of a deactivated object, point to its job."""
+
+        job = Job.objects.enqueue(kind, self.request.user, pk=obj.pk)
+        return Response(
+            status=status.HTTP_204_NO_CONTENT,
+            headers={'Location': reverse(
+                'jobs-detail', kwargs={'pk': job.pk}, request=self.request
+            )},
+        )
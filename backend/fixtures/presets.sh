@@ -1,14 +1,5 @@
 #!/bin/bash
 echo "Starting process."
-echo "Preloading fixtures."
-python manage.py loaddata fixtures/presets.json
-echo "Copying images."
-if [ -d "media/recipes" ] 
-then
-    echo "Recipes directory found, copying images"
-else
-    echo "Recipes images directory not found, creating it." 
-    mkdir media/recipes
-fi
-cp fixtures/images/* media/recipes/
+echo "Loading presets and copying images."
+python manage.py load_snapshot fixtures/presets.json --media-dir fixtures/images
 echo "Presets loading complete."
@@ -0,0 +1,247 @@
+import hashlib
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.widgets import (AutocompleteSelect,
+                                          ForeignKeyRawIdWidget)
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.forms import BaseInlineFormSet
+from django.urls import NoReverseMatch, reverse
+from django.utils.functional import cached_property
+from django.utils.http import urlencode
+from django.utils.text import Truncator
+
+from jobs.models import Job
+
+
+def estimated_rows(model, using: str) -> Optional[int]:
+    """Planner estimate of the table size, PostgreSQL only."""
+
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples FROM pg_class WHERE relname = %s',
+            (model._meta.db_table,),
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that does not count big tables on every page load.
+
+    Unfiltered lists of tables with more than ADMIN_EXACT_COUNT_LIMIT
+    rows use the planner estimate, other counts are cached for
+    ADMIN_COUNT_CACHE_SECONDS.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_rows(queryset.model, queryset.db)
+            if (
+                estimate is not None
+                and estimate > settings.ADMIN_EXACT_COUNT_LIMIT
+            ):
+                return estimate
+        digest = hashlib.sha1(str(queryset.query).encode()).hexdigest()
+        return cache.get_or_set(
+            f'admin-count-{digest}',
+            queryset.count,
+            settings.ADMIN_COUNT_CACHE_SECONDS,
+        )
+
+
+class LargeTableMixin:
+    """Changelist options for tables too big to count exactly."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class BackgroundDeleteMixin:
+    """Deleted objects are deactivated, a job purges them in batches.
+
+    The confirmation page lists the objects only, their dependents are
+    never collected into memory. Subclasses set the function that
+    deactivates an object and the kind of the purge job.
+    """
+
+    deactivate_function: Optional[Callable] = None
+    purge_kind: Optional[str] = None
+
+    def delete_model(self, request, obj):
+        type(self).deactivate_function(obj)
+        Job.objects.enqueue(self.purge_kind, request.user, pk=obj.pk)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            self.delete_model(request, obj)
+
+    def get_deleted_objects(self, objs, request):
+        objs = list(objs)
+        return (
+            [str(obj) for obj in objs],
+            {self.model._meta.verbose_name_plural: len(objs)},
+            set(),
+            [],
+        )
+
+
+class InputFilter(admin.SimpleListFilter):
+    """Sidebar filter with a text input, no choices are queried.
+
+    Subclasses set the title, the parameter name and the lookup the
+    entered value is matched with.
+    """
+
+    template = 'admin/input_filter.html'
+    lookup = None
+
+    def lookups(self, request, model_admin):
+        return ((None, None),)
+
+    def queryset(self, request, queryset):
+        value = (self.value() or '').strip()
+        if not value:
+            return queryset
+        return queryset.filter(**{self.lookup: value})
+
+    def choices(self, changelist):
+        everything = next(iter(super().choices(changelist)))
+        everything['query_parts'] = [
+            (key, value)
+            for key, value in changelist.get_filters_params().items()
+            if key != self.parameter_name
+        ]
+        yield everything
+
+
+class PreloadedRawIdWidget(ForeignKeyRawIdWidget):
+    """Raw id widget labelled with an already loaded object.
+
+    The stock widget fetches the object of every row for its label.
+    """
+
+    obj = None
+
+    def label_and_url_for_value(self, value):
+        obj = self.obj
+        if obj is None or str(obj.pk) != str(value):
+            return super().label_and_url_for_value(value)
+        opts = obj._meta
+        try:
+            url = reverse(
+                f'{self.admin_site.name}:{opts.app_label}_'
+                f'{opts.model_name}_change',
+                args=(obj.pk,),
+            )
+        except NoReverseMatch:
+            url = ''
+        return Truncator(obj).words(14), url
+
+
+class PreloadedAutocompleteSelect(AutocompleteSelect):
+    """Autocomplete select showing an already loaded object.
+
+    The stock widget fetches the selected object of every row.
+    """
+
+    obj = None
+
+    def optgroups(self, name, value, attr=None):
+        obj = self.obj
+        if obj is None or [str(pk) for pk in value] != [str(obj.pk)]:
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        options.append(self.create_option(
+            name, obj.pk, self.choices.field.label_from_instance(obj), True,
+            len(options),
+        ))
+        return [(None, options, 0)]
+
+
+def preload_widgets(form) -> None:
+    """Give the preloaded widgets of a bound inline form their objects."""
+
+    for field in form.fields.values():
+        widget = getattr(field.widget, 'widget', field.widget)
+        if isinstance(
+            widget, (PreloadedRawIdWidget, PreloadedAutocompleteSelect)
+        ):
+            widget.obj = getattr(form.instance, widget.rel.field.name)
+
+
+class LimitedInlineFormSet(BaseInlineFormSet):
+    """Inline formset with the first ADMIN_INLINE_MAX_ROWS rows only."""
+
+    def get_queryset(self):
+        if not hasattr(self, '_queryset'):
+            self.full_queryset = super().get_queryset()
+            self._queryset = self.full_queryset[
+                :settings.ADMIN_INLINE_MAX_ROWS
+            ]
+        return self._queryset
+
+    @cached_property
+    def total_count(self):
+        """Number of all rows, counted only if some are not shown."""
+
+        shown = len(self.get_queryset())
+        if shown < settings.ADMIN_INLINE_MAX_ROWS:
+            return shown
+        return self.full_queryset.count()
+
+    @property
+    def view_all_url(self):
+        """Changelist of all rows of the parent object."""
+
+        opts = self.model._meta
+        return '{}?{}'.format(
+            reverse(f'admin:{opts.app_label}_{opts.model_name}_changelist'),
+            urlencode({f'{self.fk.name}__id__exact': self.instance.pk}),
+        )
+
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        if i < self.initial_form_count():
+            setattr(form.instance, self.fk.name, self.instance)
+            preload_widgets(form)
+        return form
+
+
+class LimitedInline(admin.TabularInline):
+    """Tabular inline for relations that can grow without limits.
+
+    Only the first ADMIN_INLINE_MAX_ROWS rows (in the inline ordering)
+    are rendered, with a link to the changelist of all of them. Foreign
+    keys in raw_id_fields are labelled without extra queries.
+    """
+
+    formset = LimitedInlineFormSet
+    template = 'admin/limited_tabular.html'
+    extra = 0
+    ordering = ('-id',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            *self.raw_id_fields
+        )
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.raw_id_fields:
+            kwargs['widget'] = PreloadedRawIdWidget(
+                db_field.remote_field, self.admin_site,
+                using=kwargs.get('using'),
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
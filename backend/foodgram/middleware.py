@@ -0,0 +1,104 @@
+import hashlib
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache, caches
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+from foodgram.routers import (MetricsWrapper, RoutingState, reset_state,
+                              set_state)
+
+PIN_COOKIE = 'db_pin'
+PIN_SALT = 'foodgram.replica-pin'
+PROCESS_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def pin_key(request):
+    """Cache key of the client pinned to the primary database, if any."""
+
+    credentials = request.META.get('HTTP_AUTHORIZATION') or (
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    )
+    if not credentials:
+        return None
+    digest = hashlib.sha1(credentials.encode()).hexdigest()
+    return f'db-pin-{digest}'
+
+
+def pinned(request, key) -> bool:
+    """The client has written something in the last REPLICA_PIN_SECONDS."""
+
+    cookie = request.get_signed_cookie(
+        PIN_COOKIE,
+        default=None,
+        salt=PIN_SALT,
+        max_age=settings.REPLICA_PIN_SECONDS,
+    )
+    return cookie is not None or bool(key and cache.get(key))
+
+
+def check_shared_cache(app_configs, **kwargs):
+    """Warn when pins of cookieless clients stay in one process."""
+
+    backend = settings.CACHES['default']['BACKEND']
+    if not settings.DATABASE_REPLICAS or backend not in PROCESS_CACHES:
+        return []
+    return [checks.Warning(
+        f'{backend} is local to a process, so clients without cookies are '
+        f'pinned to the primary by the worker which served their write '
+        f'only.',
+        hint='Use a shared cache, such as Redis or Memcached, with replicas.',
+        obj=caches['default'],
+        id='foodgram.W001',
+    )]
+
+
+class ReplicaRoutingMiddleware:
+    """Route reads of safe requests to replicas and count queries.
+
+    A client that has written anything is pinned to the primary for
+    REPLICA_PIN_SECONDS, so it never reads its own data from a lagging
+    replica. The pin is a signed cookie, seen by every worker, and a
+    cache entry by credentials for clients which drop cookies.
+    """
+
+    def __init__(self, get_response):
+        """Initialization."""
+
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key = pin_key(request)
+        use_replica = (
+            bool(settings.DATABASE_REPLICAS)
+            and request.method in SAFE_METHODS
+            and not pinned(request, key)
+        )
+        state = RoutingState(use_replica)
+        token = set_state(state)
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(
+                        MetricsWrapper(alias)
+                    ))
+                response = self.get_response(request)
+        finally:
+            reset_state(token)
+        if state.wrote:
+            response.set_signed_cookie(
+                PIN_COOKIE,
+                '1',
+                salt=PIN_SALT,
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+            if key:
+                cache.set(key, True, settings.REPLICA_PIN_SECONDS)
+        return response
@@ -0,0 +1,139 @@
+import logging
+import os
+import random
+import sys
+import traceback
+from contextlib import ExitStack
+from typing import Dict, List, Tuple
+
+from django.conf import settings
+from django.db import connections
+
+from foodgram.profiling import route_of
+from foodgram.sqlstats import fingerprint
+
+logger = logging.getLogger(__name__)
+
+_THIS_FILE = os.path.abspath(__file__)
+
+
+class NPlusOneError(Exception):
+    """A request repeated the same query from the same place too often."""
+
+
+def in_project(filename: str) -> bool:
+    """The file is part of this project, not a library or this module."""
+
+    return (
+        filename.startswith(settings.BASE_DIR)
+        and 'site-packages' not in filename
+        and filename != _THIS_FILE
+    )
+
+
+def call_site(frame) -> str:
+    """File, line and function of the innermost project frame."""
+
+    while frame is not None:
+        code = frame.f_code
+        if in_project(code.co_filename):
+            path = os.path.relpath(code.co_filename, settings.BASE_DIR)
+            return f'{path}:{frame.f_lineno} in {code.co_name}'
+        frame = frame.f_back
+    return 'unknown'
+
+
+def project_stack(frame) -> List[str]:
+    """Formatted project frames of the stack, the outermost first."""
+
+    return traceback.format_list([
+        entry for entry in traceback.extract_stack(frame)
+        if in_project(entry.filename)
+    ])
+
+
+class QueryShapes:
+    """Execute wrapper grouping statements by fingerprint and call site.
+
+    The stack of a group is kept once it has repeated more than
+    NPLUSONE_THRESHOLD times, so only offenders pay for a traceback.
+    """
+
+    def __init__(self) -> None:
+        """Initialization."""
+
+        self.counts: Dict[Tuple[str, str], int] = {}
+        self.stacks: Dict[Tuple[str, str], List[str]] = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        frame = sys._getframe(1)
+        key = (fingerprint(sql), call_site(frame))
+        count = self.counts[key] = self.counts.get(key, 0) + 1
+        if count == settings.NPLUSONE_THRESHOLD + 1:
+            self.stacks[key] = project_stack(frame)
+        return execute(sql, params, many, context)
+
+    def offenders(self) -> List[dict]:
+        """Repeated groups not ignored by NPLUSONE_IGNORE, worst first."""
+
+        found = [
+            {
+                'fingerprint': key,
+                'site': site,
+                'count': self.counts[(key, site)],
+                'stack': stack,
+            }
+            for (key, site), stack in self.stacks.items()
+            if not any(
+                ignored in site for ignored in settings.NPLUSONE_IGNORE
+            )
+        ]
+        return sorted(found, key=lambda offender: -offender['count'])
+
+
+def describe(offenders: List[dict]) -> str:
+    """Readable report of the offenders with their stacks."""
+
+    return '\n'.join(
+        f'{offender["count"]} times at {offender["site"]}: '
+        f'{offender["fingerprint"][:300]}\n{"".join(offender["stack"])}'
+        for offender in offenders
+    )
+
+
+class NPlusOneMiddleware:
+    """Flag queries repeated by a request from the same call site.
+
+    Raises NPlusOneError with NPLUSONE_RAISE, as in tests and debug,
+    otherwise logs a warning for a NPLUSONE_SAMPLE_RATE share of requests.
+    """
+
+    def __init__(self, get_response):
+        """Initialization."""
+
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.NPLUSONE_ENABLED or not (
+            settings.NPLUSONE_RAISE
+            or random.random() < settings.NPLUSONE_SAMPLE_RATE
+        ):
+            return self.get_response(request)
+        shapes = QueryShapes()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(shapes)
+                )
+            response = self.get_response(request)
+        offenders = shapes.offenders()
+        if not offenders:
+            return response
+        message = (
+            f'N+1 queries in {request.method} {route_of(request)}:\n'
+            f'{describe(offenders)}'
+        )
+        if settings.NPLUSONE_RAISE:
+            raise NPlusOneError(message)
+        logger.warning(message)
+        return response
@@ -0,0 +1,147 @@
+import cProfile
+import hmac
+import json
+import os
+import random
+import time
+import uuid
+from collections import defaultdict
+from contextlib import ExitStack
+from typing import Dict, List
+
+from django.conf import settings
+from django.db import connections
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+
+
+class QueryCounter:
+    """Database execute wrapper counting the queries of a request."""
+
+    def __init__(self) -> None:
+        """Initialization."""
+
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+
+def requested(request) -> bool:
+    """Profile if the request has the token header or is sampled."""
+
+    token = request.META.get(PROFILE_HEADER)
+    if settings.PROFILING_TOKEN and token:
+        return hmac.compare_digest(token, settings.PROFILING_TOKEN)
+    return random.random() < settings.PROFILING_SAMPLE_RATE
+
+
+def route_of(request) -> str:
+    """The url pattern which served the request, the path otherwise."""
+
+    match = getattr(request, 'resolver_match', None)
+    if match is None or not match.route:
+        return request.path
+    return match.route
+
+
+def save(profiler: cProfile.Profile, meta: dict) -> str:
+    """Store the profile and its metadata, return the profile id."""
+
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    profile_id = f'{int(meta["started"])}-{uuid.uuid4().hex[:8]}'
+    path = os.path.join(settings.PROFILING_DIR, profile_id)
+    profiler.dump_stats(f'{path}.prof')
+    with open(f'{path}.json', 'w', encoding='utf-8') as ofile:
+        json.dump({'id': profile_id, **meta}, ofile)
+    return profile_id
+
+
+def stats_path(profile_id: str) -> str:
+    """Path of the pstats file of a profile."""
+
+    return os.path.join(settings.PROFILING_DIR, f'{profile_id}.prof')
+
+
+def load() -> List[dict]:
+    """Metadata of the stored profiles, slowest first."""
+
+    if not os.path.isdir(settings.PROFILING_DIR):
+        return []
+    profiles = []
+    for name in os.listdir(settings.PROFILING_DIR):
+        if name.endswith('.json'):
+            path = os.path.join(settings.PROFILING_DIR, name)
+            with open(path, encoding='utf-8') as ifile:
+                profiles.append(json.load(ifile))
+    profiles.sort(key=lambda profile: -profile['seconds'])
+    return profiles
+
+
+def offenders(profiles: List[dict]) -> List[Dict[str, object]]:
+    """Profiles grouped by route, the most time spent first."""
+
+    routes = defaultdict(list)
+    for profile in profiles:
+        routes[(profile['method'], profile['route'])].append(profile)
+    rows = [
+        {
+            'method': method,
+            'route': route,
+            'count': len(group),
+            'seconds': sum(profile['seconds'] for profile in group),
+            'max_seconds': max(profile['seconds'] for profile in group),
+            'queries': sum(
+                profile['queries'] for profile in group
+            ) / len(group),
+        }
+        for (method, route), group in routes.items()
+    ]
+    rows.sort(key=lambda row: -row['seconds'])
+    return rows
+
+
+class ProfilingMiddleware:
+    """Profile single requests with cProfile.
+
+    A request is profiled when its X-Profile header matches
+    PROFILING_TOKEN, or by chance with PROFILING_SAMPLE_RATE. Profiles
+    are saved to PROFILING_DIR with the route, status, timing and the
+    number of queries; see the show_profiles command. Requests profiled
+    on demand get the profile id in the X-Profile-Id header.
+    """
+
+    def __init__(self, get_response):
+        """Initialization."""
+
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not requested(request):
+            return self.get_response(request)
+        counter = QueryCounter()
+        profiler = cProfile.Profile()
+        started, clock = time.time(), time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(counter)
+                )
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        profile_id = save(profiler, {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'route': route_of(request),
+            'status': response.status_code,
+            'started': started,
+            'seconds': time.perf_counter() - clock,
+            'queries': counter.queries,
+        })
+        if settings.PROFILING_TOKEN and PROFILE_HEADER in request.META:
+            response['X-Profile-Id'] = profile_id
+        return response
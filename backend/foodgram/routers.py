@@ -0,0 +1,116 @@
+import random
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from django.conf import settings
+
+PRIMARY = 'default'
+
+_routing = ContextVar('routing', default=None)
+_metrics_lock = threading.Lock()
+_metrics: Dict[str, Dict[str, float]] = {}
+
+
+class RoutingState:
+    """Routing state of a single request."""
+
+    def __init__(self, use_replica: bool) -> None:
+        """Initialization."""
+
+        self.use_replica = use_replica
+        self.wrote = False
+
+
+def set_state(state: Optional[RoutingState]):
+    """Make the state current, return a token to reset it."""
+
+    return _routing.set(state)
+
+
+def reset_state(token) -> None:
+    """Restore the previous routing state."""
+
+    _routing.reset(token)
+
+
+def count_query(alias: str, duration: float, failed: bool) -> None:
+    """Add a query to the per-alias metrics."""
+
+    with _metrics_lock:
+        stats = _metrics.setdefault(
+            alias, {'queries': 0, 'errors': 0, 'seconds': 0.0}
+        )
+        stats['queries'] += 1
+        stats['errors'] += failed
+        stats['seconds'] += duration
+
+
+def query_metrics() -> Dict[str, Dict[str, float]]:
+    """A snapshot of the per-alias query metrics of this process."""
+
+    with _metrics_lock:
+        return {alias: dict(stats) for alias, stats in _metrics.items()}
+
+
+def reset_metrics() -> None:
+    """Forget the collected query metrics."""
+
+    with _metrics_lock:
+        _metrics.clear()
+
+
+class MetricsWrapper:
+    """Execute wrapper counting queries and their time per alias."""
+
+    def __init__(self, alias: str) -> None:
+        """Initialization."""
+
+        self.alias = alias
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = execute(sql, params, many, context)
+            failed = False
+            return result
+        finally:
+            count_query(
+                self.alias, time.perf_counter() - started, failed
+            )
+
+
+class ReplicaRouter:
+    """Send reads of safe requests to replicas, everything else to primary.
+
+    Once a request writes anything, its remaining reads go to the primary
+    as well, so a request always sees its own writes.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if (
+            state is None
+            or not state.use_replica
+            or state.wrote
+            or not settings.DATABASE_REPLICAS
+        ):
+            return PRIMARY
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
@@ -1,4 +1,5 @@
 import os
+import sys
 from distutils.util import strtobool
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -31,10 +32,15 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'recipes.apps.RecipesConfig',
     'api.apps.ApiConfig',
+    'jobs.apps.JobsConfig',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'foodgram.profiling.ProfilingMiddleware',
+    'foodgram.sqlstats.QueryStatsMiddleware',
+    'foodgram.nplusone.NPlusOneMiddleware',
+    'foodgram.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -48,7 +54,7 @@ ROOT_URLCONF = 'foodgram.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
+        'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -74,6 +80,21 @@ DATABASES = {
     }
 }
 
+for number, replica in enumerate(
+    filter(None, os.getenv('DB_REPLICAS', '').split(',')), 1
+):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'NAME' if 'sqlite' in DATABASES['default']['ENGINE'] else 'HOST': (
+            replica.strip()
+        ),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_REPLICAS = tuple(alias for alias in DATABASES if alias != 'default')
+DATABASE_ROUTERS = ('foodgram.routers.ReplicaRouter',)
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 5))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -130,7 +151,49 @@ DJOSER = {
 }
 
 DEFAULT_RECIPES_LIMIT = 5
+BATCH_MAX_SIZE = 100
+INLINE_EXPORT_MAX_ITEMS = 100
+JOB_RESULT_TTL_SECONDS = 24 * 60 * 60
+RECIPE_BOOK_INLINE_MAX = 5
+RECIPE_BOOK_IMAGE_SIZE = 800
+RECIPE_BOOK_VOLUME_SIZE = 200
+RECIPE_BOOK_WORKERS = int(os.getenv('RECIPE_BOOK_WORKERS', os.cpu_count()))
+IMPORT_PASSWORD_HASHER = os.getenv('IMPORT_PASSWORD_HASHER', 'default')
 FAVORITED_CACHE_SECONDS_TTL = 60
+CATALOG_CACHE_SECONDS = 60 * 60
+FEED_FANOUT_MAX_FOLLOWERS = 10000
+FEED_BACKFILL_SIZE = 100
+FEED_CHUNK_SIZE = 1000
+FEED_CELEBRITIES_CACHE_SECONDS = 5 * 60
+POPULARITY_WEIGHTS = {'Favorite': 1.0, 'ShoppingCart': 0.5}
+POPULARITY_HALF_LIFE_HOURS = 7 * 24
+RECOMMENDATIONS_TOP_K = 10
+RECOMMENDATIONS_MIN_COMMON = 2
+SIMILARITY_BANDS = 20
+SIMILARITY_BAND_ROWS = 3
+SIMILARITY_TOP_K = 10
+ADMIN_EXACT_COUNT_LIMIT = 10000
+ADMIN_COUNT_CACHE_SECONDS = 60
+ADMIN_INLINE_MAX_ROWS = 20
+PURGE_BATCH_SIZE = 1000
+PROFILING_DIR = os.getenv('PROFILING_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILING_TOKEN = os.getenv('PROFILING_TOKEN', '')
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0))
+SQL_STATS_ENABLED = strtobool(os.getenv('SQL_STATS_ENABLED', 'False'))
+SQL_STATS_DIR = os.getenv('SQL_STATS_DIR', os.path.join(BASE_DIR, 'sqlstats'))
+SQL_STATS_SAMPLES = 200
+SQL_STATS_FLUSH_SECONDS = 60
+SQL_SLOW_MS = float(os.getenv('SQL_SLOW_MS', 100))
+SQL_EXPLAIN_SAMPLE_RATE = float(os.getenv('SQL_EXPLAIN_SAMPLE_RATE', 0.1))
+SQL_EXPLAIN_INTERVAL_SECONDS = 10 * 60
+SQL_EXPLAIN_IN_BACKGROUND = True
+NPLUSONE_ENABLED = strtobool(os.getenv('NPLUSONE_ENABLED', 'True'))
+NPLUSONE_THRESHOLD = int(os.getenv('NPLUSONE_THRESHOLD', 5))
+NPLUSONE_RAISE = strtobool(os.getenv(
+    'NPLUSONE_RAISE', str(bool(DEBUG or sys.argv[1:2] == ['test']))
+))
+NPLUSONE_SAMPLE_RATE = float(os.getenv('NPLUSONE_SAMPLE_RATE', 0.01))
+NPLUSONE_IGNORE = ()
 
 CACHES = {
     'default': {
@@ -0,0 +1,291 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextlib import ExitStack
+from functools import lru_cache
+from typing import Dict, List
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%s")
+_LISTS = re.compile(r'\(\?(?:, \?)*\)(?:, \(\?(?:, \?)*\))*')
+_SPACES = re.compile(r'\s+')
+
+_lock = threading.Lock()
+_statements: Dict[str, dict] = {}
+_explained: Dict[str, float] = {}
+_flushed = time.monotonic()
+_pending: queue.Queue = queue.Queue(maxsize=100)
+_worker = None
+FLUSH = None
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(sql: str) -> str:
+    """SQL with literals and parameters replaced, lists collapsed."""
+
+    sql = _SPACES.sub(' ', _LITERALS.sub('?', sql)).strip()
+    return _LISTS.sub('(...)', sql)
+
+
+def fingerprint_id(key: str) -> str:
+    """Short stable id of a fingerprint."""
+
+    return hashlib.sha1(key.encode()).hexdigest()[:12]
+
+
+def percentile(samples: List[float], share: float) -> float:
+    """Nearest-rank percentile of the samples."""
+
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[max(math.ceil(share * len(ordered)) - 1, 0)]
+
+
+def record(alias: str, sql: str, params, seconds: float) -> None:
+    """Add an executed statement to the stats of its fingerprint.
+
+    A bounded reservoir of durations is kept for percentiles. Slow
+    SELECTs are sampled for EXPLAIN, which runs in a background thread.
+    """
+
+    global _flushed
+    key = fingerprint(sql)
+    with _lock:
+        stats = _statements.get(key)
+        if stats is None:
+            stats = _statements[key] = {
+                'fingerprint': key, 'count': 0, 'seconds': 0.0,
+                'max': 0.0, 'samples': [],
+            }
+        stats['count'] += 1
+        stats['seconds'] += seconds
+        stats['max'] = max(stats['max'], seconds)
+        samples = stats['samples']
+        if len(samples) < settings.SQL_STATS_SAMPLES:
+            samples.append(seconds)
+        else:
+            slot = random.randrange(stats['count'])
+            if slot < len(samples):
+                samples[slot] = seconds
+        now = time.monotonic()
+        flush = now - _flushed >= settings.SQL_STATS_FLUSH_SECONDS
+        if flush:
+            _flushed = now
+        explain = (
+            seconds * 1000 >= settings.SQL_SLOW_MS
+            and sql.lstrip()[:6].upper() == 'SELECT'
+            and random.random() < settings.SQL_EXPLAIN_SAMPLE_RATE
+            and now - _explained.get(key, -math.inf)
+            >= settings.SQL_EXPLAIN_INTERVAL_SECONDS
+        )
+        if explain:
+            _explained[key] = now
+    if explain:
+        _enqueue((alias, sql, params, seconds))
+    if flush:
+        _enqueue(FLUSH)
+
+
+def _enqueue(item) -> None:
+    try:
+        _pending.put_nowait(item)
+    except queue.Full:
+        return
+    if settings.SQL_EXPLAIN_IN_BACKGROUND:
+        _start_worker()
+
+
+def _start_worker() -> None:
+    global _worker
+    with _lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(
+                target=_work, name='sqlstats', daemon=True
+            )
+            _worker.start()
+
+
+def _work() -> None:
+    while True:
+        process(_pending.get())
+        connections.close_all()
+
+
+def process(item) -> None:
+    """Flush the stats or explain a statement, never raise."""
+
+    try:
+        if item is FLUSH:
+            flush()
+        else:
+            capture_plan(*item)
+    except Exception:
+        logger.exception('SQL stats task failed')
+
+
+def process_pending() -> int:
+    """Run the queued tasks in this thread, return their number."""
+
+    done = 0
+    while True:
+        try:
+            item = _pending.get_nowait()
+        except queue.Empty:
+            return done
+        process(item)
+        done += 1
+
+
+def explain(alias: str, sql: str, params) -> str:
+    """Plan of a statement, EXPLAIN (ANALYZE, BUFFERS) on PostgreSQL.
+
+    ANALYZE runs the statement, so it is done in a rolled back
+    transaction.
+    """
+
+    connection = connections[alias]
+    prefix = {
+        'postgresql': 'EXPLAIN (ANALYZE, BUFFERS) ',
+        'sqlite': 'EXPLAIN QUERY PLAN ',
+    }.get(connection.vendor, 'EXPLAIN ')
+    with transaction.atomic(using=alias):
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            rows = cursor.fetchall()
+        transaction.set_rollback(True, using=alias)
+    return '\n'.join(str(row[-1]) for row in rows)
+
+
+def plans_dir() -> str:
+    """Directory of the captured plans."""
+
+    return os.path.join(settings.SQL_STATS_DIR, 'plans')
+
+
+def capture_plan(alias: str, sql: str, params, seconds: float) -> None:
+    """Store the plan of a slow statement, one file per fingerprint."""
+
+    key = fingerprint(sql)
+    plan = explain(alias, sql, params)
+    os.makedirs(plans_dir(), exist_ok=True)
+    path = os.path.join(plans_dir(), f'{fingerprint_id(key)}.json')
+    with open(path, 'w', encoding='utf-8') as ofile:
+        json.dump({
+            'fingerprint': key,
+            'sql': sql,
+            'params': repr(params),
+            'alias': alias,
+            'seconds': seconds,
+            'captured': time.time(),
+            'plan': plan,
+        }, ofile)
+
+
+def flush() -> None:
+    """Write the stats of this process to SQL_STATS_DIR."""
+
+    with _lock:
+        snapshot = [
+            {**stats, 'samples': list(stats['samples'])}
+            for stats in _statements.values()
+        ]
+    os.makedirs(settings.SQL_STATS_DIR, exist_ok=True)
+    path = os.path.join(settings.SQL_STATS_DIR, f'stats-{os.getpid()}.json')
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as ofile:
+        json.dump(snapshot, ofile)
+    os.replace(f'{path}.tmp', path)
+
+
+def reset() -> None:
+    """Forget the stats of this process."""
+
+    with _lock:
+        _statements.clear()
+        _explained.clear()
+
+
+def load() -> List[dict]:
+    """Stats merged over the flushed files, the most total time first."""
+
+    merged = {}
+    directory = settings.SQL_STATS_DIR
+    names = os.listdir(directory) if os.path.isdir(directory) else ()
+    for name in names:
+        if not (name.startswith('stats-') and name.endswith('.json')):
+            continue
+        with open(os.path.join(directory, name), encoding='utf-8') as ifile:
+            for stats in json.load(ifile):
+                total = merged.setdefault(stats['fingerprint'], {
+                    'fingerprint': stats['fingerprint'], 'count': 0,
+                    'seconds': 0.0, 'max': 0.0, 'samples': [],
+                })
+                total['count'] += stats['count']
+                total['seconds'] += stats['seconds']
+                total['max'] = max(total['max'], stats['max'])
+                total['samples'].extend(stats['samples'])
+    for stats in merged.values():
+        stats['id'] = fingerprint_id(stats['fingerprint'])
+        stats['p95'] = percentile(stats.pop('samples'), 0.95)
+    return sorted(merged.values(), key=lambda stats: -stats['seconds'])
+
+
+def load_plan(key_id: str):
+    """Captured plan of a fingerprint by its id, None if there is none."""
+
+    path = os.path.join(plans_dir(), f'{key_id}.json')
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as ifile:
+        return json.load(ifile)
+
+
+class StatementWrapper:
+    """Execute wrapper recording the time of every statement."""
+
+    def __init__(self, alias: str) -> None:
+        """Initialization."""
+
+        self.alias = alias
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            record(
+                self.alias,
+                sql,
+                None if many else params,
+                time.perf_counter() - started,
+            )
+
+
+class QueryStatsMiddleware:
+    """Aggregate the statements of requests by their SQL fingerprint."""
+
+    def __init__(self, get_response):
+        """Initialization."""
+
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.SQL_STATS_ENABLED:
+            return self.get_response(request)
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(
+                    StatementWrapper(alias)
+                ))
+            return self.get_response(request)
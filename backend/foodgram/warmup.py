@@ -0,0 +1,100 @@
+import resource
+import time
+from importlib import import_module
+from typing import Dict
+
+from django.apps import apps
+from django.db import connections
+from django.urls import get_resolver
+
+WARMUP_MODULES = (
+    'api.views',
+    'api.serializers',
+    'api.filters',
+    'api.utils',
+    'api.recipebook',
+    'api.jobs',
+    'djoser.views',
+    'django_filters.rest_framework',
+    'rest_framework.authtoken.models',
+    'fpdf',
+    'PIL.Image',
+)
+
+
+def preimport() -> None:
+    """Import the modules that would be imported by first requests."""
+
+    for name in WARMUP_MODULES:
+        import_module(name)
+
+
+def build_metadata() -> None:
+    """Build models, serializers, filtersets and urls metadata caches."""
+
+    from rest_framework.serializers import BaseSerializer
+
+    from api import serializers
+    from api.filters import RecipeFilter
+    from recipes.models import Recipe
+
+    for model in apps.get_models():
+        model._meta.get_fields()
+    for name in serializers.__all__:
+        klass = getattr(serializers, name)
+        if isinstance(klass, type) and issubclass(klass, BaseSerializer):
+            klass().fields
+    RecipeFilter(queryset=Recipe.objects.none()).form
+    get_resolver().reverse_dict
+
+
+def load_catalogs() -> None:
+    """Put the read-mostly catalogs into the cache."""
+
+    from api.views import IngredientViewSet, TagViewSet
+
+    for viewset in (TagViewSet, IngredientViewSet):
+        viewset.catalog()
+
+
+def warmup() -> Dict[str, float]:
+    """Warm the process up, return seconds spent on every stage.
+
+    Database connections are closed afterwards (unless a transaction is
+    open), so the process can be forked safely.
+    """
+
+    timings = {}
+    for stage in (preimport, build_metadata, load_catalogs):
+        started = time.perf_counter()
+        stage()
+        timings[stage.__name__] = time.perf_counter() - started
+    for connection in connections.all():
+        if not connection.in_atomic_block:
+            connection.close()
+    return timings
+
+
+def memory_usage() -> Dict[str, int]:
+    """Resident memory of the process in bytes, split where possible.
+
+    On Linux shared and private pages are reported separately, the
+    shared part is what the workers keep sharing with the master.
+    """
+
+    try:
+        with open('/proc/self/smaps_rollup') as ifile:
+            values = {
+                line.split(':')[0]: int(line.split()[1]) * 1024
+                for line in ifile
+                if line.split()[-1] == 'kB'
+            }
+    except OSError:
+        return {
+            'rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        }
+    return {
+        'rss': values['Rss'],
+        'shared': values['Shared_Clean'] + values['Shared_Dirty'],
+        'private': values['Private_Clean'] + values['Private_Dirty'],
+    }
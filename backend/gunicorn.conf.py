@@ -0,0 +1,51 @@
+import gc
+import os
+import time
+
+BOOT_STARTED = time.monotonic()
+
+bind = os.getenv('GUNICORN_BIND', '0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', 1))
+preload_app = True
+
+# The master only loads and warms the application up, no garbage
+# collection there keeps the inherited pages shared with the workers.
+gc.disable()
+
+
+def _megabytes(usage):
+    return ', '.join(
+        f'{name} {value / 2 ** 20:.1f} MB' for name, value in usage.items()
+    )
+
+
+def when_ready(server):
+    """Warm the application up and freeze it before forking workers."""
+
+    from foodgram.warmup import memory_usage, warmup
+
+    timings = warmup()
+    gc.freeze()
+    server.log.info(
+        'Booted in %.2fs (%s), %d objects frozen, master memory: %s',
+        time.monotonic() - BOOT_STARTED,
+        ', '.join(f'{name} {value:.2f}s' for name, value in timings.items()),
+        gc.get_freeze_count(),
+        _megabytes(memory_usage()),
+    )
+
+
+def post_fork(server, worker):
+    """Workers collect garbage as usual, frozen objects are left alone."""
+
+    gc.enable()
+
+
+def post_worker_init(worker):
+    """Report the memory of a ready worker."""
+
+    from foodgram.warmup import memory_usage
+
+    worker.log.info(
+        'Worker %s ready, memory: %s', worker.pid, _megabytes(memory_usage())
+    )
@@ -0,0 +1,14 @@
+from django.contrib import admin
+
+from jobs.models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Admin interface for background jobs."""
+
+    list_display = ('id', 'kind', 'user', 'status', 'created', 'finished')
+    list_filter = ('status', 'kind')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    readonly_fields = ('created', 'started', 'finished')
@@ -0,0 +1,30 @@
+"""Entry points of worker processes, importable before Django is set up."""
+import os
+
+_in_pool = False
+
+
+def in_pool() -> bool:
+    """This process is a worker of the run_jobs pool."""
+
+    return _in_pool
+
+
+def init_worker() -> None:
+    """Set up Django in a freshly spawned worker process."""
+
+    import django
+
+    global _in_pool
+    _in_pool = True
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+    django.setup()
+
+
+def execute(job_id) -> str:
+    """Run a job in a worker process."""
+
+    from jobs.worker import run_job
+
+    return run_job(job_id)
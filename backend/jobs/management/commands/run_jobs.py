@@ -0,0 +1,84 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.core.management import BaseCommand
+
+from jobs.models import Job
+from jobs.bootstrap import execute, init_worker
+from jobs.worker import purge_expired, run_job
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs with a local pool of processes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Worker processes, 0 runs jobs in this process.',
+        )
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument(
+            '--purge-interval',
+            type=float,
+            default=60.0,
+            help='Seconds between removals of expired results.',
+        )
+        parser.add_argument(
+            '--stale-after',
+            type=float,
+            default=3600.0,
+            help='Seconds after which running jobs count as lost.',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit when the queue is empty.',
+        )
+
+    def log(self, message):
+        self.stdout.write(f'[{time.strftime("%X")}] {message}')
+
+    def run_inline(self, once, poll_interval):
+        while True:
+            claimed = Job.objects.claim(1)
+            for job_id in claimed:
+                self.log(f'Job {job_id}: {run_job(job_id)}')
+            if not claimed:
+                if once:
+                    return
+                time.sleep(poll_interval)
+
+    def handle(self, *args, **options):
+        workers, once = options['workers'], options['once']
+        self.log(f'Purged {purge_expired()} expired jobs.')
+        requeued = Job.objects.requeue_stale(options['stale_after'])
+        self.log(f'Requeued {requeued} lost jobs.')
+        if not workers:
+            self.run_inline(once, options['poll_interval'])
+            return
+        running = {}
+        last_purge = time.monotonic()
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker,
+        ) as pool:
+            while True:
+                for job_id in Job.objects.claim(workers - len(running)):
+                    running[pool.submit(execute, job_id)] = job_id
+                if not running and once:
+                    return
+                done, _ = wait(
+                    running,
+                    timeout=options['poll_interval'],
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    self.log(f'Job {running.pop(future)}: {future.result()}')
+                if time.monotonic() - last_purge > options['purge_interval']:
+                    self.log(f'Purged {purge_expired()} expired jobs.')
+                    last_purge = time.monotonic()
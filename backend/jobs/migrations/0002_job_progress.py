@@ -0,0 +1,25 @@
+# Generated by Django 2.2.16 on 2026-10-19 12:31
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='progress',
+            field=models.TextField(default='{}', verbose_name='Progress'),
+        ),
+        migrations.AlterField(
+            model_name='job',
+            name='user',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to=settings.AUTH_USER_MODEL, verbose_name='User'),
+        ),
+    ]
@@ -0,0 +1,127 @@
+import json
+import uuid
+from datetime import timedelta
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+from users.models import User
+
+
+class JobQuerySet(models.QuerySet):
+    """Queue operations for jobs."""
+
+    def enqueue(self, kind: str, user: Optional[User], **payload) -> 'Job':
+        """Put a new job into the queue."""
+
+        return self.create(kind=kind, user=user, payload=json.dumps(payload))
+
+    def claim(self, limit: int) -> List[uuid.UUID]:
+        """Mark up to limit of the oldest pending jobs as running.
+
+        Each job is taken with a conditional update, so concurrent
+        workers never get the same job.
+        """
+
+        claimed = []
+        pending = self.filter(status=Job.PENDING).order_by('created')
+        for pk in pending.values_list('pk', flat=True)[:limit]:
+            if self.filter(pk=pk, status=Job.PENDING).update(
+                status=Job.RUNNING, started=timezone.now()
+            ):
+                claimed.append(pk)
+        return claimed
+
+    def requeue_stale(self, seconds: float) -> int:
+        """Put back jobs left running by a crashed worker."""
+
+        return self.filter(
+            status=Job.RUNNING,
+            started__lte=timezone.now() - timedelta(seconds=seconds),
+        ).update(status=Job.PENDING, started=None)
+
+    def expired(self) -> 'JobQuerySet':
+        return self.filter(expires__lte=timezone.now())
+
+
+class Job(models.Model):
+    """Background job model."""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4)
+    kind = models.CharField(max_length=100, verbose_name='Kind')
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='jobs',
+        verbose_name='User',
+    )
+    payload = models.TextField(default='{}', verbose_name='Payload')
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING,
+        verbose_name='Status',
+    )
+    result = models.FileField(
+        upload_to='jobs/', blank=True, verbose_name='Result'
+    )
+    error = models.TextField(blank=True, verbose_name='Error')
+    progress = models.TextField(default='{}', verbose_name='Progress')
+    created = models.DateTimeField(auto_now_add=True, verbose_name='Created')
+    started = models.DateTimeField(null=True, verbose_name='Started')
+    finished = models.DateTimeField(null=True, verbose_name='Finished')
+    expires = models.DateTimeField(
+        null=True, db_index=True, verbose_name='Expires'
+    )
+
+    objects = JobQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Job'
+        verbose_name_plural = 'Jobs'
+        ordering = ('-created',)
+        indexes = (models.Index(fields=('status', 'created')),)
+
+    def __str__(self):
+        return f'{self.kind} job {self.id} ({self.status})'
+
+    @property
+    def params(self) -> dict:
+        return json.loads(self.payload)
+
+    def report(self, **progress) -> None:
+        """Store the progress of a running job."""
+
+        self.progress = json.dumps(progress)
+        self.save(update_fields=('progress',))
+
+    def finish(self, status: str, error: str = '') -> None:
+        """Set the final status and schedule the job expiry.
+
+        Only the fields of the outcome are written, the owner may be
+        gone by now.
+        """
+
+        self.status = status
+        self.error = error
+        self.finished = timezone.now()
+        self.expires = self.finished + timedelta(
+            seconds=settings.JOB_RESULT_TTL_SECONDS
+        )
+        self.save(update_fields=(
+            'status', 'error', 'finished', 'expires', 'result'
+        ))
@@ -0,0 +1,30 @@
+from typing import Callable, Dict, Optional, Tuple, Union
+
+from django.core.files.base import File
+
+JobResult = Optional[Tuple[str, Union[bytes, File]]]
+JobHandler = Callable[..., JobResult]
+
+_handlers: Dict[str, JobHandler] = {}
+
+
+def register(kind: str) -> Callable[[JobHandler], JobHandler]:
+    """Register a function as the handler of a job kind.
+
+    The handler gets the job and returns an optional (filename, content)
+    pair which is stored as the job result. Content is either bytes or
+    a file, closed once it is stored.
+    """
+
+    def decorator(handler: JobHandler) -> JobHandler:
+        _handlers[kind] = handler
+        return handler
+
+    return decorator
+
+
+def get_handler(kind: str) -> JobHandler:
+    try:
+        return _handlers[kind]
+    except KeyError:
+        raise LookupError(f'No handler registered for "{kind}" jobs.')
@@ -0,0 +1,41 @@
+import logging
+import traceback
+
+from django.core.files.base import ContentFile, File
+
+from jobs.models import Job
+from jobs.registry import get_handler
+
+logger = logging.getLogger(__name__)
+
+
+def run_job(job_id) -> str:
+    """Run a claimed job, store its result and return the final status."""
+
+    job = Job.objects.select_related('user').get(pk=job_id)
+    try:
+        result = get_handler(job.kind)(job)
+    except Exception:
+        logger.exception('Job %s failed', job_id)
+        job.finish(Job.FAILED, traceback.format_exc())
+        return job.status
+    if result is not None:
+        filename, content = result
+        if not isinstance(content, File):
+            content = ContentFile(content)
+        with content:
+            job.result.save(f'{job.id}/{filename}', content, save=False)
+    job.finish(Job.DONE)
+    return job.status
+
+
+def purge_expired() -> int:
+    """Delete expired jobs together with their result files."""
+
+    purged = 0
+    for job in Job.objects.expired().iterator():
+        if job.result:
+            job.result.delete(save=False)
+        job.delete()
+        purged += 1
+    return purged
@@ -2,16 +2,44 @@ from django.contrib import admin
 from django.contrib.auth.models import Group
 from django.core.exceptions import ValidationError
 from django.db import models
-from django.db.models.functions import Lower
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Lower
 from django.forms import BaseInlineFormSet, CheckboxSelectMultiple
 from django.utils.html import format_html
 
+from foodgram.admin_tools import (BackgroundDeleteMixin, InputFilter,
+                                  LargeTableMixin, PreloadedAutocompleteSelect,
+                                  preload_widgets)
+from recipes.counters import recount
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                             ShoppingCart, Tag)
+from recipes.purge import deactivate_recipe
 
 admin.site.unregister(Group)
 
 
+def count_of(model):
+    """Rows of the model pointing to the recipe, as a subquery."""
+
+    return Coalesce(
+        Subquery(
+            model.objects.filter(recipe=OuterRef('pk')).order_by().values(
+                'recipe'
+            ).annotate(count=Count('pk')).values('count'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+class AuthorFilter(InputFilter):
+    """Recipes of authors by the username prefix."""
+
+    title = 'author'
+    parameter_name = 'author'
+    lookup = 'author__username__istartswith'
+
+
 class RecipeInlineFormset(BaseInlineFormSet):
     """Formset to prevent all ingrediets deletion."""
 
@@ -20,6 +48,12 @@ class RecipeInlineFormset(BaseInlineFormSet):
             raise ValidationError('You cannot delete all ingredients!')
         super().clean()
 
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        if i < self.initial_form_count():
+            preload_widgets(form)
+        return form
+
 
 class RecipeIngredientInline(admin.TabularInline):
     """Inline for recipe ingredients."""
@@ -36,10 +70,23 @@ class RecipeIngredientInline(admin.TabularInline):
         qs = super().get_queryset(request)
         return qs.select_related('ingredient', 'recipe')
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'ingredient':
+            kwargs['widget'] = PreloadedAutocompleteSelect(
+                db_field.remote_field, self.admin_site,
+                using=kwargs.get('using'),
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
     def has_delete_permission(self, request, obj=None):
-        """No deletion checkbox if there's only 1 recipe ingredient left."""
+        """No deletion checkbox if there's only 1 recipe ingredient left.
 
-        return obj.ingredients.count() > 1
+        Ingredients of the recipe are counted by RecipeAdmin.get_queryset.
+        """
+
+        return super().has_delete_permission(request, obj) and (
+            obj is None or obj.ingredients_count > 1
+        )
 
 
 class TagInline(admin.TabularInline):
@@ -73,7 +120,7 @@ class TagsAdmin(admin.ModelAdmin):
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(BackgroundDeleteMixin, LargeTableMixin, admin.ModelAdmin):
     """Admin interface for recipes."""
 
     readonly_fields = ('times_favorited',)
@@ -81,13 +128,18 @@ class RecipeAdmin(admin.ModelAdmin):
         'name',
         'author',
         'recipe_tags',
+        'times_favorited',
         'image_display',
     )
-    list_filter = ('name', 'tags', 'author')
+    list_filter = ('tags', AuthorFilter)
+    search_fields = ('name',)
+    autocomplete_fields = ('author',)
     inlines = (RecipeIngredientInline,)
     formfield_overrides = {
         models.ManyToManyField: {'widget': CheckboxSelectMultiple},
     }
+    deactivate_function = deactivate_recipe
+    purge_kind = 'purge_recipe'
 
     def recipe_tags(self, obj):
         """Recipes tags for recipe list."""
@@ -95,9 +147,11 @@ class RecipeAdmin(admin.ModelAdmin):
         return [tag.name for tag in obj.tags.all()]
 
     def times_favorited(self, obj):
-        """Times favorited field for recipe list."""
+        """Times favorited field for recipe list, 0 for new recipes."""
+
+        return getattr(obj, 'favorites_count', 0)
 
-        return obj.favorited
+    times_favorited.admin_order_field = 'favorites_count'
 
     def get_fields(self, request, obj=None, **kwargs):
         """Moves times_favorited to the first place."""
@@ -106,10 +160,27 @@ class RecipeAdmin(admin.ModelAdmin):
         return [fields[-1]] + fields[:-1]
 
     def get_queryset(self, request):
-        """Prefetching related to optimize db usage."""
+        """Prefetching related and counting favorites in bulk."""
 
         qs = super().get_queryset(request)
-        return qs.prefetch_related('tags', 'ingredients')
+        return qs.select_related('author').prefetch_related('tags').annotate(
+            favorites_count=count_of(Favorite),
+            ingredients_count=count_of(RecipeIngredient),
+        )
+
+    def save_model(self, request, obj, form, change):
+        """Every change of a recipe, its tags or ingredients is a version.
+
+        Moving a recipe to another author fixes the counts of both.
+        """
+
+        if change:
+            obj.version = models.F('version') + 1
+        super().save_model(request, obj, form, change)
+        if change:
+            obj.refresh_from_db(fields=('version',))
+        if change and 'author' in form.changed_data:
+            recount((form.initial['author'], obj.author_id))
 
 
 @admin.register(Ingredient)
@@ -126,18 +197,20 @@ class IngredientAdmin(admin.ModelAdmin):
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(LargeTableMixin, admin.ModelAdmin):
     """Admin interface for favorites."""
 
     list_display = ('user', 'recipe')
     list_select_related = True
+    autocomplete_fields = ('user', 'recipe')
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(LargeTableMixin, admin.ModelAdmin):
     """Admin interface for the shopping cart."""
 
     list_display = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
 
     def get_queryset(self, request):
         """Queries optimization."""
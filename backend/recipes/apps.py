@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class RecipesConfig(AppConfig):
     name = 'recipes'
+
+    def ready(self):
+        """Connect signal handlers."""
+
+        from recipes import signals  # noqa: F401
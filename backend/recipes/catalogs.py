@@ -0,0 +1,56 @@
+from datetime import datetime
+from typing import Iterable, Optional
+
+from django.db.models import Subquery
+from django.utils import timezone
+
+from recipes.models import Catalog
+from users.models import User
+
+
+def touch(*models) -> None:
+    """Record a change of the catalogs of the models."""
+
+    now = timezone.now()
+    for model in models:
+        label = model._meta.label_lower
+        if not Catalog.objects.filter(label=label).update(modified=now):
+            Catalog.objects.bulk_create(
+                [Catalog(label=label, modified=now)], ignore_conflicts=True
+            )
+
+
+def changed(model) -> Optional[datetime]:
+    """Time of the last change of the catalog of a model, if any."""
+
+    return Catalog.objects.filter(
+        label=model._meta.label_lower
+    ).values_list('modified', flat=True).first()
+
+
+def cache_key(model) -> str:
+    """Cache key of the catalog of a model at its last change.
+
+    Every process sees the same time in the database, so a change made
+    by any of them retires the catalogs cached by all the others.
+    """
+
+    stamp = changed(model)
+    stamp = stamp.timestamp() if stamp else 0.0
+    return f'{model.catalog_cache_key}-{stamp:.6f}'
+
+
+def last_change() -> Subquery:
+    """Time of the last change of any catalog, as a subquery."""
+
+    return Subquery(
+        Catalog.objects.order_by('-modified').values('modified')[:1]
+    )
+
+
+def touch_relations(user_ids: Iterable[int]) -> None:
+    """Record a change of favorites, shopping carts or follows of users."""
+
+    User.objects.filter(pk__in=list(user_ids)).update(
+        relations_modified=timezone.now()
+    )
@@ -0,0 +1,44 @@
+from typing import Iterable, Optional
+
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Recipe
+from users.models import User
+
+
+def counted_recipes():
+    """Active recipes of a user counted with a subquery."""
+
+    return Coalesce(
+        Subquery(
+            Recipe.objects.filter(
+                author=OuterRef('pk'), is_active=True
+            ).order_by().values(
+                'author'
+            ).annotate(count=Count('pk')).values('count'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def recount(
+    author_ids: Optional[Iterable[int]] = None, batch_size: int = 1000
+) -> int:
+    """Fix recipes_count of the authors (of everybody by default).
+
+    Only drifted users are written, their number is returned.
+    """
+
+    users = User.objects.all()
+    if author_ids is not None:
+        users = users.filter(pk__in=list(author_ids))
+    drifted = list(users.annotate(actual=counted_recipes()).exclude(
+        recipes_count=F('actual')
+    ).values_list('pk', flat=True))
+    for start in range(0, len(drifted), batch_size):
+        User.objects.filter(pk__in=drifted[start:start + batch_size]).update(
+            recipes_count=counted_recipes()
+        )
+    return len(drifted)
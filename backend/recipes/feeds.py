@@ -0,0 +1,145 @@
+import heapq
+from itertools import islice
+from typing import Iterable, List, Set
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from recipes.importers import chunked
+from recipes.models import FeedEntry, Recipe
+from users.models import Subscription, User
+
+CELEBRITIES_CACHE_KEY = 'feed-celebrities'
+
+
+def celebrities() -> Set[int]:
+    """Ids of authors with too many followers to fan out to, cached."""
+
+    ids = cache.get(CELEBRITIES_CACHE_KEY)
+    if ids is None:
+        ids = set(Subscription.objects.values('author_id').annotate(
+            followers=Count('id')
+        ).filter(
+            followers__gt=settings.FEED_FANOUT_MAX_FOLLOWERS
+        ).values_list('author_id', flat=True))
+        cache.set(
+            CELEBRITIES_CACHE_KEY, ids, settings.FEED_CELEBRITIES_CACHE_SECONDS
+        )
+    return ids
+
+
+def fan_out(recipe: Recipe) -> int:
+    """Put a new recipe into the feeds of the author's followers."""
+
+    if recipe.author_id in celebrities():
+        return 0
+    followers = Subscription.objects.filter(
+        author_id=recipe.author_id
+    ).values_list('user_id', flat=True).iterator()
+    created = 0
+    for chunk in chunked(followers, settings.FEED_CHUNK_SIZE):
+        FeedEntry.objects.bulk_create(
+            [
+                FeedEntry(
+                    user_id=user_id,
+                    recipe_id=recipe.id,
+                    author_id=recipe.author_id,
+                    pub_date=recipe.pub_date,
+                )
+                for user_id in chunk
+            ],
+            ignore_conflicts=True,
+        )
+        created += len(chunk)
+    return created
+
+
+def backfill(user_id: int, author_ids: Iterable[int]) -> None:
+    """Put the latest recipes of newly followed authors into a feed."""
+
+    author_ids = set(author_ids) - celebrities()
+    entries = []
+    for author_id in author_ids:
+        entries.extend(
+            FeedEntry(
+                user_id=user_id,
+                recipe_id=recipe_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for recipe_id, pub_date in Recipe.objects.visible().filter(
+                author_id=author_id
+            ).order_by('-pub_date').values_list('id', 'pub_date')[
+                :settings.FEED_BACKFILL_SIZE
+            ]
+        )
+    FeedEntry.objects.bulk_create(
+        entries, batch_size=settings.FEED_CHUNK_SIZE, ignore_conflicts=True
+    )
+
+
+def trim(user_id: int, author_ids: Iterable[int]) -> None:
+    """Remove recipes of unfollowed authors from a feed."""
+
+    FeedEntry.objects.filter(
+        user_id=user_id, author_id__in=list(author_ids)
+    ).delete()
+
+
+class Timeline:
+    """Recipe ids of a feed, newest first, sliceable for pagination.
+
+    Recipes are pushed into the feeds of followers when published, but
+    authors with more than FEED_FANOUT_MAX_FOLLOWERS followers are not
+    pushed anywhere: their recipes are pulled on read and merged in by
+    publication date. Recipes being deleted and recipes of deactivated
+    authors are left out.
+    """
+
+    def __init__(self, user: User) -> None:
+        """Initialization, celebrities followed by the user are found."""
+
+        self.user = user
+        self.pulled = list(Subscription.objects.filter(
+            user=user, author_id__in=celebrities()
+        ).values_list('author_id', flat=True))
+
+    def _pushed(self):
+        return FeedEntry.objects.filter(
+            user=self.user,
+            recipe__is_active=True,
+            author__is_active=True,
+        ).exclude(author_id__in=self.pulled)
+
+    def _pulled(self):
+        return Recipe.objects.visible().filter(author_id__in=self.pulled)
+
+    def count(self) -> int:
+        """Number of recipes in the feed."""
+
+        count = self._pushed().count()
+        if self.pulled:
+            count += self._pulled().count()
+        return count
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def __getitem__(self, item: slice) -> List[int]:
+        if not isinstance(item, slice) or item.step:
+            raise TypeError('Timelines support plain slices only.')
+        start, stop = item.start or 0, item.stop
+        pushed = self._pushed().order_by('-pub_date', '-recipe_id')
+        if not self.pulled:
+            return list(
+                pushed.values_list('recipe_id', flat=True)[start:stop]
+            )
+        merged = heapq.merge(
+            pushed.values_list('pub_date', 'recipe_id')[:stop],
+            self._pulled().order_by('-pub_date', '-id').values_list(
+                'pub_date', 'id'
+            )[:stop],
+            reverse=True,
+        )
+        return [recipe_id for _, recipe_id in islice(merged, start, stop)]
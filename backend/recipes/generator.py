@@ -0,0 +1,463 @@
+import csv
+import io
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+
+from recipes.counters import recount
+from recipes.feeds import CELEBRITIES_CACHE_KEY, celebrities
+from recipes.importers import IngredientImporter, TagImporter, chunked
+from recipes.models import (Favorite, FeedEntry, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, Tag)
+from recipes.popularity import rebuild as rebuild_popularity
+from recipes.similarity import index_recipes
+from users.models import Subscription, User
+
+POOL_SIZE = 1000
+UNITS = ('g', 'kg', 'ml', 'l', 'pcs', 'tbsp', 'tsp', 'cup', 'pinch')
+
+
+@dataclass
+class GeneratorConfig:
+    """Sizes and distributions of the generated data."""
+
+    users: int = 1000
+    recipes: int = 5000
+    tags: int = 10
+    ingredients: int = 500
+    min_ingredients: int = 3
+    max_ingredients: int = 12
+    max_tags: int = 3
+    follows_per_user: float = 5.0
+    favorites_per_user: float = 10.0
+    carts_per_user: float = 3.0
+    author_zipf: float = 1.2
+    recipe_zipf: float = 1.1
+    ingredient_zipf: float = 1.0
+    days: int = 365
+    image: str = 'recipes/generated.jpg'
+    password: Optional[str] = None
+    seed: int = 0
+    chunk_size: int = 10000
+
+
+class ZipfSampler:
+    """Draws items by rank, rank k with probability 1 / k ** exponent.
+
+    Ranks are shuffled over the items, so the popular ones are spread
+    over the ids. An exponent of 0 is the uniform distribution.
+    """
+
+    def __init__(
+        self, size: int, exponent: float, rng: np.random.Generator
+    ) -> None:
+        """Initialization, the cumulative distribution is precomputed."""
+
+        cdf = np.cumsum(np.arange(1, size + 1, dtype=np.float64) ** -exponent)
+        self.cdf = cdf / cdf[-1]
+        self.order = rng.permutation(size)
+        self.rng = rng
+
+    def draw(self, count: int) -> np.ndarray:
+        """Indexes of count items drawn with replacement."""
+
+        ranks = np.searchsorted(self.cdf, self.rng.random(count), 'right')
+        return self.order[np.minimum(ranks, len(self.order) - 1)]
+
+
+def insert_rows(
+    model, fields: Sequence[str], rows: Iterable[Sequence], chunk_size: int
+) -> int:
+    """Insert raw rows in chunks, with COPY on PostgreSQL.
+
+    Values are prepared by the model fields, as the ORM would store
+    them, but no model instances are built. Return the number of rows.
+    """
+
+    fields = [model._meta.get_field(name) for name in fields]
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    columns = ', '.join(quote(field.column) for field in fields)
+    inserted = 0
+    for chunk in chunked(rows, chunk_size):
+        values = [
+            [
+                field.get_db_prep_save(value, connection)
+                for field, value in zip(fields, row)
+            ]
+            for row in chunk
+        ]
+        with transaction.atomic(), connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(
+                    [r'\N' if value is None else value for value in row]
+                    for row in values
+                )
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f'COPY {table} ({columns}) FROM STDIN '
+                    f"WITH (FORMAT csv, NULL '\\N')",
+                    buffer,
+                )
+            else:
+                placeholders = ', '.join(['%s'] * len(fields))
+                cursor.executemany(
+                    f'INSERT INTO {table} ({columns}) '
+                    f'VALUES ({placeholders})',
+                    values,
+                )
+        inserted += len(chunk)
+    return inserted
+
+
+def reset_sequences(*models) -> None:
+    """Move id sequences past explicitly inserted ids."""
+
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def next_id(model) -> int:
+    """The id after the biggest one in the table."""
+
+    return (model.objects.aggregate(top=Max('id'))['top'] or 0) + 1
+
+
+class Generator:
+    """Synthetic users, recipes and relations for scale tests.
+
+    Authors of recipes, followed authors, favorited and carted recipes
+    and ingredients are drawn from Zipf distributions. Every step and
+    chunk has its own random generator derived from the seed, so the
+    same seed and options give the same data.
+    """
+
+    def __init__(
+        self,
+        config: GeneratorConfig,
+        progress: Optional[Callable[[str, int], None]] = None,
+    ) -> None:
+        """Initialization, text pools are drawn with a seeded Faker."""
+
+        self.config = config
+        self.progress = progress
+        self.now = timezone.now()
+        fake = Faker()
+        fake.seed_instance(config.seed)
+        self.first_names = [fake.first_name() for _ in range(POOL_SIZE)]
+        self.last_names = [fake.last_name() for _ in range(POOL_SIZE)]
+        self.words = [fake.word() for _ in range(POOL_SIZE)]
+        self.texts = [fake.paragraph() for _ in range(POOL_SIZE)]
+
+    def rng(self, *key: int) -> np.random.Generator:
+        """Random generator of a step or a chunk of a step."""
+
+        return np.random.default_rng([self.config.seed, *key])
+
+    def report(self, step: str, rows: int) -> None:
+        """Tell the progress callback a step is done."""
+
+        if self.progress:
+            self.progress(step, rows)
+
+    def chunks(self, ids: np.ndarray) -> Iterator[np.ndarray]:
+        """Ids a chunk at a time."""
+
+        size = self.config.chunk_size
+        for start in range(0, len(ids), size):
+            yield ids[start:start + size]
+
+    def insert(self, step: str, model, fields: List[str], rows) -> int:
+        """Insert the rows of a step and report them."""
+
+        inserted = insert_rows(model, fields, rows, self.config.chunk_size)
+        self.report(step, inserted)
+        return inserted
+
+    def run(self) -> None:
+        """Generate everything, then refresh counters and indexes."""
+
+        config = self.config
+        tags = self.catalog_tags()
+        ingredients = self.catalog_ingredients()
+        users = self.users()
+        if not len(users):
+            return
+        recipes = self.recipes(users)
+        self.subscriptions(users)
+        if len(recipes):
+            self.recipe_tags(recipes, tags)
+            self.recipe_ingredients(recipes, ingredients)
+            self.relations(
+                'favorites', Favorite, users, recipes,
+                config.favorites_per_user, 3,
+            )
+            self.relations(
+                'shopping carts', ShoppingCart, users, recipes,
+                config.carts_per_user, 4,
+            )
+        self.derive(users, recipes)
+
+    def catalog_tags(self) -> np.ndarray:
+        """New tags with unused colors, all tag ids are returned."""
+
+        start = next_id(Tag)
+        used = set(Tag.objects.values_list('color', flat=True))
+        rng = self.rng(0)
+        rows = []
+        for number in range(start, start + self.config.tags):
+            color = '#000000'
+            while color in used:
+                color = f'#{int(rng.integers(0x1000000)):06X}'
+            used.add(color)
+            word = self.words[number % POOL_SIZE]
+            rows.append({
+                'name': f'{word} {number}',
+                'slug': f'generated-{number}',
+                'color': color,
+            })
+        TagImporter(chunk_size=self.config.chunk_size).run(rows)
+        self.report('tags', len(rows))
+        return np.array(Tag.objects.values_list('id', flat=True))
+
+    def catalog_ingredients(self) -> np.ndarray:
+        """New ingredients, all ingredient ids are returned."""
+
+        start = next_id(Ingredient)
+        rows = [
+            {
+                'name': f'{self.words[number % POOL_SIZE]} {number}',
+                'measurement_unit': UNITS[number % len(UNITS)],
+            }
+            for number in range(start, start + self.config.ingredients)
+        ]
+        IngredientImporter(chunk_size=self.config.chunk_size).run(rows)
+        self.report('ingredients', len(rows))
+        return np.array(Ingredient.objects.values_list('id', flat=True))
+
+    def users(self) -> np.ndarray:
+        """Users with explicit ids, all sharing one password hash."""
+
+        start = next_id(User)
+        password = make_password(self.config.password)
+
+        def rows():
+            for number in range(self.config.users):
+                user_id = start + number
+                first = self.first_names[number % POOL_SIZE]
+                last = self.last_names[(number // POOL_SIZE) % POOL_SIZE]
+                yield (
+                    user_id, f'user{user_id}@generated.test',
+                    f'{last.lower()}{user_id}', first, last, password,
+                    False, False, True, self.now, self.now, 0,
+                )
+
+        self.insert('users', User, [
+            'id', 'email', 'username', 'first_name', 'last_name',
+            'password', 'is_superuser', 'is_staff', 'is_active',
+            'date_joined', 'modified', 'recipes_count',
+        ], rows())
+        reset_sequences(User)
+        return np.arange(start, start + self.config.users)
+
+    def recipes(self, users: np.ndarray) -> np.ndarray:
+        """Recipes with explicit ids, authors drawn by Zipf."""
+
+        start = next_id(Recipe)
+        config = self.config
+        authors = ZipfSampler(len(users), config.author_zipf, self.rng(1))
+
+        def rows():
+            ids = np.arange(start, start + config.recipes)
+            for number, ids in enumerate(self.chunks(ids)):
+                rng = self.rng(2, number)
+                author_ids = users[authors.draw(len(ids))]
+                ages = rng.random(len(ids)) * config.days
+                times = rng.integers(1, 180, len(ids))
+                for recipe_id, author_id, age, cooking_time in zip(
+                    ids.tolist(), author_ids.tolist(), ages.tolist(),
+                    times.tolist(),
+                ):
+                    published = self.now - timedelta(days=age)
+                    word = recipe_id - start
+                    yield (
+                        recipe_id, author_id,
+                        f'{self.words[word % POOL_SIZE]} '
+                        f'{self.words[(word // 7) % POOL_SIZE]} {recipe_id}',
+                        config.image, self.texts[word % POOL_SIZE],
+                        published, published, 1, 0.0, True, cooking_time,
+                    )
+
+        self.insert('recipes', Recipe, [
+            'id', 'author', 'name', 'image', 'text', 'pub_date', 'modified',
+            'version', 'popularity', 'is_active', 'cooking_time',
+        ], rows())
+        reset_sequences(Recipe)
+        return np.arange(start, start + config.recipes)
+
+    def per_owner(
+        self, rng, owners: np.ndarray, counts: np.ndarray, draw
+    ) -> np.ndarray:
+        """Unique (owner, item) pairs, counts[i] draws for owners[i]."""
+
+        repeated = np.repeat(owners, counts)
+        if not len(repeated):
+            return np.empty((0, 2), dtype=np.int64)
+        return np.unique(
+            np.stack([repeated, draw(rng, len(repeated))], axis=1), axis=0
+        )
+
+    def recipe_tags(self, recipes: np.ndarray, tags: np.ndarray) -> None:
+        """Up to max_tags tags per recipe, uniformly."""
+
+        def draw(rng, size):
+            return tags[rng.integers(len(tags), size=size)]
+
+        def rows():
+            for number, chunk in enumerate(self.chunks(recipes)):
+                rng = self.rng(5, number)
+                counts = rng.integers(1, self.config.max_tags + 1, len(chunk))
+                yield from self.per_owner(rng, chunk, counts, draw).tolist()
+
+        if len(tags):
+            self.insert(
+                'recipe tags', Recipe.tags.through, ['recipe', 'tag'], rows()
+            )
+
+    def recipe_ingredients(
+        self, recipes: np.ndarray, ingredients: np.ndarray
+    ) -> None:
+        """Ingredient rows, common ingredients drawn by Zipf."""
+
+        config = self.config
+        sampler = ZipfSampler(
+            len(ingredients), config.ingredient_zipf, self.rng(6)
+        )
+
+        def draw(rng, size):
+            return ingredients[sampler.draw(size)]
+
+        def rows():
+            for number, chunk in enumerate(self.chunks(recipes)):
+                rng = self.rng(7, number)
+                counts = rng.integers(
+                    config.min_ingredients, config.max_ingredients + 1,
+                    len(chunk),
+                )
+                pairs = self.per_owner(rng, chunk, counts, draw)
+                amounts = rng.integers(1, 500, len(pairs))
+                for (recipe_id, ingredient_id), amount in zip(
+                    pairs.tolist(), amounts.tolist()
+                ):
+                    yield recipe_id, ingredient_id, amount
+
+        if len(ingredients):
+            self.insert('recipe ingredients', RecipeIngredient, [
+                'recipe', 'ingredient', 'amount'
+            ], rows())
+
+    def subscriptions(self, users: np.ndarray) -> None:
+        """Users follow authors drawn by the same Zipf as recipe authors."""
+
+        authors = ZipfSampler(
+            len(users), self.config.author_zipf, self.rng(1)
+        )
+
+        def draw(rng, size):
+            return users[authors.draw(size)]
+
+        def rows():
+            for number, chunk in enumerate(self.chunks(users)):
+                rng = self.rng(8, number)
+                counts = rng.poisson(self.config.follows_per_user, len(chunk))
+                pairs = self.per_owner(rng, chunk, counts, draw)
+                yield from pairs[pairs[:, 0] != pairs[:, 1]].tolist()
+
+        self.insert('subscriptions', Subscription, ['user', 'author'], rows())
+        cache.delete(CELEBRITIES_CACHE_KEY)
+
+    def relations(
+        self,
+        step: str,
+        model,
+        users: np.ndarray,
+        recipes: np.ndarray,
+        mean: float,
+        key: int,
+    ) -> None:
+        """Favorites or carts, a Poisson number per user, recipes by Zipf."""
+
+        sampler = ZipfSampler(
+            len(recipes), self.config.recipe_zipf, self.rng(key)
+        )
+
+        def draw(rng, size):
+            return recipes[sampler.draw(size)]
+
+        def rows():
+            for number, chunk in enumerate(self.chunks(users)):
+                rng = self.rng(key, number)
+                counts = rng.poisson(mean, len(chunk))
+                yield from self.per_owner(rng, chunk, counts, draw).tolist()
+
+        self.insert(step, model, ['user', 'recipe'], rows())
+
+    def derive(self, users: np.ndarray, recipes: np.ndarray) -> None:
+        """Counters, popularity, similarity index and feeds."""
+
+        size = self.config.chunk_size
+        ids = users.tolist()
+        for start in range(0, len(ids), size):
+            recount(ids[start:start + size])
+        self.report('recipes counts', len(ids))
+        self.report('popularity', rebuild_popularity(size))
+        ids = recipes.tolist()
+        for start in range(0, len(ids), size):
+            index_recipes(ids[start:start + size])
+        self.report('similarity index', len(ids))
+        self.report('feed entries', self.feeds(users))
+
+    def feeds(self, users: np.ndarray) -> int:
+        """Backfill the new feeds with the latest recipes of followed authors.
+
+        Authors with too many followers are pulled on read, as usual.
+        """
+
+        quote = connection.ops.quote_name
+        feed = quote(FeedEntry._meta.db_table)
+        recipe = quote(Recipe._meta.db_table)
+        follow = quote(Subscription._meta.db_table)
+        excluded = sorted(celebrities()) or [0]
+        created = 0
+        for chunk in self.chunks(users):
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {feed} (user_id, recipe_id, author_id, '
+                    f'pub_date) SELECT s.user_id, r.id, r.author_id, '
+                    f'r.pub_date FROM {follow} s JOIN (SELECT id, author_id, '
+                    f'pub_date, ROW_NUMBER() OVER (PARTITION BY author_id '
+                    f'ORDER BY pub_date DESC) AS position FROM {recipe}) r '
+                    f'ON r.author_id = s.author_id '
+                    f'WHERE s.user_id BETWEEN %s AND %s AND r.position <= %s '
+                    f'AND s.author_id NOT IN '
+                    f'({", ".join(["%s"] * len(excluded))})',
+                    [
+                        int(chunk[0]), int(chunk[-1]),
+                        settings.FEED_BACKFILL_SIZE, *excluded,
+                    ],
+                )
+                created += cursor.rowcount
+        return created
@@ -0,0 +1,417 @@
+import csv
+import io
+import json
+import time
+from dataclasses import dataclass
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from recipes.catalogs import touch
+from recipes.counters import recount
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.similarity import index_recipes
+from users.models import User
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+@dataclass
+class ImportStats:
+    """Running totals of an import."""
+
+    rows: int = 0
+    created: int = 0
+    updated: int = 0
+    skipped: int = 0
+    started: float = 0.0
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def rate(self) -> float:
+        """Rows per second since the import has started."""
+
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+def chunked(iterable: Iterable, size: int) -> Iterator[list]:
+    """Split an iterable into lists of at most size elements."""
+
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+
+def read_rows(path: str, fieldnames: Optional[List[str]] = None):
+    """Stream rows from a CSV, a JSON lines or a JSON array file.
+
+    CSV and JSON lines are read row by row, a JSON array has to be
+    parsed as a whole, so prefer JSON lines for big files.
+    """
+
+    with open(path, encoding='utf-8', newline='') as ifile:
+        if path.endswith('.csv'):
+            yield from csv.DictReader(ifile, fieldnames=fieldnames)
+        elif path.endswith('.jsonl'):
+            for line in ifile:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from json.load(ifile)
+
+
+class BaseImporter:
+    """Chunked upsert of rows identified by a natural key.
+
+    Rows whose key already exists get their update_fields refreshed,
+    the rest is inserted, so running an import twice is harmless.
+    """
+
+    model = None
+    key_fields: Tuple[str, ...] = ()
+    update_fields: Tuple[str, ...] = ()
+    csv_fieldnames: Optional[List[str]] = None
+    supports_copy = True
+    json_only = False
+
+    def __init__(
+        self,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        use_copy: bool = False,
+        progress: Optional[Callable[[ImportStats], None]] = None,
+    ) -> None:
+        self.chunk_size = chunk_size
+        self.use_copy = (
+            use_copy
+            and self.supports_copy
+            and connection.vendor == 'postgresql'
+        )
+        self.progress = progress
+        self.stats = ImportStats()
+
+    def __repr__(self) -> str:
+        return f'{self.model._meta.verbose_name_plural} importer'
+
+    def build(self, row: dict):
+        """Turn a raw row into an unsaved model instance."""
+
+        return self.model(**{
+            field: row[field]
+            for field in self.key_fields + self.update_fields
+        })
+
+    def key(self, obj) -> tuple:
+        return tuple(getattr(obj, field) for field in self.key_fields)
+
+    def before_create(self, objs: list) -> None:
+        """Finish the objects which are about to be inserted."""
+
+    def before_copy(self, objs: list) -> None:
+        """Finish the objects of a chunk which is about to be COPied."""
+
+    def run(self, rows: Iterable[dict]) -> ImportStats:
+        """Import all rows chunk by chunk, one transaction per chunk."""
+
+        self.stats = ImportStats(started=time.monotonic())
+        for chunk in chunked(rows, self.chunk_size):
+            self.stats.rows += len(chunk)
+            with transaction.atomic():
+                if self.use_copy:
+                    self.copy_chunk(chunk)
+                else:
+                    self.import_chunk(chunk)
+            if self.progress:
+                self.progress(self.stats)
+        if hasattr(self.model, 'catalog_cache_key'):
+            touch(self.model)
+        return self.stats
+
+    def existing(self, objs: list) -> Dict[tuple, object]:
+        """Already stored objects for the chunk, by natural key."""
+
+        lookup = {
+            f'{field}__in': {getattr(obj, field) for obj in objs}
+            for field in self.key_fields
+        }
+        return {
+            self.key(obj): obj
+            for obj in self.model.objects.filter(**lookup)
+        }
+
+    def auto_now_fields(self) -> list:
+        """Fields with auto_now, which bulk updates do not refresh."""
+
+        return [
+            field for field in self.model._meta.concrete_fields
+            if getattr(field, 'auto_now', False)
+        ]
+
+    def upsert(self, objs: list) -> list:
+        """Insert new objects and update the changed ones."""
+
+        unique = {self.key(obj): obj for obj in objs}
+        self.stats.skipped += len(objs) - len(unique)
+        existing = self.existing(list(unique.values()))
+        new, changed = [], []
+        for key, obj in unique.items():
+            current = existing.get(key)
+            if current is None:
+                new.append(obj)
+                continue
+            obj.pk = current.pk
+            if any(
+                getattr(obj, field) != getattr(current, field)
+                for field in self.update_fields
+            ):
+                changed.append(obj)
+        self.before_create(new)
+        self.model.objects.bulk_create(new, ignore_conflicts=True)
+        if changed:
+            refreshed = self.auto_now_fields()
+            for obj in changed:
+                for field in refreshed:
+                    field.pre_save(obj, add=False)
+            self.model.objects.bulk_update(changed, [
+                *self.update_fields, *(field.name for field in refreshed)
+            ])
+        self.stats.created += len(new)
+        self.stats.updated += len(changed)
+        return list(unique.values())
+
+    def import_chunk(self, rows: List[dict]) -> None:
+        self.upsert([self.build(row) for row in rows])
+
+    def copy_chunk(self, rows: List[dict]) -> None:
+        """COPY a chunk into a staging table and merge it in one statement.
+
+        Postgres only, used for big flat loads.
+        """
+
+        objs = list({
+            self.key(obj): obj for obj in map(self.build, rows)
+        }.values())
+        self.stats.skipped += len(rows) - len(objs)
+        self.before_copy(objs)
+        table = self.model._meta.db_table
+        fields = [
+            field for field in self.model._meta.concrete_fields
+            if not field.primary_key
+        ]
+        for field in fields:
+            for obj in objs:
+                field.pre_save(obj, add=True)
+        columns = ', '.join(f'"{field.column}"' for field in fields)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for obj in objs:
+            writer.writerow(
+                r'\N' if value is None else value
+                for value in (
+                    field.get_db_prep_save(
+                        getattr(obj, field.attname), connection
+                    )
+                    for field in fields
+                )
+            )
+        buffer.seek(0)
+        conflict = ', '.join(
+            f'"{self.model._meta.get_field(name).column}"'
+            for name in self.key_fields
+        )
+        update_columns = [
+            f'"{self.model._meta.get_field(name).column}"'
+            for name in self.update_fields
+        ]
+        assigned = update_columns + [
+            f'"{field.column}"' for field in self.auto_now_fields()
+        ]
+        action = 'DO NOTHING'
+        if update_columns:
+            targets = ', '.join(f'"{table}".{c}' for c in update_columns)
+            values = ', '.join(f'EXCLUDED.{c}' for c in update_columns)
+            assigned_values = ', '.join(f'EXCLUDED.{c}' for c in assigned)
+            action = (
+                f'DO UPDATE SET ({", ".join(assigned)}) = '
+                f'ROW({assigned_values}) '
+                f'WHERE ({targets}) IS DISTINCT FROM ({values})'
+            )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMP TABLE import_staging ON COMMIT DROP AS '
+                f'SELECT {columns} FROM "{table}" WITH NO DATA'
+            )
+            cursor.copy_expert(
+                f'COPY import_staging ({columns}) FROM STDIN '
+                f"WITH (FORMAT csv, NULL '\\N')",
+                buffer,
+            )
+            cursor.execute(
+                f'INSERT INTO "{table}" ({columns}) '
+                f'SELECT {columns} FROM import_staging '
+                f'ON CONFLICT ({conflict}) {action} RETURNING (xmax = 0)'
+            )
+            inserted = [row[0] for row in cursor.fetchall()]
+        self.stats.created += sum(inserted)
+        self.stats.updated += len(inserted) - sum(inserted)
+
+
+class IngredientImporter(BaseImporter):
+    """Ingredients, identified by name and measurement unit."""
+
+    model = Ingredient
+    key_fields = ('name', 'measurement_unit')
+    csv_fieldnames = ['name', 'measurement_unit']
+
+
+class TagImporter(BaseImporter):
+    """Tags, identified by slug."""
+
+    model = Tag
+    key_fields = ('slug',)
+    update_fields = ('name', 'color')
+
+
+class UserImporter(BaseImporter):
+    """Users, identified by email.
+
+    A password_hash column is stored as is, a plain text password is
+    hashed with IMPORT_PASSWORD_HASHER, only for the created users.
+    Users without either get an unusable password. Passwords of
+    existing users are never updated.
+    """
+
+    model = User
+    key_fields = ('email',)
+    update_fields = ('username', 'first_name', 'last_name')
+
+    def build(self, row: dict):
+        user = super().build(row)
+        user.password = row.get('password_hash') or make_password(None)
+        user.import_password = (
+            None if row.get('password_hash') else row.get('password')
+        )
+        return user
+
+    def before_create(self, objs: list) -> None:
+        for user in objs:
+            if user.import_password:
+                user.password = make_password(
+                    user.import_password,
+                    hasher=settings.IMPORT_PASSWORD_HASHER,
+                )
+
+    def before_copy(self, objs: list) -> None:
+        existing = self.existing(objs)
+        self.before_create([
+            user for user in objs if self.key(user) not in existing
+        ])
+
+
+class RecipeImporter(BaseImporter):
+    """Recipes with their tags and ingredient rows.
+
+    A recipe is identified by its author email and name, tags by slugs
+    and ingredients by name and measurement unit. Nested rows make it
+    JSON only.
+    """
+
+    model = Recipe
+    key_fields = ('author_id', 'name')
+    update_fields = ('text', 'cooking_time', 'image')
+    supports_copy = False
+    json_only = True
+
+    def _lookups(self, rows: List[dict]):
+        """Resolve authors, tags and ingredients of a chunk in bulk."""
+
+        authors = dict(User.objects.filter(
+            email__in={row['author'] for row in rows}
+        ).values_list('email', 'id'))
+        tags = dict(Tag.objects.filter(
+            slug__in={slug for row in rows for slug in row.get('tags', ())}
+        ).values_list('slug', 'id'))
+        ingredients = {
+            (name, unit): pk
+            for pk, name, unit in Ingredient.objects.filter(name__in={
+                item['name']
+                for row in rows
+                for item in row.get('ingredients', ())
+            }).values_list('id', 'name', 'measurement_unit')
+        }
+        return authors, tags, ingredients
+
+    def import_chunk(self, rows: List[dict]) -> None:
+        authors, tags, ingredients = self._lookups(rows)
+        known = [row for row in rows if row['author'] in authors]
+        self.stats.skipped += len(rows) - len(known)
+        rows = known
+        recipes = self.upsert([
+            Recipe(
+                author_id=authors[row['author']],
+                name=row['name'],
+                text=row['text'],
+                cooking_time=row['cooking_time'],
+                image=row.get('image', ''),
+            )
+            for row in rows
+        ])
+        ids = {
+            self.key(recipe): recipe.pk
+            for recipe in self.existing(recipes).values()
+        }
+        tag_links, recipe_ingredients = [], []
+        for row in rows:
+            recipe_id = ids[(authors[row['author']], row['name'])]
+            tag_links.extend(
+                Recipe.tags.through(recipe_id=recipe_id, tag_id=tags[slug])
+                for slug in row.get('tags', ()) if slug in tags
+            )
+            recipe_ingredients.extend(
+                RecipeIngredient(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredients[key],
+                    amount=item['amount'],
+                )
+                for item, key in (
+                    (item, (item['name'], item['measurement_unit']))
+                    for item in row.get('ingredients', ())
+                )
+                if key in ingredients
+            )
+        Recipe.tags.through.objects.bulk_create(
+            tag_links, ignore_conflicts=True
+        )
+        RecipeIngredientImporter(chunk_size=self.chunk_size).upsert(
+            recipe_ingredients
+        )
+        index_recipes(ids.values())
+        recount(authors[row['author']] for row in rows)
+        Recipe.objects.filter(pk__in=ids.values()).update(
+            version=F('version') + 1, modified=timezone.now()
+        )
+
+
+class RecipeIngredientImporter(BaseImporter):
+    """Ingredient rows of recipes, used by RecipeImporter."""
+
+    model = RecipeIngredient
+    key_fields = ('recipe_id', 'ingredient_id')
+    update_fields = ('amount',)
+
+
+IMPORTERS = {
+    'ingredients': IngredientImporter,
+    'tags': TagImporter,
+    'users': UserImporter,
+    'recipes': RecipeImporter,
+}
@@ -0,0 +1,60 @@
+import random
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from recipes.similarity import exact_similar, ingredient_sets, jaccard, nearest
+
+
+class Command(BaseCommand):
+    help = 'Compare LSH similar recipes with an exact Jaccard scan.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sample',
+            type=int,
+            default=100,
+            help='Number of recipes to query.',
+        )
+        parser.add_argument(
+            '--top-k', type=int, default=settings.SIMILARITY_TOP_K
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        top_k = options['top_k']
+        sets = {pk: ids for pk, ids in ingredient_sets().items() if ids}
+        sample = random.Random(options['seed']).sample(
+            sorted(sets), min(options['sample'], len(sets))
+        )
+        exact_seconds = approximate_seconds = 0.0
+        found = expected = 0
+        for recipe_id in sample:
+            started = time.perf_counter()
+            exact = exact_similar(recipe_id, sets, top_k)
+            exact_seconds += time.perf_counter() - started
+            started = time.perf_counter()
+            approximate = nearest(recipe_id, top_k)
+            approximate_seconds += time.perf_counter() - started
+            if not exact:
+                continue
+            threshold = exact[-1][1]
+            expected += len(exact)
+            found += min(len(exact), sum(
+                jaccard(sets[recipe_id], sets.get(pk, set())) >= threshold
+                for pk, _ in approximate
+            ))
+        queries = len(sample) or 1
+        self.stdout.write(
+            f'Exact scan: {exact_seconds / queries * 1000:.2f} ms per '
+            f'query over {len(sets)} recipes (ingredients in memory).'
+        )
+        self.stdout.write(
+            f'LSH index: {approximate_seconds / queries * 1000:.2f} ms '
+            f'per query (database included).'
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Recall@{top_k}: {found / (expected or 1):.3f} '
+            f'over {len(sample)} recipes.'
+        ))
@@ -0,0 +1,45 @@
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from recipes.recommendations import build
+
+
+class Command(BaseCommand):
+    help = 'Precompute "favorited together" recommendations of recipes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top-k',
+            type=int,
+            default=settings.RECOMMENDATIONS_TOP_K,
+            help='Recommendations to keep per recipe.',
+        )
+        parser.add_argument(
+            '--min-common',
+            type=int,
+            default=settings.RECOMMENDATIONS_MIN_COMMON,
+            help='Users who must have favorited both recipes.',
+        )
+        parser.add_argument(
+            '--recipe',
+            type=int,
+            action='append',
+            dest='recipes',
+            help='Refresh only this recipe, can be repeated.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        stored = build(
+            options['top_k'],
+            options['min_common'],
+            options['batch_size'],
+            options['recipes'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{stored} recommendations stored in '
+            f'{time.monotonic() - started:.2f}s.'
+        ))
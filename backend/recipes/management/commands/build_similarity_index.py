@@ -0,0 +1,22 @@
+import time
+
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from recipes.similarity import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the MinHash/LSH index of recipe ingredients.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        with transaction.atomic():
+            indexed = rebuild(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{indexed} recipes indexed in '
+            f'{time.monotonic() - started:.2f}s.'
+        ))
@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from recipes.popularity import decay, rebuild
+
+
+class Command(BaseCommand):
+    help = 'Decay popularity scores of recipes, run it on a schedule.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=float,
+            default=24,
+            help='Hours passed since the previous run.',
+        )
+        parser.add_argument(
+            '--half-life',
+            type=float,
+            default=settings.POPULARITY_HALF_LIFE_HOURS,
+            help='Hours it takes a score to halve.',
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Recompute scores from favorites and carts instead.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        if options['rebuild']:
+            updated = rebuild(options['batch_size'])
+            action = 'rebuilt'
+        else:
+            factor = 0.5 ** (options['hours'] / options['half_life'])
+            updated = decay(factor, options['batch_size'])
+            action = f'decayed by {factor:.4f}'
+        self.stdout.write(self.style.SUCCESS(
+            f'{updated} scores {action} in {time.monotonic() - started:.2f}s.'
+        ))
@@ -0,0 +1,38 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from recipes.snapshots import copy_media, dump
+
+
+class Command(BaseCommand):
+    help = 'Dump users, recipes and their relations into a snapshot file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--media-dir',
+            help='Directory to copy the referenced media files into.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        with open(options['path'], 'w', encoding='utf-8') as ofile:
+            media = dump(ofile, options['batch_size'])
+        self.stdout.write(
+            f'Tables dumped in {time.monotonic() - started:.2f}s.'
+        )
+        if options['media_dir']:
+            os.makedirs(options['media_dir'], exist_ok=True)
+            copied, missing = copy_media(
+                media, settings.MEDIA_ROOT, options['media_dir']
+            )
+            self.stdout.write(
+                f'{copied} media files copied, {len(missing)} missing.'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Snapshot written in {time.monotonic() - started:.2f}s.'
+        ))
@@ -0,0 +1,62 @@
+import time
+from dataclasses import fields
+
+from django.core.management import BaseCommand
+
+from recipes.generator import Generator, GeneratorConfig
+
+HELP = {
+    'users': 'Number of users.',
+    'recipes': 'Number of recipes.',
+    'tags': 'Number of new tags.',
+    'ingredients': 'Number of new ingredients, existing ones are used too.',
+    'min_ingredients': 'Least ingredients per recipe.',
+    'max_ingredients': 'Most ingredients per recipe.',
+    'max_tags': 'Most tags per recipe.',
+    'follows_per_user': 'Mean number of followed authors.',
+    'favorites_per_user': 'Mean number of favorites.',
+    'carts_per_user': 'Mean number of shopping cart entries.',
+    'author_zipf': 'Zipf exponent of recipes and followers per author.',
+    'recipe_zipf': 'Zipf exponent of favorites and carts per recipe.',
+    'ingredient_zipf': 'Zipf exponent of recipes per ingredient.',
+    'days': 'Recipes are published over this many past days.',
+    'image': 'Image path of every recipe.',
+    'password': 'Password of every user, unusable by default.',
+    'seed': 'Random seed, the same seed and options give the same data.',
+    'chunk_size': 'Rows per insert, COPY on PostgreSQL.',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate synthetic users, recipes, tags, ingredients, favorites, '
+        'shopping carts and subscriptions for scale tests.'
+    )
+
+    def add_arguments(self, parser):
+        for field in fields(GeneratorConfig):
+            parser.add_argument(
+                f'--{field.name.replace("_", "-")}',
+                type=str if field.name in ('image', 'password') else (
+                    field.type
+                ),
+                default=field.default,
+                help=HELP[field.name],
+            )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        def report(step, rows):
+            self.stdout.write(
+                f'{step}: {rows} rows, {time.monotonic() - started:.1f}s'
+            )
+
+        config = GeneratorConfig(**{
+            field.name: options[field.name]
+            for field in fields(GeneratorConfig)
+        })
+        Generator(config, report).run()
+        self.stdout.write(self.style.SUCCESS(
+            f'Data generated in {time.monotonic() - started:.1f}s.'
+        ))
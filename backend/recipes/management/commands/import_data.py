@@ -0,0 +1,52 @@
+from django.core.management import BaseCommand, CommandError
+
+from recipes.importers import DEFAULT_CHUNK_SIZE, IMPORTERS, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream a CSV, JSON lines or JSON file into the database in chunks. '
+        'Existing rows are updated, so the import can be safely re-run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTERS))
+        parser.add_argument('path')
+        parser.add_argument(
+            '--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE
+        )
+        parser.add_argument(
+            '--fieldnames',
+            help='Comma separated CSV columns, for files without a header.',
+        )
+        parser.add_argument(
+            '--copy',
+            action='store_true',
+            help='Load through COPY and a staging table (Postgres only).',
+        )
+
+    def report(self, stats):
+        self.stdout.write(
+            f'{stats.rows} rows: {stats.created} created, '
+            f'{stats.updated} updated, {stats.skipped} skipped, '
+            f'{stats.rate:.0f} rows/s'
+        )
+
+    def handle(self, *args, **options):
+        importer = IMPORTERS[options['kind']](
+            chunk_size=options['chunk_size'],
+            use_copy=options['copy'],
+            progress=self.report,
+        )
+        path = options['path']
+        if path.endswith('.csv') and importer.json_only:
+            raise CommandError(f'{importer!r} only reads JSON files.')
+        fieldnames = options['fieldnames']
+        rows = read_rows(path, fieldnames and fieldnames.split(','))
+        try:
+            stats = importer.run(rows)
+        except (OSError, KeyError, ValueError) as error:
+            raise CommandError(f'Import failed: {error!r}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {stats.rows} rows in {stats.elapsed:.1f}s.'
+        ))
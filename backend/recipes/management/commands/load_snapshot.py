@@ -0,0 +1,57 @@
+import time
+
+from django.core.management import BaseCommand, CommandError
+
+from recipes.snapshots import SnapshotLoader, copy_media, read
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk load a snapshot (or a dumpdata fixture) table by table. '
+        'Rows that already exist are matched by natural key, so it can be '
+        'merged into a live database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--media-dir',
+            help='Directory with the media files referenced by the snapshot.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        try:
+            snapshot = read(options['path'])
+        except (OSError, ValueError) as error:
+            raise CommandError(f'Cannot read the snapshot: {error!r}')
+        for label, count in sorted(snapshot.get('skipped', {}).items()):
+            self.stdout.write(self.style.WARNING(
+                f'{label}: {count} objects skipped, not part of snapshots'
+            ))
+        loader = SnapshotLoader(batch_size=options['batch_size'])
+        for report in loader.load(snapshot):
+            self.stdout.write(
+                f'{report.label}: {report.created} of {report.rows} rows '
+                f'inserted in {report.seconds:.2f}s'
+            )
+            if report.skipped:
+                self.stdout.write(self.style.WARNING(
+                    f'{report.label}: {report.skipped} rows skipped, they '
+                    f'clash with existing rows or refer to skipped ones'
+                ))
+        if options['media_dir']:
+            media_started = time.monotonic()
+            copied, missing = copy_media(
+                snapshot.get('media', ()), options['media_dir']
+            )
+            self.stdout.write(
+                f'{copied} media files copied in '
+                f'{time.monotonic() - media_started:.2f}s.'
+            )
+            for path in missing:
+                self.stderr.write(f'Missing media file: {path}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Snapshot loaded in {time.monotonic() - started:.2f}s.'
+        ))
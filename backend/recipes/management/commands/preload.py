@@ -1,8 +1,6 @@
-from csv import DictReader
-
 from django.core.management import BaseCommand
 
-from recipes.models import Ingredient
+from recipes.importers import IngredientImporter, read_rows
 
 
 class Command(BaseCommand):
@@ -10,14 +8,8 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         print('Загрузка данных...')
-        with open(
-            '../data/ingredients.csv', encoding='utf-8', newline=''
-        ) as ifile:
-            reader = DictReader(ifile, fieldnames=['name', 'measurement_unit'])
-            bulk_data = [
-                Ingredient(
-                    name=row['name'], measurement_unit=row['measurement_unit']
-                )
-                for row in reader
-            ]
-            Ingredient.objects.bulk_create(bulk_data)
+        importer = IngredientImporter()
+        stats = importer.run(
+            read_rows('../data/ingredients.csv', importer.csv_fieldnames)
+        )
+        print(f'{stats.created} новых, {stats.rows} всего.')
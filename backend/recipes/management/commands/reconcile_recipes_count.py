@@ -0,0 +1,16 @@
+from django.core.management import BaseCommand
+
+from recipes.counters import recount
+
+
+class Command(BaseCommand):
+    help = 'Fix recipes counts of users that drifted from their recipes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        fixed = recount(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{fixed} recipes counts fixed.'
+        ))
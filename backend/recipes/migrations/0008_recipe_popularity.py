@@ -0,0 +1,46 @@
+# Generated by Django 2.2.16 on 2026-10-19 12:09
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def seed_popularity(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    scores = {}
+    for name in ('Favorite', 'ShoppingCart'):
+        weight = settings.POPULARITY_WEIGHTS[name]
+        counts = apps.get_model('recipes', name).objects.values(
+            'recipe_id'
+        ).annotate(count=Count('id')).values_list('recipe_id', 'count')
+        for recipe_id, count in counts:
+            scores[recipe_id] = scores.get(recipe_id, 0) + count * weight
+    Recipe.objects.bulk_update(
+        [Recipe(id=pk, popularity=score) for pk, score in scores.items()],
+        ('popularity',),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_feedentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='popularity',
+            field=models.FloatField(default=0, editable=False, verbose_name='Popularity'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-popularity', '-pub_date'], name='recipe_popularity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-popularity'], name='recipe_author_popularity_idx'),
+        ),
+        migrations.RunPython(seed_popularity, migrations.RunPython.noop),
+    ]
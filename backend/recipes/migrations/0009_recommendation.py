@@ -0,0 +1,35 @@
+# Generated by Django 2.2.16 on 2026-10-19 12:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_popularity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Recommendation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Similarity')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='recipes.Recipe', verbose_name='Recipe')),
+                ('recommended', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommended_for', to='recipes.Recipe', verbose_name='Recommended recipe')),
+            ],
+            options={
+                'verbose_name': 'Recommendation',
+                'verbose_name_plural': 'Recommendations',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='recommendation',
+            index=models.Index(fields=['recipe', '-score'], name='recommendation_score_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='recommendation',
+            constraint=models.UniqueConstraint(fields=('recipe', 'recommended'), name='Unique recommendation'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 2.2.16 on 2026-10-19 12:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recommendation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSignature',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='recipes.Recipe', verbose_name='Recipe')),
+                ('minhash', models.BinaryField(verbose_name='MinHash signature')),
+            ],
+            options={
+                'verbose_name': 'Recipe signature',
+                'verbose_name_plural': 'Recipe signatures',
+            },
+        ),
+        migrations.CreateModel(
+            name='SimilarityBucket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BigIntegerField(verbose_name='Bucket key')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarity_buckets', to='recipes.Recipe', verbose_name='Recipe')),
+            ],
+            options={
+                'verbose_name': 'Similarity bucket',
+                'verbose_name_plural': 'Similarity buckets',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='similaritybucket',
+            index=models.Index(fields=['key', 'recipe'], name='similarity_bucket_idx'),
+        ),
+    ]
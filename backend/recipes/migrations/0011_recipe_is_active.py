@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-19 12:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_similarity_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='is_active',
+            field=models.BooleanField(default=True, editable=False, verbose_name='Active'),
+        ),
+    ]
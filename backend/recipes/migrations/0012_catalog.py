@@ -0,0 +1,24 @@
+# Generated by Django 2.2.16 on 2026-10-19 13:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_is_active'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Catalog',
+            fields=[
+                ('label', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='model label')),
+                ('modified', models.DateTimeField(verbose_name='modified')),
+            ],
+            options={
+                'verbose_name': 'Catalog',
+                'verbose_name_plural': 'Catalogs',
+            },
+        ),
+    ]
@@ -27,6 +27,8 @@ class Tag(models.Model):
     )
     slug = models.SlugField(verbose_name='slug', unique=True, max_length=200)
 
+    catalog_cache_key = 'catalog-tags'
+
     class Meta:
         verbose_name = 'Tag'
         verbose_name_plural = 'Tags'
@@ -46,6 +48,8 @@ class Ingredient(models.Model):
         max_length=100, verbose_name='Measurement unit'
     )
 
+    catalog_cache_key = 'catalog-ingredients'
+
     class Meta:
         verbose_name = 'Ingredient'
         verbose_name_plural = 'Ingredients'
@@ -60,6 +64,29 @@ class Ingredient(models.Model):
         return f'{self.name}, {self.measurement_unit}'
 
 
+class Catalog(models.Model):
+    """Time of the last change of a catalog, the same for every worker."""
+
+    label = models.CharField('model label', max_length=100, primary_key=True)
+    modified = models.DateTimeField('modified')
+
+    class Meta:
+        verbose_name = 'Catalog'
+        verbose_name_plural = 'Catalogs'
+
+    def __str__(self):
+        return f'{self.label} changed at {self.modified}'
+
+
+class RecipeQuerySet(models.QuerySet):
+    """Recipes queryset."""
+
+    def visible(self) -> 'RecipeQuerySet':
+        """Recipes which are not being deleted, nor their authors."""
+
+        return self.filter(is_active=True, author__is_active=True)
+
+
 class Recipe(models.Model):
     """Recipe model."""
 
@@ -75,6 +102,12 @@ class Recipe(models.Model):
     pub_date = models.DateTimeField(
         'Publication date', auto_now_add=True, db_index=True
     )
+    modified = models.DateTimeField('Modification date', auto_now=True)
+    version = models.PositiveIntegerField(
+        'Version', default=1, editable=False
+    )
+    popularity = models.FloatField('Popularity', default=0, editable=False)
+    is_active = models.BooleanField('Active', default=True, editable=False)
     cooking_time = models.PositiveIntegerField(
         verbose_name='Cooking Time',
         validators=(MinValueValidator(limit_value=1),),
@@ -89,10 +122,22 @@ class Recipe(models.Model):
         Tag, related_name='recipes', verbose_name='Tags'
     )
 
+    objects = RecipeQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Recipe'
         verbose_name_plural = 'Recipes'
         ordering = ('-pub_date', )
+        indexes = (
+            models.Index(
+                fields=('-popularity', '-pub_date'),
+                name='recipe_popularity_idx',
+            ),
+            models.Index(
+                fields=('author', '-popularity'),
+                name='recipe_author_popularity_idx',
+            ),
+        )
 
     def __str__(self):
         return self.name
@@ -102,15 +147,21 @@ class Recipe(models.Model):
 
         return mark_safe(f'<img src="{self.image.url}" width="150" />')
 
+    @staticmethod
+    def favorited_cache_key(recipe_id):
+        """Cache key for the times favorited counter."""
+
+        return f'{recipe_id}_favorited'
+
     @property
     def favorited(self):
         """Times the recipe has been favorited propery, cached."""
 
-        favorited = cache.get(f'{self.id}_favorited')
+        favorited = cache.get(self.favorited_cache_key(self.id))
         if favorited is None:
             favorited = Favorite.objects.filter(recipe=self).count()
             cache.set(
-                f'{self.id}_favorited',
+                self.favorited_cache_key(self.id),
                 favorited,
                 settings.FAVORITED_CACHE_SECONDS_TTL,
             )
@@ -202,3 +253,127 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.recipe} in {self.user} cart'
+
+
+class FeedEntry(models.Model):
+    """A recipe in the subscriptions feed of a user."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Feed owner',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Recipe',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Recipe author',
+    )
+    pub_date = models.DateTimeField('Publication date')
+
+    class Meta:
+        verbose_name = 'Feed entry'
+        verbose_name_plural = 'Feed entries'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipe'), name='Unique recipe in a feed'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date'), name='feed_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=('user', 'author'), name='feed_user_author_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.recipe} in the feed of {self.user}'
+
+
+class Recommendation(models.Model):
+    """A recipe often favorited together with another one, precomputed."""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='recommendations',
+        verbose_name='Recipe',
+    )
+    recommended = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='recommended_for',
+        verbose_name='Recommended recipe',
+    )
+    score = models.FloatField('Similarity')
+
+    class Meta:
+        verbose_name = 'Recommendation'
+        verbose_name_plural = 'Recommendations'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('recipe', 'recommended'),
+                name='Unique recommendation',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('recipe', '-score'), name='recommendation_score_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.recommended} for {self.recipe}'
+
+
+class RecipeSignature(models.Model):
+    """MinHash signature of the ingredients of a recipe."""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='signature',
+        verbose_name='Recipe',
+    )
+    minhash = models.BinaryField('MinHash signature')
+
+    class Meta:
+        verbose_name = 'Recipe signature'
+        verbose_name_plural = 'Recipe signatures'
+
+    def __str__(self):
+        return f'Signature of {self.recipe}'
+
+
+class SimilarityBucket(models.Model):
+    """LSH bucket of a band of a recipe signature."""
+
+    key = models.BigIntegerField('Bucket key')
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similarity_buckets',
+        verbose_name='Recipe',
+    )
+
+    class Meta:
+        verbose_name = 'Similarity bucket'
+        verbose_name_plural = 'Similarity buckets'
+        indexes = (
+            models.Index(
+                fields=('key', 'recipe'), name='similarity_bucket_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.recipe} in bucket {self.key}'
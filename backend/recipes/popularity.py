@@ -0,0 +1,77 @@
+from typing import Iterable
+
+from django.conf import settings
+from django.db.models import (Count, F, FloatField, IntegerField, Max, Min,
+                              OuterRef, Subquery, Value)
+from django.db.models.functions import Coalesce, Greatest
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+
+POPULARITY_SOURCES = (Favorite, ShoppingCart)
+
+
+def weight(model) -> float:
+    """Popularity weight of a favorite or a shopping cart entry."""
+
+    return settings.POPULARITY_WEIGHTS[model.__name__]
+
+
+def bump(model, recipe_ids: Iterable[int], added: bool) -> int:
+    """Change popularity of recipes after they are (un)favorited or carted.
+
+    Scores are never taken below zero, decay makes them drift a bit.
+    """
+
+    delta = weight(model) if added else -weight(model)
+    return Recipe.objects.filter(id__in=list(recipe_ids)).update(
+        popularity=Greatest(
+            F('popularity') + Value(delta), Value(0.0),
+            output_field=FloatField(),
+        )
+    )
+
+
+def _id_ranges(batch_size: int):
+    bounds = Recipe.objects.aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return
+    for low in range(bounds['low'], bounds['high'] + 1, batch_size):
+        yield low, low + batch_size
+
+
+def decay(factor: float, batch_size: int = 1000) -> int:
+    """Multiply all scores by the factor, a batch of ids per statement."""
+
+    return sum(
+        Recipe.objects.filter(id__gte=low, id__lt=high).update(
+            popularity=F('popularity') * Value(factor)
+        )
+        for low, high in _id_ranges(batch_size)
+    )
+
+
+def _counted(model):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(recipe_id=OuterRef('id')).order_by().values(
+                'recipe_id'
+            ).annotate(count=Count('id')).values('count'),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    ) * Value(weight(model))
+
+
+def rebuild(batch_size: int = 1000) -> int:
+    """Recompute scores from current counts, forgetting the decay."""
+
+    score = sum(
+        (_counted(model) for model in POPULARITY_SOURCES[1:]),
+        _counted(POPULARITY_SOURCES[0]),
+    )
+    return sum(
+        Recipe.objects.filter(id__gte=low, id__lt=high).update(
+            popularity=score
+        )
+        for low, high in _id_ranges(batch_size)
+    )
@@ -0,0 +1,150 @@
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q, QuerySet
+
+from recipes.feeds import CELEBRITIES_CACHE_KEY
+from recipes.models import (Favorite, FeedEntry, Recipe, RecipeIngredient,
+                            RecipeSignature, Recommendation, ShoppingCart,
+                            SimilarityBucket)
+from recipes.popularity import bump
+from users.models import Subscription, User
+
+Before = Optional[Callable[[QuerySet], None]]
+Step = Tuple[str, QuerySet, Before]
+
+
+def deactivate_recipe(recipe: Recipe) -> None:
+    """Hide a recipe at once and take it off its author's count."""
+
+    if Recipe.objects.filter(pk=recipe.pk, is_active=True).update(
+        is_active=False
+    ):
+        User.objects.filter(
+            pk=recipe.author_id, recipes_count__gt=0
+        ).update(recipes_count=F('recipes_count') - 1)
+    recipe.is_active = False
+
+
+def deactivate_user(user: User) -> None:
+    """Mark a user inactive.
+
+    Token authentication refuses inactive users and their recipes are
+    left out of the visible ones, so nothing else has to be updated.
+    """
+
+    User.objects.filter(pk=user.pk).update(is_active=False)
+    user.is_active = False
+
+
+def delete_in_batches(
+    queryset: QuerySet, batch_size: int, before: Before = None
+) -> Iterator[int]:
+    """Delete the rows a batch of primary keys at a time.
+
+    Every batch is a short transaction of its own, so no lock is held
+    for long and nothing but the keys is loaded. The before hook gets
+    the rows of a batch right before they are deleted. Yields the sizes
+    of the batches.
+    """
+
+    model = queryset.model
+    keys = queryset.order_by().values_list('pk', flat=True)
+    while True:
+        with transaction.atomic():
+            batch = list(keys[:batch_size])
+            if not batch:
+                return
+            rows = model.objects.filter(pk__in=batch)
+            if before is not None:
+                before(rows)
+            rows.delete()
+        yield len(batch)
+
+
+def forget_favorites(rows: QuerySet) -> None:
+    """Drop favorites counters and popularity of the favorited recipes."""
+
+    ids = set(rows.values_list('recipe_id', flat=True))
+    cache.delete_many([Recipe.favorited_cache_key(pk) for pk in ids])
+    bump(Favorite, ids, False)
+
+
+def forget_carts(rows: QuerySet) -> None:
+    """Drop popularity of the recipes taken out of a shopping cart."""
+
+    bump(ShoppingCart, set(rows.values_list('recipe_id', flat=True)), False)
+
+
+def forget_celebrities(rows: QuerySet) -> None:
+    """Followers are recounted after subscriptions are gone."""
+
+    cache.delete(CELEBRITIES_CACHE_KEY)
+
+
+def drop_favorited(rows: QuerySet) -> None:
+    """Drop favorites counters of recipes being deleted."""
+
+    cache.delete_many([
+        Recipe.favorited_cache_key(pk)
+        for pk in set(rows.values_list('recipe_id', flat=True))
+    ])
+
+
+def recipe_steps(**lookup) -> List[Step]:
+    """Dependents of the recipes matching the lookup, then the recipes."""
+
+    def related(model, field='recipe'):
+        return model.objects.filter(**{
+            f'{field}__{name}': value for name, value in lookup.items()
+        })
+
+    return [
+        ('feed entries', related(FeedEntry), None),
+        ('favorites', related(Favorite), drop_favorited),
+        ('shopping carts', related(ShoppingCart), None),
+        ('recommendations', related(Recommendation), None),
+        ('recommendations', related(Recommendation, 'recommended'), None),
+        ('similarity', related(SimilarityBucket), None),
+        ('similarity', related(RecipeSignature), None),
+        ('ingredients', related(RecipeIngredient), None),
+        ('tags', related(Recipe.tags.through), None),
+        ('recipes', Recipe.objects.filter(**lookup), None),
+    ]
+
+
+def user_steps(user_id: int) -> List[Step]:
+    """Relations of the user, their recipes, then the user."""
+
+    return [
+        ('feed entries', FeedEntry.objects.filter(user_id=user_id), None),
+        ('feed entries', FeedEntry.objects.filter(author_id=user_id), None),
+        (
+            'subscriptions',
+            Subscription.objects.filter(
+                Q(user_id=user_id) | Q(author_id=user_id)
+            ),
+            forget_celebrities,
+        ),
+        (
+            'favorites',
+            Favorite.objects.filter(user_id=user_id),
+            forget_favorites,
+        ),
+        (
+            'shopping carts',
+            ShoppingCart.objects.filter(user_id=user_id),
+            forget_carts,
+        ),
+        *recipe_steps(author_id=user_id),
+        ('users', User.objects.filter(pk=user_id), None),
+    ]
+
+
+def purge(steps: List[Step], batch_size: int) -> Iterator[Tuple[str, int]]:
+    """Run deletion steps in order, yield (step, rows) for every batch."""
+
+    for name, queryset, before in steps:
+        for deleted in delete_in_batches(queryset, batch_size, before):
+            yield name, deleted
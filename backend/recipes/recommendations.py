@@ -0,0 +1,102 @@
+from itertools import chain
+from typing import Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+from django.db import transaction
+from scipy import sparse
+
+from recipes.importers import chunked
+from recipes.models import Favorite, Recommendation
+
+
+def favorites_matrix() -> Tuple[sparse.csr_matrix, np.ndarray]:
+    """Binary users by recipes matrix of favorites and its recipe ids."""
+
+    pairs = np.fromiter(
+        chain.from_iterable(
+            Favorite.objects.values_list('user_id', 'recipe_id').iterator()
+        ),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    users, rows = np.unique(pairs[:, 0], return_inverse=True)
+    recipes, columns = np.unique(pairs[:, 1], return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(pairs), dtype=np.float32), (rows, columns)),
+        shape=(len(users), len(recipes)),
+    )
+    return matrix, recipes
+
+
+def top_similar(
+    matrix: sparse.csr_matrix,
+    targets: np.ndarray,
+    top_k: int,
+    min_common: int,
+    block_size: int,
+) -> Iterator[Tuple[int, np.ndarray, np.ndarray]]:
+    """Column, most similar columns and their scores for every target.
+
+    Similarity is the cosine of two recipe columns: the number of users
+    who favorited both, divided by the geometric mean of their favorites
+    counts. Co-occurrences are computed a block of targets at a time, so
+    the full recipes by recipes matrix is never held in memory.
+    """
+
+    norms = np.sqrt(np.asarray(matrix.sum(axis=0)).ravel())
+    transposed = matrix.T.tocsr()
+    columns = matrix.tocsc()
+    for start in range(0, len(targets), block_size):
+        block_targets = targets[start:start + block_size]
+        block = (transposed @ columns[:, block_targets]).tocsc()
+        for offset, target in enumerate(block_targets):
+            low, high = block.indptr[offset], block.indptr[offset + 1]
+            similar, common = block.indices[low:high], block.data[low:high]
+            keep = (similar != target) & (common >= min_common)
+            similar, common = similar[keep], common[keep]
+            scores = common / (norms[similar] * norms[target])
+            if len(scores) > top_k:
+                best = np.argpartition(-scores, top_k - 1)[:top_k]
+                similar, scores = similar[best], scores[best]
+            order = np.lexsort((similar, -scores))
+            yield target, similar[order], scores[order]
+
+
+def build(
+    top_k: int,
+    min_common: int = 1,
+    batch_size: int = 1000,
+    recipe_ids: Optional[Iterable[int]] = None,
+) -> int:
+    """Recompute recommendations, return the number of rows stored.
+
+    With recipe_ids only the recommendations of those recipes are
+    refreshed. Rows are replaced in one transaction, so readers see
+    either the old or the new recommendations.
+    """
+
+    matrix, recipes = favorites_matrix()
+    if recipe_ids is None:
+        targets = np.arange(len(recipes))
+        stale = Recommendation.objects.all()
+    else:
+        recipe_ids = list(recipe_ids)
+        targets = np.flatnonzero(np.isin(recipes, recipe_ids))
+        stale = Recommendation.objects.filter(recipe_id__in=recipe_ids)
+    rows = (
+        Recommendation(
+            recipe_id=int(recipes[target]),
+            recommended_id=int(recipe_id),
+            score=float(score),
+        )
+        for target, similar, scores in top_similar(
+            matrix, targets, top_k, min_common, batch_size
+        )
+        for recipe_id, score in zip(recipes[similar], scores)
+    )
+    stored = 0
+    with transaction.atomic():
+        stale.delete()
+        for chunk in chunked(rows, batch_size):
+            Recommendation.objects.bulk_create(chunk)
+            stored += len(chunk)
+    return stored
@@ -0,0 +1,58 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.catalogs import touch, touch_relations
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from users.models import Subscription, User
+
+
+@receiver((post_save, post_delete), sender=Tag)
+@receiver((post_save, post_delete), sender=Ingredient)
+def drop_catalog(sender, **kwargs):
+    """Record a change of tags or ingredients.
+
+    Cached catalogs are keyed on the time of the last change, and the
+    validators of recipe details, which embed them, include it too.
+    """
+
+    touch(sender)
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+@receiver((post_save, post_delete), sender=Subscription)
+def stamp_relations(sender, instance, raw=False, **kwargs):
+    """Record a change of the user's favorites, cart or follows.
+
+    Recipe details show them, so the stamp is part of their validators.
+    Bulk inserts send no signals and stamp the users themselves.
+    """
+
+    if not raw:
+        touch_relations((instance.user_id,))
+
+
+@receiver(post_save, sender=Recipe)
+def count_created_recipe(sender, instance, created, raw=False, **kwargs):
+    """Add a new recipe to the recipes count of its author."""
+
+    if created and not raw:
+        User.objects.filter(pk=instance.author_id).update(
+            recipes_count=F('recipes_count') + 1
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def count_deleted_recipe(sender, instance, **kwargs):
+    """Remove a deleted recipe from the recipes count of its author.
+
+    Sent for every recipe, cascades included, within their transaction.
+    Deactivated recipes have been taken off the count already.
+    """
+
+    if not instance.is_active:
+        return
+    User.objects.filter(pk=instance.author_id, recipes_count__gt=0).update(
+        recipes_count=F('recipes_count') - 1
+    )
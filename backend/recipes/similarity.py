@@ -0,0 +1,176 @@
+import hashlib
+from functools import lru_cache
+from typing import Dict, Iterable, List, Set, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Subquery
+
+from recipes.models import RecipeIngredient, RecipeSignature, SimilarityBucket
+
+PRIME = (1 << 31) - 1
+SEED = 20230210
+SIGNATURE_DTYPE = np.dtype('<u4')
+
+
+def permutations() -> int:
+    """Number of hash functions in a signature."""
+
+    return settings.SIMILARITY_BANDS * settings.SIMILARITY_BAND_ROWS
+
+
+@lru_cache(maxsize=None)
+def _coefficients(count: int) -> Tuple[np.ndarray, np.ndarray]:
+    random = np.random.RandomState(SEED)
+    size = (count, 1)
+    return (
+        random.randint(1, PRIME, size=size, dtype=np.int64),
+        random.randint(0, PRIME, size=size, dtype=np.int64),
+    )
+
+
+def signature(ingredient_ids: Iterable[int]) -> np.ndarray:
+    """MinHash signature of a non-empty set of ingredient ids.
+
+    Every hash function is a random universal hash modulo a Mersenne
+    prime, the same seed is used by all processes.
+    """
+
+    multipliers, increments = _coefficients(permutations())
+    ids = np.fromiter(set(ingredient_ids), dtype=np.int64)[np.newaxis, :]
+    hashes = (multipliers * ids + increments) % PRIME
+    return hashes.min(axis=1).astype(SIGNATURE_DTYPE)
+
+
+def band_keys(minhash: np.ndarray) -> List[int]:
+    """LSH bucket keys of a signature, one per band."""
+
+    return [
+        int.from_bytes(
+            hashlib.blake2b(
+                bytes((band,)) + rows.tobytes(), digest_size=8
+            ).digest(),
+            'big',
+            signed=True,
+        )
+        for band, rows in enumerate(
+            minhash.reshape(settings.SIMILARITY_BANDS, -1)
+        )
+    ]
+
+
+def _load(value) -> np.ndarray:
+    return np.frombuffer(bytes(value), dtype=SIGNATURE_DTYPE)
+
+
+def index(ingredient_sets: Dict[int, Iterable[int]]) -> None:
+    """Store signatures and buckets of recipes by their ingredient ids.
+
+    Recipes without ingredients are removed from the index.
+    """
+
+    recipe_ids = list(ingredient_sets)
+    RecipeSignature.objects.filter(recipe_id__in=recipe_ids).delete()
+    SimilarityBucket.objects.filter(recipe_id__in=recipe_ids).delete()
+    signatures, buckets = [], []
+    for recipe_id, ingredient_ids in ingredient_sets.items():
+        ingredient_ids = set(ingredient_ids)
+        if not ingredient_ids:
+            continue
+        minhash = signature(ingredient_ids)
+        signatures.append(RecipeSignature(
+            recipe_id=recipe_id, minhash=minhash.tobytes()
+        ))
+        buckets.extend(
+            SimilarityBucket(key=key, recipe_id=recipe_id)
+            for key in band_keys(minhash)
+        )
+    RecipeSignature.objects.bulk_create(signatures)
+    SimilarityBucket.objects.bulk_create(buckets)
+
+
+def ingredient_sets(recipe_ids=None) -> Dict[int, Set[int]]:
+    """Ingredient ids of recipes, all of them if recipe_ids is None."""
+
+    rows = RecipeIngredient.objects.order_by()
+    sets = {}
+    if recipe_ids is not None:
+        sets = {pk: set() for pk in recipe_ids}
+        rows = rows.filter(recipe_id__in=list(sets))
+    for recipe_id, ingredient_id in rows.values_list(
+        'recipe_id', 'ingredient_id'
+    ).iterator():
+        sets.setdefault(recipe_id, set()).add(ingredient_id)
+    return sets
+
+
+def index_recipes(recipe_ids: Iterable[int]) -> None:
+    """Reindex recipes reading their ingredients from the database."""
+
+    index(ingredient_sets(recipe_ids))
+
+
+def rebuild(batch_size: int = 1000) -> int:
+    """Rebuild the whole index, return the number of indexed recipes."""
+
+    RecipeSignature.objects.all().delete()
+    SimilarityBucket.objects.all().delete()
+    sets = list(ingredient_sets().items())
+    for start in range(0, len(sets), batch_size):
+        index(dict(sets[start:start + batch_size]))
+    return len(sets)
+
+
+def nearest(recipe_id: int, top_k: int) -> List[Tuple[int, float]]:
+    """Approximate top-K recipes by Jaccard similarity of ingredients.
+
+    Candidates share at least one LSH bucket with the recipe and are
+    ranked by the share of equal signature positions, an estimate of
+    their Jaccard similarity. Two queries, whatever the catalog size.
+    """
+
+    stored = RecipeSignature.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('minhash', flat=True).first()
+    if stored is None:
+        return []
+    minhash = _load(stored)
+    candidates = RecipeSignature.objects.filter(
+        recipe_id__in=Subquery(SimilarityBucket.objects.filter(
+            key__in=band_keys(minhash)
+        ).values('recipe_id'))
+    ).exclude(recipe_id=recipe_id).values_list('recipe_id', 'minhash')
+    ids, signatures = [], []
+    for candidate_id, value in candidates:
+        ids.append(candidate_id)
+        signatures.append(_load(value))
+    if not ids:
+        return []
+    ids = np.array(ids)
+    scores = (np.vstack(signatures) == minhash).mean(axis=1)
+    best = np.lexsort((ids, -scores))[:top_k]
+    return [(int(ids[i]), float(scores[i])) for i in best]
+
+
+def jaccard(first: Set[int], second: Set[int]) -> float:
+    """Exact Jaccard similarity of two sets."""
+
+    if not first and not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+def exact_similar(
+    recipe_id: int, sets: Dict[int, Set[int]], top_k: int
+) -> List[Tuple[int, float]]:
+    """Exact top-K recipes by Jaccard similarity, a full scan."""
+
+    ingredients = sets[recipe_id]
+    scores = [
+        (pk, jaccard(ingredients, other))
+        for pk, other in sets.items()
+        if pk != recipe_id
+    ]
+    scores = [(pk, score) for pk, score in scores if score > 0]
+    scores.sort(key=lambda item: (-item[1], item[0]))
+    return scores[:top_k]
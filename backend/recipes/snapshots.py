@@ -0,0 +1,363 @@
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, models, transaction
+
+from recipes.catalogs import touch, touch_relations
+from recipes.counters import recount
+from recipes.importers import chunked
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from users.models import Subscription, User
+
+SNAPSHOT_VERSION = 1
+MEDIA_COPY_WORKERS = 8
+
+# Tables in dependency order, with the natural key used for merging.
+SNAPSHOT_TABLES: Tuple[Tuple[models.Model, Tuple[str, ...]], ...] = (
+    (User, ('email',)),
+    (Tag, ('slug',)),
+    (Ingredient, ('name', 'measurement_unit')),
+    (Recipe, ('author_id', 'name')),
+    (Recipe.tags.through, ('recipe_id', 'tag_id')),
+    (RecipeIngredient, ('recipe_id', 'ingredient_id')),
+    (Favorite, ('user_id', 'recipe_id')),
+    (ShoppingCart, ('user_id', 'recipe_id')),
+    (Subscription, ('user_id', 'author_id')),
+)
+
+
+class TableReport(NamedTuple):
+    label: str
+    rows: int
+    created: int
+    skipped: int
+    seconds: float
+
+
+def _label(model) -> str:
+    return model._meta.label_lower
+
+
+def _attnames(model) -> List[str]:
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def _file_fields(model) -> List[models.FileField]:
+    return [
+        field for field in model._meta.concrete_fields
+        if isinstance(field, models.FileField)
+    ]
+
+
+def dump(ofile, batch_size: int = 1000) -> List[str]:
+    """Stream all snapshot tables into a file, return media paths."""
+
+    media = []
+    ofile.write(f'{{"version": {SNAPSHOT_VERSION}, "tables": [')
+    for number, (model, _) in enumerate(SNAPSHOT_TABLES):
+        fields = _attnames(model)
+        file_columns = [
+            fields.index(field.attname) for field in _file_fields(model)
+        ]
+        ofile.write(',' if number else '')
+        ofile.write(
+            f'{{"model": {json.dumps(_label(model))}, '
+            f'"fields": {json.dumps(fields)}, "rows": ['
+        )
+        rows = model.objects.order_by('pk').values_list(*fields).iterator(
+            chunk_size=batch_size
+        )
+        for index, row in enumerate(rows):
+            ofile.write((',' if index else '')
+                        + json.dumps(row, cls=DjangoJSONEncoder))
+            media.extend(row[column] for column in file_columns
+                         if row[column])
+        ofile.write(']}')
+    ofile.write('], "media": ' + json.dumps(media) + '}')
+    return media
+
+
+def from_fixture(objects: Iterable[dict]) -> dict:
+    """Convert a dumpdata fixture into a snapshot.
+
+    Objects of models that are not part of snapshots, such as tokens,
+    sessions and admin log entries, are dropped and counted by model
+    in 'skipped'.
+    """
+
+    known = {_label(model): model for model, _ in SNAPSHOT_TABLES}
+    through = Recipe.tags.through
+    tables: Dict[str, List[dict]] = {label: [] for label in known}
+    media = []
+    skipped: Dict[str, int] = {}
+    for obj in objects:
+        model = known.get(obj['model'])
+        if model is None:
+            skipped[obj['model']] = skipped.get(obj['model'], 0) + 1
+            continue
+        row = {model._meta.pk.attname: obj['pk']}
+        for name, value in obj['fields'].items():
+            field = model._meta.get_field(name)
+            if model is Recipe and name == 'tags':
+                tables[_label(through)].extend(
+                    {'recipe_id': obj['pk'], 'tag_id': tag_id}
+                    for tag_id in value
+                )
+            elif not field.many_to_many:
+                row[field.attname] = value
+                if isinstance(field, models.FileField) and value:
+                    media.append(value)
+        tables[obj['model']].append(row)
+    fields = {
+        label: [
+            name for name in _attnames(known[label])
+            if name == known[label]._meta.pk.attname
+            or any(name in row for row in rows)
+        ]
+        for label, rows in tables.items()
+    }
+    return {
+        'version': SNAPSHOT_VERSION,
+        'tables': [
+            {
+                'model': label,
+                'fields': fields[label],
+                'rows': [
+                    [row.get(name) for name in fields[label]] for row in rows
+                ],
+            }
+            for label, rows in tables.items()
+        ],
+        'media': media,
+        'skipped': skipped,
+    }
+
+
+def read(path: str) -> dict:
+    """Read a snapshot or a plain dumpdata fixture."""
+
+    with open(path, encoding='utf-8') as ifile:
+        data = json.load(ifile)
+    return from_fixture(data) if isinstance(data, list) else data
+
+
+@contextmanager
+def _keep_dates(model, loaded):
+    """Stop auto_now(_add) fields from overwriting loaded dates."""
+
+    fields = [
+        field for field in model._meta.concrete_fields
+        if field.attname in loaded and (
+            getattr(field, 'auto_now', False)
+            or getattr(field, 'auto_now_add', False)
+        )
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class SnapshotLoader:
+    """Bulk load snapshot tables, merging them into existing data.
+
+    Empty tables get the rows with their original primary keys. For
+    tables that already have rows, objects are matched by natural key,
+    only missing ones are inserted and foreign keys of the following
+    tables are remapped to the live primary keys. Rows that cannot be
+    inserted nor matched are skipped, along with the rows referring
+    to them.
+    """
+
+    def __init__(self, batch_size: int = 1000) -> None:
+        self.batch_size = batch_size
+        self.pk_maps: Dict[str, Dict] = {}
+
+    def __repr__(self) -> str:
+        return 'Snapshot loader'
+
+    def _remap(self, model, rows: List[dict]) -> List[dict]:
+        """Point foreign keys to the loaded rows.
+
+        Rows referring to snapshot rows that were skipped are dropped.
+        """
+
+        relations = [
+            (field.attname, self.pk_maps[_label(field.related_model)])
+            for field in model._meta.concrete_fields
+            if field.is_relation
+            and _label(field.related_model) in self.pk_maps
+        ]
+        kept = []
+        for row in rows:
+            for attname, pk_map in relations:
+                if row[attname] is None:
+                    continue
+                if row[attname] not in pk_map:
+                    break
+                row[attname] = pk_map[row[attname]]
+            else:
+                kept.append(row)
+        return kept
+
+    def _existing(self, model, key_fields, rows) -> Dict[tuple, object]:
+        found = {}
+        for chunk in chunked(rows, self.batch_size):
+            lookup = {
+                f'{field}__in': {row[field] for row in chunk}
+                for field in key_fields
+            }
+            found.update(
+                (tuple(values[:-1]), values[-1])
+                for values in model.objects.filter(**lookup).values_list(
+                    *key_fields, 'pk'
+                )
+            )
+        return found
+
+    def load_table(
+        self, model, key_fields, rows: List[dict]
+    ) -> Tuple[int, int]:
+        """Load rows of one table, return the numbers inserted, skipped.
+
+        Rows that clash with live ones on another unique field than the
+        natural key are not inserted; they are skipped together with the
+        rows of the following tables that refer to them.
+        """
+
+        pk_name = model._meta.pk.attname
+        fields = {
+            field.attname: field for field in model._meta.concrete_fields
+        }
+        total = len(rows)
+        rows = self._remap(model, [
+            {name: fields[name].to_python(value)
+             for name, value in row.items() if name in fields}
+            for row in rows
+        ])
+        fresh = not model.objects.exists()
+        existing = {} if fresh else self._existing(model, key_fields, rows)
+        new = []
+        for row in rows:
+            if tuple(row[field] for field in key_fields) in existing:
+                continue
+            if not fresh:
+                row = dict(row)
+                row.pop(pk_name)
+            new.append(model(**row))
+        batch_size = min(self.batch_size, connection.ops.bulk_batch_size(
+            list(fields.values()), new
+        ))
+        with _keep_dates(model, rows[0].keys() if rows else ()):
+            model.objects.bulk_create(
+                new, batch_size=max(batch_size, 1), ignore_conflicts=not fresh
+            )
+        if fresh:
+            self.pk_maps[_label(model)] = {
+                row[pk_name]: row[pk_name] for row in rows
+            }
+            return len(new), total - len(rows)
+        existing = self._existing(model, key_fields, rows)
+        pk_map = self.pk_maps[_label(model)] = {}
+        unmatched = 0
+        for row in rows:
+            key = tuple(row[field] for field in key_fields)
+            if key in existing:
+                pk_map[row[pk_name]] = existing[key]
+            else:
+                unmatched += 1
+        return len(new) - unmatched, total - len(rows) + unmatched
+
+    def load(self, snapshot: dict) -> List[TableReport]:
+        """Load all tables in one transaction and reset sequences."""
+
+        tables = {table['model']: table for table in snapshot['tables']}
+        reports = []
+        with transaction.atomic():
+            for model, key_fields in SNAPSHOT_TABLES:
+                table = tables.get(_label(model), {'fields': [], 'rows': []})
+                started = time.monotonic()
+                rows = [dict(zip(table['fields'], row))
+                        for row in table['rows']]
+                created, skipped = self.load_table(model, key_fields, rows)
+                if created and model in (Favorite, ShoppingCart, Subscription):
+                    users = self.pk_maps[_label(User)]
+                    touch_relations(
+                        users[row['user_id']] for row in rows
+                        if row['user_id'] in users
+                    )
+                reports.append(TableReport(
+                    _label(model), len(rows), created, skipped,
+                    time.monotonic() - started,
+                ))
+            reset_sequences()
+            recount()
+        touch(*(
+            model for model, _ in SNAPSHOT_TABLES
+            if hasattr(model, 'catalog_cache_key')
+        ))
+        return reports
+
+
+def reset_sequences() -> None:
+    """Move primary key sequences past the loaded ids."""
+
+    statements = connection.ops.sequence_reset_sql(
+        no_style(), [model for model, _ in SNAPSHOT_TABLES]
+    )
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def _copy_file(source: str, destination: str) -> bool:
+    if (
+        os.path.exists(destination)
+        and os.path.getsize(destination) == os.path.getsize(source)
+    ):
+        return False
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    shutil.copyfile(source, destination)
+    return True
+
+
+def copy_media(
+    paths: Iterable[str],
+    source_dir: str,
+    destination_dir: Optional[str] = None,
+    workers: int = MEDIA_COPY_WORKERS,
+) -> Tuple[int, List[str]]:
+    """Copy media files in parallel, return copied count and missing paths.
+
+    Files are looked up by their relative path in the source directory,
+    or by their name if the directory is flat.
+    """
+
+    destination_dir = destination_dir or settings.MEDIA_ROOT
+    jobs, missing = [], []
+    for path in set(paths):
+        for source in (
+            os.path.join(source_dir, path),
+            os.path.join(source_dir, os.path.basename(path)),
+        ):
+            if os.path.isfile(source):
+                jobs.append((source, os.path.join(destination_dir, path)))
+                break
+        else:
+            missing.append(path)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        copied = sum(executor.map(lambda job: _copy_file(*job), jobs))
+    return copied, missing
@@ -0,0 +1,169 @@
+from types import SimpleNamespace
+
+from django.contrib import admin
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from foodgram.admin_tools import EstimatedCountPaginator
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from users.models import Subscription, User
+
+
+class AdminTests(TestCase):
+    """Admin pages keep their number of queries whatever the table sizes."""
+
+    budgets = {
+        'admin:recipes_recipe_changelist': 6,
+        'admin:recipes_favorite_changelist': 4,
+        'admin:recipes_shoppingcart_changelist': 4,
+        'admin:recipes_ingredient_changelist': 6,
+        'admin:users_user_changelist': 4,
+        'admin:users_subscription_changelist': 4,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            email='admin@fo.od', username='admin', password='secret'
+        )
+        cls.tags = [
+            Tag.objects.create(
+                name=f'admin{i}', slug=f'admin{i}', color=f'#00000{i}'
+            )
+            for i in range(2)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'admin{i}', measurement_unit='g')
+            for i in range(3)
+        ]
+        cls.populate(3)
+
+    @classmethod
+    def populate(cls, count):
+        """Add users with a recipe each, favorited and followed by all."""
+
+        start = User.objects.count()
+        for number in range(start, start + count):
+            user = User.objects.create(
+                email=f'admin{number}@fo.od', username=f'cook{number}'
+            )
+            recipe = Recipe.objects.create(
+                author=user, name=f'admin{number}', cooking_time=1,
+                image='1.jpg',
+            )
+            recipe.tags.set(cls.tags)
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+                for ingredient in cls.ingredients
+            )
+            Favorite.objects.create(user=cls.admin, recipe=recipe)
+            ShoppingCart.objects.create(user=user, recipe=recipe)
+            Subscription.objects.create(user=cls.admin, author=user)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_changelist_budgets(self):
+        """Changelists fit their budgets and do not grow with rows."""
+
+        counts = {}
+        for name, budget in self.budgets.items():
+            with self.subTest(page=name):
+                counts[name] = self.queries(reverse(name))
+                self.assertLessEqual(counts[name], budget)
+        self.populate(5)
+        for name in self.budgets:
+            with self.subTest(page=name):
+                self.assertEqual(self.queries(reverse(name)), counts[name])
+
+    def test_recipe_change_page(self):
+        """The change page fits its budget, favorites are counted in bulk."""
+
+        recipe = Recipe.objects.filter(author__username='cook1').get()
+        url = reverse('admin:recipes_recipe_change', args=(recipe.pk,))
+        self.assertLessEqual(self.queries(url), 13)
+        response = self.client.get(url)
+        self.assertContains(response, 'id_recipeingredients-0-DELETE')
+        RecipeIngredient.objects.filter(recipe=recipe).exclude(
+            ingredient=self.ingredients[0]
+        ).delete()
+        response = self.client.get(url)
+        self.assertNotContains(response, 'id_recipeingredients-0-DELETE')
+        response = self.client.get(reverse('admin:recipes_recipe_add'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_recipe_save_bumps_the_version_once(self):
+        """The saved recipe holds its new version, not an expression."""
+
+        recipe = Recipe.objects.filter(author__username='cook1').get()
+        recipe.cooking_time = 5
+        form = SimpleNamespace(changed_data=['cooking_time'], initial={})
+        admin.site._registry[Recipe].save_model(None, recipe, form, True)
+        self.assertEqual(recipe.version, 2)
+        recipe.save()
+        recipe.refresh_from_db()
+        self.assertEqual((recipe.version, recipe.cooking_time), (2, 5))
+
+    def test_input_filters(self):
+        """Input filters match prefixes and keep the other parameters."""
+
+        url = reverse('admin:recipes_recipe_changelist')
+        response = self.client.get(url, {'author': 'cook1'})
+        self.assertEqual(
+            [recipe.author.username
+             for recipe in response.context['cl'].result_list],
+            ['cook1'],
+        )
+        response = self.client.get(
+            reverse('admin:users_user_changelist'),
+            {'email': 'admin2@fo.od', 'is_active__exact': '1'},
+        )
+        self.assertEqual(
+            [user.username for user in response.context['cl'].result_list],
+            ['cook2'],
+        )
+        self.assertContains(
+            response, '<input type="hidden" name="is_active__exact" value="1">'
+        )
+
+    def test_estimated_count_is_cached(self):
+        """Counts are cached between page loads."""
+
+        queryset = Recipe.objects.filter(author__username__startswith='cook')
+        self.assertEqual(EstimatedCountPaginator(queryset, 10).count, 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(EstimatedCountPaginator(queryset, 10).count, 3)
+
+    def test_user_change_page(self):
+        """Inlines show a fixed number of rows, whatever the user did."""
+
+        url = reverse('admin:users_user_change', args=(self.admin.pk,))
+        size = len(self.client.get(url).content)
+        queries = self.queries(url)
+        self.assertLessEqual(queries, 9)
+        with self.settings(ADMIN_INLINE_MAX_ROWS=4):
+            self.populate(8)
+            self.assertEqual(self.queries(url), queries + 2)
+            response = self.client.get(url)
+        self.assertLess(len(response.content), size * 1.5)
+        self.assertContains(response, '4 of 11 shown.', count=2)
+        view_all = reverse('admin:recipes_favorite_changelist')
+        self.assertContains(
+            response, f'{view_all}?user__id__exact={self.admin.pk}'
+        )
+        response = self.client.get(
+            view_all, {'user__id__exact': self.admin.pk}
+        )
+        self.assertEqual(response.context['cl'].result_count, 11)
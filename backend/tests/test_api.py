@@ -1,13 +1,21 @@
 import shutil
 import tempfile
+from io import StringIO
 
 from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from faker import Faker
 from rest_framework import status
+from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient, APITestCase, override_settings
 
+from api.serializers import RecipeSerializer
 from api.urls import router
+from recipes.catalogs import cache_key
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                             ShoppingCart, Tag)
 from users.models import Subscription, User
@@ -199,6 +207,22 @@ class SubscriptionEndpointsTests(AuthorizedUserAuthorPresets):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         response = self.user_client.post(subscribe_url, {})
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data,
+            {'non_field_errors': ['You can only subscribe once.']},
+        )
+        response = self.user_client.post(
+            reverse('users-subscribe', kwargs={'pk': self.user.id})
+        )
+        self.assertEqual(
+            response.data, {'author': ['Say no to self-subscriptions.']}
+        )
+        response = self.user_client.post(
+            reverse('users-subscribe', kwargs={'pk': f'0{self.user.id}'})
+        )
+        self.assertEqual(
+            response.data, {'author': ['Say no to self-subscriptions.']}
+        )
         self.assertEqual(Subscription.objects.count(), prev_subs + 1)
         last_subscription = Subscription.objects.last()
         self.assertEqual(last_subscription.user, self.user)
@@ -312,6 +336,97 @@ class SubscriptionEndpointsTests(AuthorizedUserAuthorPresets):
         self.assertTrue(subscriptions[author_id])
 
 
+class UserDirectoryTests(APITestCase):
+    """Prefix search and keyset pagination of the users list."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create(
+            email='dir@read.er', username='dirreader'
+        )
+        cls.users = [
+            User.objects.create(
+                email=f'dir{number}@us.er',
+                username=username,
+                first_name='Dirk' if number == 0 else 'Anna',
+                last_name=f'Dirlast{number}',
+            )
+            for number, username in enumerate(
+                ('dirb', 'Dira', 'dirb', 'dirc', 'dird')
+            )
+        ]
+        Subscription.objects.create(user=cls.reader, author=cls.users[2])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def test_prefix_search(self):
+        """Username, first and last names are matched ignoring case."""
+
+        response = self.client.get(
+            reverse('users-list'), {'search': 'DIRA', 'limit': 10}
+        )
+        self.assertEqual(
+            [user['id'] for user in response.data['results']],
+            [self.users[1].id],
+        )
+        response = self.client.get(
+            reverse('users-list'), {'search': 'dirk', 'limit': 10}
+        )
+        self.assertEqual(response.data['count'], 1)
+        response = self.client.get(
+            reverse('users-list'), {'search': 'dirlast', 'limit': 10}
+        )
+        self.assertEqual(response.data['count'], 5)
+
+    def test_cursor_pagination(self):
+        """Pages follow (username, id) and cost the same queries."""
+
+        url = reverse('users-list')
+        params = {'search': 'dir', 'cursor': '', 'limit': 2}
+        pages = []
+        while url:
+            with self.assertNumQueries(2):
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            pages.append([
+                (user['username'], user['is_subscribed'])
+                for user in response.data['results']
+            ])
+            url, params = response.data['next'], None
+        first, second, third, fourth, fifth = self.users
+        expected = sorted(
+            [first, second, third, fourth, fifth, self.reader],
+            key=lambda user: (user.username, user.id),
+        )
+        self.assertEqual(
+            [username for page in pages for username, _ in page],
+            [user.username for user in expected],
+        )
+        self.assertEqual(
+            [len(page) for page in pages], [2, 2, 2]
+        )
+        self.assertEqual(
+            [
+                subscribed for page in pages for username, subscribed in page
+                if username == 'dirb'
+            ],
+            [False, True],
+        )
+        response = self.client.get(reverse('users-list'), {'cursor': '!'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_subscription_flag_on_profile(self):
+        """The profile is stamped with the subscription flag too."""
+
+        response = self.client.get(
+            reverse('users-detail', kwargs={'pk': self.users[2].id})
+        )
+        self.assertTrue(response.data['is_subscribed'])
+
+
 class UsersEndpointTests(AuthorizedUserAuthorPresets):
     """Tests for users endpoints."""
 
@@ -532,6 +647,9 @@ class IngredientEndpointsTests(APITestCase):
         cls.fake = Faker()
         super().setUpClass()
 
+    def setUp(self):
+        cache.delete(cache_key(Ingredient))
+
     def test_ingredients(self):
         """Test ingredients endpoint."""
 
@@ -829,6 +947,230 @@ class RecipesEndpointsTests(APITestCase):
         self.assertIn(ingredients[1], recipe.ingredients.all())
         self.assertFalse(recipe.image.url.endswith('1.jpg'))
 
+    def test_recipes_update_writes_only_the_diff(self):
+        """Only changed ingredients are written, kept rows keep their ids."""
+
+        tag = Tag.objects.create(name='diff', slug='diff', color='diff')
+        ingredients = [
+            Ingredient.objects.create(name=f'diff{i}', measurement_unit='g')
+            for i in range(4)
+        ]
+        recipe = generate_recipe(self.author)
+        recipe.tags.set([tag])
+        rows = RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+            for ingredient in ingredients[:3]
+        )
+        kept_ids = set(RecipeIngredient.objects.filter(
+            recipe=recipe, ingredient__in=ingredients[:2]
+        ).values_list('id', flat=True))
+        payload = {
+            'tags': [tag.id],
+            'ingredients': [
+                dict(id=ingredients[0].id, amount=1),
+                dict(id=ingredients[1].id, amount=7),
+                dict(id=ingredients[3].id, amount=3),
+            ],
+        }
+        url = reverse('recipes-detail', kwargs={'pk': recipe.id})
+        with CaptureQueriesContext(connection) as context:
+            response = self.author_client.patch(url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        writes = [
+            query['sql'].split()[0]
+            for query in context.captured_queries
+            if query['sql'].split()[0] in ('INSERT', 'UPDATE', 'DELETE')
+            and ('recipeingredient' in query['sql']
+                 or 'recipe_tags' in query['sql'])
+        ]
+        self.assertEqual(sorted(writes), ['DELETE', 'INSERT', 'UPDATE'])
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(
+            dict(recipe.recipeingredients.values_list(
+                'ingredient_id', 'amount'
+            )),
+            {ingredients[0].id: 1, ingredients[1].id: 7, ingredients[3].id: 3},
+        )
+        self.assertTrue(kept_ids <= set(
+            recipe.recipeingredients.values_list('id', flat=True)
+        ))
+
+    def test_recipe_ids_are_validated_in_bulk(self):
+        """Ingredients and tags are resolved with one query each."""
+
+        tags = [
+            Tag.objects.create(name=f'bulk{i}', slug=f'bulk{i}', color=f'#{i}')
+            for i in range(3)
+        ]
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'bulk{i}', measurement_unit='g')
+            for i in range(25)
+        )
+        ingredients = Ingredient.objects.filter(name__startswith='bulk')
+        payload = {
+            'tags': [tag.id for tag in tags],
+            'ingredients': [
+                dict(id=ingredient.id, amount=1) for ingredient in ingredients
+            ],
+            'name': 'Bulk',
+            'text': 'Bulk',
+            'cooking_time': 1,
+        }
+        serializer = RecipeSerializer(
+            data=payload, partial=True, context={'request': None}
+        )
+        with self.assertNumQueries(2):
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(
+            serializer.validated_data['recipeingredients'][0]['ingredient'],
+            ingredients[0],
+        )
+        missing = max(Ingredient.objects.values_list('id', flat=True)) + 1
+        payload['tags'] += [missing, missing + 1]
+        payload['ingredients'] += [
+            dict(id=missing, amount=1), dict(id=missing + 1, amount=1)
+        ]
+        url = reverse('recipes-list')
+        response = self.author_client.post(url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(response.data['tags']), 2)
+        self.assertIn(str(missing + 1), response.data['ingredients'][0])
+        payload['tags'] = [tags[0].id]
+        payload['ingredients'] = [
+            dict(id=ingredients[0].id, amount=1),
+            dict(id=ingredients[0].id, amount=2),
+        ]
+        response = self.author_client.post(url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Duplicate', response.data['ingredients'][0])
+
+    def test_recipe_conditional_get(self):
+        """Details carry validators and unchanged recipes answer 304."""
+
+        recipe = generate_recipe(self.author)
+        tag = Tag.objects.create(name='etag', slug='etag', color='#e7a9')
+        ingredient = Ingredient.objects.create(
+            name='etag', measurement_unit='g'
+        )
+        url = reverse('recipes-detail', kwargs={'pk': recipe.id})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"1-'))
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.author_client.patch(url, {
+            'cooking_time': 42,
+            'tags': [tag.id],
+            'ingredients': [{'id': ingredient.id, 'amount': 1}],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['ETag'].startswith('"2-'))
+        reader = APIClient()
+        reader.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user)}'
+        )
+        etag = reader.get(url)['ETag']
+        response = reader.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        reader.post(reverse('recipes-favorite', kwargs={'pk': recipe.id}))
+        response = reader.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['is_favorited'])
+        etag = response['ETag']
+        cache.clear()
+        response = reader.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        Favorite.objects.filter(user=self.user, recipe=recipe).delete()
+        response = reader.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['is_favorited'])
+        etag = response['ETag']
+        ShoppingCart.objects.create(user=self.user, recipe=recipe)
+        response = reader.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['is_in_shopping_cart'])
+        etag = response['ETag']
+        ingredient.measurement_unit = 'kg'
+        ingredient.save()
+        response = reader.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data['ingredients'][0]['measurement_unit'], 'kg'
+        )
+        etag = response['ETag']
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name = 'Renamed'
+        author.save()
+        response = reader.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['author']['first_name'], 'Renamed')
+        response = self.client.get(
+            reverse('recipes-detail', kwargs={'pk': 'nope'})
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_recipe_optimistic_concurrency(self):
+        """Stale If-Match or version fail with 412 and change nothing."""
+
+        recipe = generate_recipe(self.author)
+        tag = Tag.objects.create(name='match', slug='match', color='#3a7c4')
+        ingredient = Ingredient.objects.create(
+            name='match', measurement_unit='g'
+        )
+        url = reverse('recipes-detail', kwargs={'pk': recipe.id})
+        payload = {
+            'cooking_time': 7,
+            'tags': [tag.id],
+            'ingredients': [{'id': ingredient.id, 'amount': 1}],
+        }
+        etag = self.author_client.get(url)['ETag']
+        response = self.author_client.patch(
+            url, payload, format='json', HTTP_IF_MATCH=etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        payload['cooking_time'] = 8
+        response = self.author_client.patch(
+            url, payload, format='json', HTTP_IF_MATCH=etag
+        )
+        self.assertEqual(
+            response.status_code, status.HTTP_412_PRECONDITION_FAILED
+        )
+        self.assertEqual(
+            response.data['detail'],
+            'The recipe has been changed by someone else.',
+        )
+        response = self.author_client.patch(
+            url, payload, format='json', HTTP_IF_MATCH='"garbage"'
+        )
+        self.assertEqual(
+            response.status_code, status.HTTP_412_PRECONDITION_FAILED
+        )
+        response = self.author_client.patch(
+            url, {**payload, 'version': 1}, format='json'
+        )
+        self.assertEqual(
+            response.status_code, status.HTTP_412_PRECONDITION_FAILED
+        )
+        recipe.refresh_from_db()
+        self.assertEqual((recipe.version, recipe.cooking_time), (2, 7))
+        response = self.author_client.patch(
+            url, {**payload, 'version': 2}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('version', response.data)
+        recipe.refresh_from_db()
+        self.assertEqual((recipe.version, recipe.cooking_time), (3, 8))
+
     def test_delete_recipe(self):
         """Tests if recipe deletion works as intended."""
 
@@ -838,13 +1180,17 @@ class RecipesEndpointsTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
         response = self.user_client.delete(url)
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
-        recipes_amount = Recipe.objects.count()
+        recipes_amount = Recipe.objects.visible().count()
         response = self.author_client.delete(url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
-        self.assertEqual(Recipe.objects.count(), recipes_amount - 1)
-        self.assertEqual(Recipe.objects.filter(id=recipe.id).count(), 0)
+        self.assertIn('/api/jobs/', response['Location'])
+        self.assertEqual(Recipe.objects.visible().count(), recipes_amount - 1)
+        response = self.author_client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
         response = self.author_client.delete(url)
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        call_command('run_jobs', workers=0, once=True, stdout=StringIO())
+        self.assertEqual(Recipe.objects.filter(id=recipe.id).count(), 0)
 
     def test_is_subscribed_in_recipes_list(self):
         """Tests if the is_subscribed author field works correctly."""
@@ -911,6 +1257,122 @@ class FavoriteEndpointsTests(APITestCase):
         self.assertEqual(Favorite.objects.count(), previous_favs)
 
 
+    def test_favorite_single_statement_paths(self):
+        """Create and delete write the relation, score and user's stamp."""
+
+        url = reverse('recipes-favorite', kwargs={'pk': self.recipe.id})
+        with CaptureQueriesContext(connection) as context:
+            response = self.user_client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [query['sql'].split()[0] for query in context.captured_queries
+             if not query['sql'].startswith(('SAVEPOINT', 'RELEASE'))],
+            ['SELECT', 'INSERT', 'UPDATE', 'UPDATE'],
+        )
+        response = self.user_client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data,
+            {'non_field_errors': ['You have already favorited this recipe.']},
+        )
+        with self.assertNumQueries(4):
+            response = self.user_client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        response = self.user_client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        missing = reverse('recipes-favorite', kwargs={'pk': 10 ** 9})
+        response = self.user_client.post(missing)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.user_client.delete(missing)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BatchEndpointsTests(APITestCase):
+    """Tests for batch favorite, shopping cart and subscribe endpoints."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            email='batch@author.com', username='BatchAuthor'
+        )
+        cls.user = User.objects.create(
+            email='batch@user.com', username='BatchUser'
+        )
+        cls.recipes = [generate_recipe(cls.author) for _ in range(3)]
+
+    def setUp(self):
+        self.user_client = APIClient()
+        self.user_client.force_authenticate(self.user)
+
+    def test_batch_shopping_cart_and_favorites(self):
+        """Recipes are added and removed in bulk with per-id statuses."""
+
+        ids = [recipe.id for recipe in self.recipes]
+        for name, model in (
+            ('recipes-shopping-cart-batch', ShoppingCart),
+            ('recipes-favorite-batch', Favorite),
+        ):
+            with self.subTest(name=name):
+                url = reverse(name)
+                model.objects.create(user=self.user, recipe=self.recipes[0])
+                response = self.user_client.post(
+                    url, {'ids': ids + [100500]}, format='json'
+                )
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(
+                    [item['status'] for item in response.data['results']],
+                    ['exists', 'created', 'created', 'not_found'],
+                )
+                self.assertEqual(
+                    model.objects.filter(user=self.user).count(), 3
+                )
+                response = self.user_client.delete(
+                    url, {'ids': ids[:2]}, format='json'
+                )
+                self.assertEqual(
+                    [item['status'] for item in response.data['results']],
+                    ['deleted', 'deleted'],
+                )
+                self.assertEqual(
+                    model.objects.filter(user=self.user).count(), 1
+                )
+
+    def test_batch_subscribe(self):
+        """Authors are subscribed in bulk, self-subscription is refused."""
+
+        url = reverse('users-subscribe-batch')
+        response = self.user_client.post(
+            url, {'ids': [self.author.id, self.user.id]}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['status'] for item in response.data['results']],
+            ['created', 'forbidden'],
+        )
+        self.assertTrue(Subscription.objects.filter(
+            user=self.user, author=self.author
+        ).exists())
+        response = self.user_client.delete(
+            url, {'ids': [self.author.id]}, format='json'
+        )
+        self.assertEqual(response.data['results'][0]['status'], 'deleted')
+
+    def test_batch_validation(self):
+        """Empty, oversized or anonymous batches are rejected."""
+
+        url = reverse('recipes-favorite-batch')
+        for ids in ([], ['x'], list(range(1, settings.BATCH_MAX_SIZE + 2))):
+            with self.subTest(ids=len(ids)):
+                response = self.user_client.post(
+                    url, {'ids': ids}, format='json'
+                )
+                self.assertEqual(
+                    response.status_code, status.HTTP_400_BAD_REQUEST
+                )
+        response = self.client.post(url, {'ids': [1]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
 class TagsEndpointsTests(APITestCase):
     """Tests for favorite endpoins."""
 
@@ -0,0 +1,122 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase, override_settings
+
+from recipes.feeds import CELEBRITIES_CACHE_KEY, fan_out
+from recipes.models import FeedEntry, Recipe
+from recipes.purge import deactivate_recipe, deactivate_user
+from users.models import Subscription, User
+
+
+@override_settings(FEED_FANOUT_MAX_FOLLOWERS=2)
+class FeedTests(APITestCase):
+    """Subscriptions feed with fan-out on write and fan-in on read."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create(email='feed@read.er', username='fr')
+        cls.fan = User.objects.create(email='feed@f.an', username='fan')
+        cls.author = User.objects.create(email='feed@auth.or', username='fa')
+        cls.star = User.objects.create(email='feed@st.ar', username='star')
+        now = timezone.now()
+        cls.recipes = {}
+        for minutes, author in enumerate(
+            (cls.author, cls.star, cls.author, cls.star)
+        ):
+            recipe = Recipe.objects.create(
+                author=author, name=f'feed{minutes}', cooking_time=1,
+                image='1.jpg',
+            )
+            Recipe.objects.filter(pk=recipe.pk).update(
+                pub_date=now - timedelta(minutes=10 - minutes)
+            )
+            cls.recipes[minutes] = recipe.pk
+        Subscription.objects.create(user=cls.fan, author=cls.star)
+        Subscription.objects.create(user=cls.fan, author=cls.author)
+        for number in range(2):
+            Subscription.objects.create(
+                user=User.objects.create(
+                    email=f'feed@f.an{number}', username=f'fan{number}'
+                ),
+                author=cls.star,
+            )
+
+    def setUp(self):
+        cache.delete(CELEBRITIES_CACHE_KEY)
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def feed(self, **params):
+        response = self.client.get(reverse('recipes-feed'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_feed(self):
+        """Backfill, fan-out, fan-in for celebrities and trimming."""
+
+        for author in self.author, self.star:
+            response = self.client.post(
+                reverse('users-subscribe', kwargs={'pk': author.id})
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            set(FeedEntry.objects.filter(
+                user=self.reader
+            ).values_list('recipe_id', flat=True)),
+            {self.recipes[0], self.recipes[2]},
+        )
+        data = self.feed()
+        self.assertEqual(data['count'], 4)
+        self.assertEqual(
+            [recipe['id'] for recipe in data['results']],
+            [self.recipes[minutes] for minutes in (3, 2, 1, 0)],
+        )
+        self.assertIn('is_favorited', data['results'][0])
+        data = self.feed(limit=1, page=2)
+        self.assertEqual(
+            [recipe['id'] for recipe in data['results']], [self.recipes[2]]
+        )
+        self.client.delete(
+            reverse('users-subscribe', kwargs={'pk': self.author.id})
+        )
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.feed()['count'], 2)
+        response = APIClient().get(reverse('recipes-feed'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_fan_out(self):
+        """New recipes are pushed to followers of regular authors only."""
+
+        Subscription.objects.create(user=self.reader, author=self.author)
+        recipe = Recipe.objects.create(
+            author=self.author, name='fresh', cooking_time=1, image='1.jpg'
+        )
+        self.assertEqual(fan_out(recipe), 2)
+        self.assertEqual(self.feed()['results'][0]['id'], recipe.id)
+        recipe = Recipe.objects.create(
+            author=self.star, name='starry', cooking_time=1, image='1.jpg'
+        )
+        self.assertEqual(fan_out(recipe), 0)
+
+    def test_hidden_recipes_are_left_out(self):
+        """Deactivated recipes and authors are not counted nor listed."""
+
+        self.client.force_authenticate(self.fan)
+        for minutes in range(4):
+            FeedEntry.objects.create(
+                user=self.fan, recipe_id=self.recipes[minutes],
+                author=self.author if minutes % 2 == 0 else self.star,
+                pub_date=timezone.now(),
+            )
+        self.assertEqual(self.feed()['count'], 4)
+        deactivate_recipe(Recipe.objects.get(pk=self.recipes[2]))
+        deactivate_user(self.star)
+        data = self.feed(limit=1)
+        self.assertEqual(data['count'], 1)
+        self.assertEqual(
+            [recipe['id'] for recipe in data['results']], [self.recipes[0]]
+        )
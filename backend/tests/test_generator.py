@@ -0,0 +1,95 @@
+from io import StringIO
+
+import numpy as np
+from django.core.management import call_command
+from django.db.models import Count
+from django.test import TestCase
+
+from recipes.counters import recount
+from recipes.generator import ZipfSampler
+from recipes.models import (Favorite, FeedEntry, Recipe, RecipeIngredient,
+                            RecipeSignature, ShoppingCart, Tag)
+from users.models import Subscription, User
+
+
+class GeneratorTests(TestCase):
+    """Synthetic data with skewed distributions and consistent counters."""
+
+    def generate(self, *args):
+        output = StringIO()
+        call_command(
+            'generate_data', '--users=30', '--recipes=120', '--tags=3',
+            '--ingredients=20', '--chunk-size=7', *args, stdout=output,
+        )
+        return output.getvalue()
+
+    def test_zipf_sampler(self):
+        """The top rank is drawn far more often than the median one."""
+
+        sampler = ZipfSampler(100, 1.2, np.random.default_rng(0))
+        counts = np.bincount(sampler.draw(10000), minlength=100)
+        top = sampler.order[0]
+        self.assertGreater(counts[top], 10 * np.median(counts))
+        uniform = ZipfSampler(100, 0, np.random.default_rng(0))
+        counts = np.bincount(uniform.draw(10000), minlength=100)
+        self.assertLess(counts.max(), 3 * counts.min())
+
+    def test_generate(self):
+        """Every table is filled, derived data is kept consistent."""
+
+        output = self.generate()
+        self.assertIn('Data generated', output)
+        users = User.objects.filter(email__endswith='@generated.test')
+        recipes = Recipe.objects.filter(author__in=users)
+        self.assertEqual(users.count(), 30)
+        self.assertEqual(recipes.count(), 120)
+        self.assertEqual(
+            Tag.objects.filter(slug__startswith='generated-').count(), 3
+        )
+        ingredients = RecipeIngredient.objects.filter(recipe__in=recipes)
+        self.assertGreaterEqual(ingredients.count(), 120 * 2)
+        for model in (Favorite, ShoppingCart):
+            self.assertTrue(model.objects.filter(user__in=users).exists())
+        self.assertFalse(
+            Subscription.objects.filter(user__in=users).exclude(
+                author__in=users
+            ).exists()
+        )
+        self.assertEqual(recount(), 0)
+        busiest = recipes.values('author').annotate(
+            count=Count('id')
+        ).order_by('-count').values_list('count', flat=True)
+        self.assertGreater(busiest[0], 120 / 30 * 2)
+        favorited = Recipe.objects.filter(favorites__isnull=False).first()
+        self.assertGreater(favorited.popularity, 0)
+        self.assertEqual(
+            RecipeSignature.objects.filter(recipe__in=recipes).count(), 120
+        )
+        self.assertTrue(FeedEntry.objects.filter(user__in=users).exists())
+        user = users.first()
+        self.assertTrue(User.objects.create(email='next@user.com').pk)
+        self.assertFalse(user.has_usable_password())
+
+    def test_seed_is_deterministic(self):
+        """The same seed gives the same data."""
+
+        def snapshot():
+            start = User.objects.order_by('-id').values_list(
+                'id', flat=True
+            ).first() or 0
+            self.generate('--seed=5')
+            users = User.objects.filter(id__gt=start)
+            recipes = Recipe.objects.filter(author__in=users)
+            return (
+                list(users.order_by('id').values_list(
+                    'first_name', 'last_name'
+                )),
+                sorted(
+                    (author - start, count)
+                    for author, count in recipes.values('author').annotate(
+                        count=Count('id')
+                    ).values_list('author', 'count')
+                ),
+            )
+
+        self.assertEqual(snapshot(), snapshot())
@@ -0,0 +1,166 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from unittest import skipUnless
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from recipes.importers import (IngredientImporter, TagImporter, UserImporter,
+                               read_rows)
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import User
+
+
+class ImporterTests(TestCase):
+    """Chunked importers are streaming and idempotent."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, 'w', encoding='utf-8') as ofile:
+            ofile.write(content)
+        return path
+
+    def test_ingredients_import_is_idempotent(self):
+        """Re-running an ingredients import creates nothing new."""
+
+        path = self.write(
+            'ingredients.csv', 'salt,g\npepper,g\nsalt,g\nwater,ml\n'
+        )
+        importer = IngredientImporter(chunk_size=2)
+        stats = importer.run(read_rows(path, importer.csv_fieldnames))
+        self.assertEqual(stats.rows, 4)
+        self.assertEqual(stats.created, 3)
+        self.assertEqual(Ingredient.objects.count(), 3)
+        stats = importer.run(read_rows(path, importer.csv_fieldnames))
+        self.assertEqual(stats.created, 0)
+        self.assertEqual(Ingredient.objects.count(), 3)
+
+    def test_tags_are_updated(self):
+        """Existing tags get their changed fields updated."""
+
+        Tag.objects.create(
+            name='Import lunch', color='#000000', slug='import-lunch'
+        )
+        rows = [
+            {'name': 'Import lunch', 'color': '#FFFFFF',
+             'slug': 'import-lunch'},
+            {'name': 'Import dinner', 'color': '#111111',
+             'slug': 'import-dinner'},
+        ]
+        stats = TagImporter().run(rows)
+        self.assertEqual((stats.created, stats.updated), (1, 1))
+        self.assertEqual(
+            Tag.objects.get(slug='import-lunch').color, '#FFFFFF'
+        )
+
+    @skipUnless(connection.vendor == 'postgresql', 'COPY is PostgreSQL only')
+    def test_copy_stats_match_the_orm_path(self):
+        """Re-importing with COPY counts updates, not creations."""
+
+        path = self.write('tags.csv', (
+            'Copy lunch,#000000,copy-lunch\n'
+            'Copy dinner,#111111,copy-dinner\n'
+        ))
+        fieldnames = ['name', 'color', 'slug']
+        stats = TagImporter(use_copy=True).run(read_rows(path, fieldnames))
+        self.assertEqual((stats.created, stats.updated), (2, 0))
+        stats = TagImporter(use_copy=True).run(read_rows(path, fieldnames))
+        self.assertEqual((stats.created, stats.updated), (0, 0))
+        Tag.objects.filter(slug='copy-lunch').update(color='#222222')
+        stats = TagImporter(use_copy=True).run(read_rows(path, fieldnames))
+        self.assertEqual((stats.created, stats.updated), (0, 1))
+
+    def test_user_passwords(self):
+        """Only plain text passwords are hashed, missing ones are unusable."""
+
+        hashed = make_password('hashed_secret')
+        rows = [
+            {'email': 'hash@fo.od', 'username': 'hash', 'first_name': 'H',
+             'last_name': 'H', 'password_hash': hashed},
+            {'email': 'plain@fo.od', 'username': 'plain', 'first_name': 'P',
+             'last_name': 'P', 'password': 'a' * 32},
+            {'email': 'none@fo.od', 'username': 'none', 'first_name': 'N',
+             'last_name': 'N'},
+        ]
+        UserImporter().run(rows)
+        users = {user.username: user for user in User.objects.filter(
+            username__in=('hash', 'plain', 'none')
+        )}
+        self.assertEqual(users['hash'].password, hashed)
+        self.assertTrue(users['plain'].check_password('a' * 32))
+        self.assertFalse(users['none'].has_usable_password())
+        rows[1]['password'] = 'changed'
+        stats = UserImporter().run(rows)
+        self.assertEqual((stats.created, stats.updated), (0, 0))
+        self.assertTrue(
+            User.objects.get(username='plain').check_password('a' * 32)
+        )
+        rows[0]['first_name'] = 'Renamed'
+        stats = UserImporter().run(rows)
+        self.assertEqual((stats.created, stats.updated), (0, 1))
+        self.assertGreater(
+            User.objects.get(username='hash').modified, users['hash'].modified
+        )
+
+    def test_import_command_with_recipes(self):
+        """Users, tags, ingredients and nested recipes via the command."""
+
+        users = self.write('users.jsonl', json.dumps({
+            'email': 'chef@kitchen.org',
+            'username': 'chef',
+            'first_name': 'Gordon',
+            'last_name': 'Chef',
+            'password': 'secret_password',
+        }) + '\n')
+        tags = self.write('tags.json', json.dumps(
+            [{'name': 'Soup', 'color': '#00FF00', 'slug': 'soup'}]
+        ))
+        ingredients = self.write(
+            'ingredients.csv', 'name,measurement_unit\nbeet,g\nwater,ml\n'
+        )
+        recipe = {
+            'author': 'chef@kitchen.org',
+            'name': 'Borscht',
+            'text': 'Boil it.',
+            'cooking_time': 90,
+            'tags': ['soup'],
+            'ingredients': [
+                {'name': 'beet', 'measurement_unit': 'g', 'amount': 300},
+                {'name': 'water', 'measurement_unit': 'ml', 'amount': 2000},
+            ],
+        }
+        recipes = self.write('recipes.jsonl', json.dumps(recipe) + '\n')
+        for kind, path in (
+            ('users', users),
+            ('tags', tags),
+            ('ingredients', ingredients),
+            ('recipes', recipes),
+            ('recipes', recipes),
+        ):
+            with self.subTest(kind=kind):
+                call_command('import_data', kind, path, stdout=StringIO())
+        user = User.objects.get(email='chef@kitchen.org')
+        self.assertTrue(user.check_password('secret_password'))
+        borscht = Recipe.objects.get(author=user, name='Borscht')
+        self.assertEqual(user.recipes.count(), 1)
+        self.assertEqual(user.recipes_count, 1)
+        self.assertEqual(list(borscht.tags.values_list('slug', flat=True)),
+                         ['soup'])
+        self.assertEqual(
+            RecipeIngredient.objects.get(
+                recipe=borscht, ingredient__name='water'
+            ).amount,
+            2000,
+        )
+        self.assertEqual(borscht.recipeingredients.count(), 2)
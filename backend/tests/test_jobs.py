@@ -0,0 +1,156 @@
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase, override_settings
+
+from jobs.models import Job
+from jobs.worker import purge_expired, run_job
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart)
+from users.models import User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class JobsTests(APITestCase):
+    """Tests for the background jobs queue and its endpoints."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='jobs@user.com', username='job')
+        cls.other = User.objects.create(email='other@user.com', username='o')
+        recipe = Recipe.objects.create(
+            author=cls.user, name='Queued', cooking_time=1, image='1.jpg'
+        )
+        ingredient = Ingredient.objects.create(
+            name='patience', measurement_unit='ea'
+        )
+        RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=ingredient, amount=1
+        )
+        ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        Favorite.objects.create(user=cls.user, recipe=recipe)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user_client = APIClient()
+        self.user_client.force_authenticate(self.user)
+
+    @override_settings(INLINE_EXPORT_MAX_ITEMS=0)
+    def test_large_export_is_queued(self):
+        """A large cart is rendered by a job and downloaded afterwards."""
+
+        response = self.user_client.get(
+            reverse('recipes-download-shopping-cart')
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], Job.PENDING)
+        self.assertIsNone(response.data['result'])
+        job_url = response['Location']
+        job = Job.objects.get(pk=response.data['id'])
+        self.assertEqual(Job.objects.claim(5), [job.pk])
+        self.assertEqual(Job.objects.claim(5), [])
+        self.assertEqual(run_job(job.pk), Job.DONE)
+        response = self.user_client.get(job_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], Job.DONE)
+        self.assertIsNotNone(response.data['expires'])
+        response = self.user_client.get(response.data['result'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreaterEqual(len(b''.join(response.streaming_content)),
+                                1000)
+        other_client = APIClient()
+        other_client.force_authenticate(self.other)
+        response = other_client.get(job_url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_small_export_is_inline(self):
+        """Small carts are still rendered within the request."""
+
+        response = self.user_client.get(
+            reverse('recipes-download-shopping-cart')
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['content-type'], 'application/pdf')
+        self.assertFalse(Job.objects.exists())
+
+    def test_run_jobs_command_and_expiry(self):
+        """Jobs run inline with the command, failures and expiry."""
+
+        good = Job.objects.enqueue('shopping_cart_pdf', self.user)
+        bad = Job.objects.enqueue('no_such_kind', self.user)
+        call_command('run_jobs', workers=0, once=True, stdout=StringIO())
+        good.refresh_from_db()
+        bad.refresh_from_db()
+        self.assertEqual(good.status, Job.DONE)
+        self.assertEqual(bad.status, Job.FAILED)
+        self.assertIn('LookupError', bad.error)
+        self.assertEqual(purge_expired(), 0)
+        Job.objects.update(expires=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(purge_expired(), 2)
+        self.assertFalse(Job.objects.exists())
+
+    def test_recipe_book_export(self):
+        """Favorites book is inline for a few recipes, queued otherwise."""
+
+        url = reverse('recipes-download-favorites')
+        response = self.user_client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['content-type'], 'application/pdf')
+        self.assertTrue(
+            b''.join(response.streaming_content).startswith(b'%PDF')
+        )
+        with override_settings(RECIPE_BOOK_INLINE_MAX=0):
+            response = self.user_client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job = Job.objects.get(pk=response.data['id'])
+        self.assertEqual(job.kind, 'recipe_book_pdf')
+        self.assertEqual(run_job(job.pk), Job.DONE)
+        job.refresh_from_db()
+        self.assertTrue(job.result.name.endswith('RecipeBook.pdf'))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(RECIPE_BOOK_INLINE_MAX=0, RECIPE_BOOK_VOLUME_SIZE=1)
+    def test_big_recipe_book_is_a_zip(self):
+        """Big books are zipped volumes, pool workers make no pools."""
+
+        recipe = Recipe.objects.create(
+            author=self.other, name='Sequel', cooking_time=1, image='1.jpg'
+        )
+        Favorite.objects.create(user=self.user, recipe=recipe)
+        response = self.user_client.get(
+            reverse('recipes-download-favorites')
+        )
+        job = Job.objects.get(pk=response.data['id'])
+        with mock.patch('api.jobs.in_pool', return_value=True), mock.patch(
+            'api.recipebook.ProcessPoolExecutor', side_effect=AssertionError
+        ):
+            self.assertEqual(run_job(job.pk), Job.DONE)
+        job.refresh_from_db()
+        self.assertTrue(job.result.name.endswith('RecipeBook.zip'))
+        response = self.user_client.get(
+            reverse('jobs-result', kwargs={'pk': job.pk})
+        )
+        self.assertEqual(response['content-type'], 'application/zip')
+        with zipfile.ZipFile(
+            BytesIO(b''.join(response.streaming_content))
+        ) as archive:
+            self.assertEqual(
+                archive.namelist(),
+                ['RecipeBook-001.pdf', 'RecipeBook-002.pdf'],
+            )
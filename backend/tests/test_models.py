@@ -1,6 +1,9 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.exceptions import ValidationError
+from django.core.management import call_command
 from django.db import IntegrityError
 from django.test import TestCase
 
@@ -209,3 +212,37 @@ class CustomFunctionsTests(TestPresets):
         self.assertEqual(self.recipe.favorited, prev_favorited)
         cache.clear()
         self.assertEqual(self.recipe.favorited, prev_favorited + 1)
+
+
+class RecipesCountTests(TestPresets):
+    """Recipes counts of users are maintained with their recipes."""
+
+    def recipes_count(self, user):
+        return User.objects.values_list(
+            'recipes_count', flat=True
+        ).get(pk=user.pk)
+
+    def test_count_follows_recipes(self):
+        """Created and deleted recipes, cascades included, are counted."""
+
+        self.assertEqual(self.recipes_count(self.user), 1)
+        for number in range(3):
+            Recipe.objects.create(
+                author=self.user2, name=f'count{number}', text='-',
+                cooking_time=1, image='test.jpg',
+            )
+        self.assertEqual(self.recipes_count(self.user2), 3)
+        self.recipe.delete()
+        self.assertEqual(self.recipes_count(self.user), 0)
+        Recipe.objects.filter(author=self.user2, name='count0').delete()
+        self.assertEqual(self.recipes_count(self.user2), 2)
+
+    def test_reconciliation(self):
+        """The command fixes drifted counts only."""
+
+        User.objects.filter(pk=self.user.pk).update(recipes_count=7)
+        output = StringIO()
+        call_command('reconcile_recipes_count', stdout=output)
+        self.assertIn('1 recipes counts fixed.', output.getvalue())
+        self.assertEqual(self.recipes_count(self.user), 1)
+        self.assertEqual(self.recipes_count(self.user2), 0)
@@ -0,0 +1,97 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from foodgram.nplusone import NPlusOneError, QueryShapes
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+from users.models import Subscription, User
+
+
+class NPlusOneTests(TestCase):
+    """Queries repeated from the same place are flagged."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='n1@fo.od', username='n1')
+        cls.ingredient = Ingredient.objects.create(
+            name='n1', measurement_unit='g'
+        )
+        for number in range(8):
+            author = User.objects.create(
+                email=f'n1author{number}@fo.od', username=f'n1author{number}'
+            )
+            Subscription.objects.create(user=cls.user, author=author)
+            for _ in range(2):
+                recipe = Recipe.objects.create(
+                    author=author, name='n1', cooking_time=1, image='1.jpg'
+                )
+                RecipeIngredient.objects.create(
+                    recipe=recipe, ingredient=cls.ingredient, amount=1
+                )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_shapes_are_grouped_by_call_site(self):
+        """A loop of queries is an offender with its stack."""
+
+        shapes = QueryShapes()
+        with connection.execute_wrapper(shapes):
+            for recipe in Recipe.objects.filter(name='n1'):
+                str(recipe.author)
+            Recipe.objects.exists()
+        offender, = shapes.offenders()
+        self.assertEqual(offender['count'], 16)
+        self.assertIn('tests/test_nplusone.py', offender['site'])
+        self.assertIn('str(recipe.author)', ''.join(offender['stack']))
+        with override_settings(NPLUSONE_IGNORE=('tests/',)):
+            self.assertEqual(shapes.offenders(), [])
+
+    def test_subscriptions_have_no_n_plus_one(self):
+        """Recipes of all the followed authors are fetched at once."""
+
+        url = reverse('users-subscriptions')
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {'limit': 8, 'recipes_limit': 1})
+        self.assertEqual(len(response.data['results']), 8)
+        for author in response.data['results']:
+            self.assertEqual(len(author['recipes']), 1)
+        response = self.client.get(url)
+        self.assertEqual(len(response.data['results'][0]['recipes']), 2)
+
+    def test_recipe_admin_has_no_n_plus_one(self):
+        """Inline ingredients are shown and checked without a query each."""
+
+        recipe = Recipe.objects.filter(name='n1').first()
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient=Ingredient.objects.create(
+                    name=f'n1 {number}', measurement_unit='g'
+                ),
+                amount=1,
+            )
+            for number in range(8)
+        )
+        admin = User.objects.create_superuser(
+            email='n1admin@fo.od', username='n1admin', password='secret'
+        )
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:recipes_recipe_change', args=(recipe.pk,))
+        )
+        self.assertContains(response, 'id_recipeingredients-8-DELETE')
+        self.assertContains(response, 'selected>n1 7, g</option>')
+
+    @override_settings(NPLUSONE_THRESHOLD=0)
+    def test_middleware(self):
+        """Offending requests raise in tests and log in production."""
+
+        url = reverse('recipes-list')
+        with self.assertRaisesMessage(NPlusOneError, 'GET api/recipes/'):
+            self.client.get(url)
+        with override_settings(NPLUSONE_RAISE=False, NPLUSONE_SAMPLE_RATE=1):
+            with self.assertLogs('foodgram.nplusone', 'WARNING'):
+                self.assertEqual(self.client.get(url).status_code, 200)
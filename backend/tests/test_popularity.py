@@ -0,0 +1,102 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import User
+
+
+class PopularityTests(APITestCase):
+    """Popularity scores and the popular ordering of recipes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='pop@us.er', username='popu')
+        cls.author = User.objects.create(email='pop@auth.or', username='popa')
+        cls.other = User.objects.create(email='pop@oth.er', username='popo')
+        cls.recipes = [
+            Recipe.objects.create(
+                author=author, name=f'pop{number}', cooking_time=1,
+                image='1.jpg',
+            ).pk
+            for number, author in enumerate(
+                (cls.author, cls.author, cls.other)
+            )
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def scores(self):
+        return dict(Recipe.objects.filter(
+            pk__in=self.recipes
+        ).values_list('pk', 'popularity'))
+
+    def test_scores_follow_favorites_and_carts(self):
+        """Scores change with every favorite and shopping cart change."""
+
+        first, second, third = self.recipes
+        self.client.post(reverse('recipes-favorite', args=(first,)))
+        self.client.post(reverse('recipes-shopping-cart', args=(first,)))
+        self.client.post(
+            reverse('recipes-favorite-batch'),
+            {'ids': [second, third]},
+            format='json',
+        )
+        self.assertEqual(
+            self.scores(), {first: 1.5, second: 1.0, third: 1.0}
+        )
+        response = self.client.delete(
+            reverse('recipes-favorite', args=(first,))
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.client.delete(
+            reverse('recipes-favorite-batch'),
+            {'ids': [third]},
+            format='json',
+        )
+        self.assertEqual(
+            self.scores(), {first: 0.5, second: 1.0, third: 0.0}
+        )
+
+    def test_decay_and_rebuild(self):
+        """The command halves scores every half-life or recomputes them."""
+
+        first, second, third = self.recipes
+        Favorite.objects.create(user=self.user, recipe_id=first)
+        Favorite.objects.create(user=self.other, recipe_id=first)
+        ShoppingCart.objects.create(user=self.user, recipe_id=second)
+        Recipe.objects.filter(pk=third).update(popularity=8)
+        call_command(
+            'decay_popularity', '--hours=48', '--half-life=24',
+            '--batch-size=1', stdout=StringIO(),
+        )
+        self.assertEqual(self.scores()[third], 2.0)
+        call_command('decay_popularity', '--rebuild', stdout=StringIO())
+        self.assertEqual(
+            self.scores(), {first: 2.0, second: 0.5, third: 0.0}
+        )
+
+    def test_popular_ordering(self):
+        """Popular ordering composes with the other filters."""
+
+        first, second, third = self.recipes
+        Recipe.objects.filter(pk=second).update(popularity=3)
+        Recipe.objects.filter(pk=third).update(popularity=5)
+        response = self.client.get(
+            reverse('recipes-list'),
+            {'ordering': 'popular', 'author': self.author.id},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [second, first],
+        )
+        response = self.client.get(
+            reverse('recipes-list'), {'ordering': 'unpopular'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
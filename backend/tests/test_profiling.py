@@ -0,0 +1,65 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from foodgram.profiling import load
+
+PROFILING_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(PROFILING_DIR=PROFILING_DIR, PROFILING_TOKEN='secret')
+class ProfilingTests(TestCase):
+    """Requests are profiled on demand or by sampling."""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def tearDown(self):
+        shutil.rmtree(PROFILING_DIR, ignore_errors=True)
+
+    def test_profile_on_demand(self):
+        """Only requests with the right token are profiled."""
+
+        url = reverse('recipes-list')
+        self.client.get(url)
+        self.client.get(url, HTTP_X_PROFILE='wrong')
+        self.assertEqual(load(), [])
+        response = self.client.get(
+            url, {'limit': 1}, HTTP_X_PROFILE='secret'
+        )
+        profile, = load()
+        self.assertEqual(response['X-Profile-Id'], profile['id'])
+        self.assertEqual(profile['route'], 'api/recipes/$')
+        self.assertEqual(profile['path'], f'{url}?limit=1')
+        self.assertEqual(profile['status'], 200)
+        self.assertGreater(profile['queries'], 0)
+        output = StringIO()
+        call_command('show_profiles', profile['id'], stdout=output)
+        self.assertIn('function calls', output.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('show_profiles', 'nope', stdout=StringIO())
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_sampling_and_offenders(self):
+        """Sampled profiles are grouped by route in the viewer."""
+
+        for _ in range(2):
+            response = self.client.get(reverse('tags-list'))
+        self.client.get(reverse('ingredients-list'))
+        self.assertNotIn('X-Profile-Id', response)
+        output = StringIO()
+        call_command('show_profiles', stdout=output)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(len(lines), 3)
+        tags, = [line for line in lines if line.endswith('api/tags/$')]
+        self.assertIn('2 requests', tags)
+        self.assertIn('3 profiles stored.', lines[2])
+        output = StringIO()
+        call_command('show_profiles', route='tags', stdout=output)
+        self.assertEqual(len(output.getvalue().splitlines()), 2)
@@ -0,0 +1,238 @@
+import json
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from jobs.models import Job
+from recipes.counters import recount
+from recipes.models import (Favorite, FeedEntry, Ingredient, Recipe,
+                            RecipeIngredient, Recommendation, ShoppingCart,
+                            SimilarityBucket, Tag)
+from recipes.purge import deactivate_recipe, deactivate_user
+from recipes.similarity import index_recipes
+from users.models import Subscription, User
+
+
+@override_settings(PURGE_BATCH_SIZE=2)
+class PurgeTests(TestCase):
+    """Deleted users and recipes are hidden at once, purged in batches."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(email='pur@ge.au', username='purge')
+        cls.fan = User.objects.create(email='fan@ge.au', username='fan')
+        tag = Tag.objects.create(name='purge', slug='purge', color='#707070')
+        ingredients = [
+            Ingredient.objects.create(name=f'purge{i}', measurement_unit='g')
+            for i in range(3)
+        ]
+        cls.recipes = [
+            Recipe.objects.create(
+                author=cls.author, name=f'purge{i}', cooking_time=1,
+                image='1.jpg',
+            )
+            for i in range(3)
+        ]
+        cls.kept = Recipe.objects.create(
+            author=cls.fan, name='kept', cooking_time=1, image='1.jpg',
+            popularity=1.5,
+        )
+        for recipe in cls.recipes + [cls.kept]:
+            recipe.tags.set((tag,))
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+                for ingredient in ingredients
+            )
+            Favorite.objects.create(user=cls.fan, recipe=recipe)
+            ShoppingCart.objects.create(user=cls.fan, recipe=recipe)
+            FeedEntry.objects.create(
+                user=cls.fan, recipe=recipe, author=recipe.author,
+                pub_date=recipe.pub_date,
+            )
+            Recommendation.objects.create(
+                recipe=cls.kept, recommended=recipe, score=1
+            )
+        Favorite.objects.create(user=cls.author, recipe=cls.kept)
+        ShoppingCart.objects.create(user=cls.author, recipe=cls.kept)
+        Subscription.objects.create(user=cls.fan, author=cls.author)
+        Subscription.objects.create(user=cls.author, author=cls.fan)
+        index_recipes(recipe.id for recipe in cls.recipes + [cls.kept])
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def run_jobs(self):
+        call_command('run_jobs', workers=0, once=True, stdout=StringIO())
+
+    def test_user_is_hidden_then_purged(self):
+        """Only the user deletes themselves, everything of theirs goes."""
+
+        url = reverse('users-detail', args=(self.author.id,))
+        fan = APIClient()
+        fan.force_authenticate(self.fan)
+        self.assertEqual(
+            fan.delete(url).status_code, status.HTTP_403_FORBIDDEN
+        )
+        Recipe.objects.get(pk=self.kept.pk).favorited
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(User.objects.get(pk=self.author.pk).is_active)
+        self.assertEqual(
+            fan.get(url).status_code, status.HTTP_404_NOT_FOUND
+        )
+        self.assertEqual(
+            fan.get(
+                reverse('recipes-list'), {'author': self.author.id}
+            ).data['count'],
+            0,
+        )
+        self.assertEqual(
+            fan.get(response['Location']).status_code,
+            status.HTTP_404_NOT_FOUND,
+        )
+        self.run_jobs()
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.user), (Job.DONE, None))
+        self.assertEqual(json.loads(job.progress), {
+            'step': 'users',
+            'deleted': {
+                'feed entries': 3,
+                'subscriptions': 2,
+                'favorites': 4,
+                'shopping carts': 4,
+                'recommendations': 3,
+                'similarity': 3 * 21,
+                'ingredients': 9,
+                'tags': 3,
+                'recipes': 3,
+                'users': 1,
+            },
+        })
+        self.assertFalse(User.objects.filter(pk=self.author.pk).exists())
+        self.assertFalse(
+            Recipe.objects.filter(name__startswith='purge').exists()
+        )
+        fan = self.fan
+        self.assertEqual(Favorite.objects.get(user=fan).recipe, self.kept)
+        self.assertEqual(FeedEntry.objects.get(user=fan).recipe, self.kept)
+        self.assertEqual(
+            Recommendation.objects.get(recipe=self.kept).recommended,
+            self.kept,
+        )
+        self.assertEqual(
+            SimilarityBucket.objects.filter(recipe__author=fan).count(), 20
+        )
+        self.assertFalse(Subscription.objects.filter(user=fan).exists())
+        kept = Recipe.objects.get(pk=self.kept.pk)
+        self.assertEqual((kept.popularity, kept.favorited), (0.0, 1))
+
+    def test_deactivated_author(self):
+        """Token and recipes of a deactivated user stop working at once."""
+
+        token = Token.objects.create(user=self.author)
+        deactivate_user(self.author)
+        self.assertTrue(Recipe.objects.get(pk=self.recipes[0].pk).is_active)
+        client = APIClient()
+        client.force_authenticate(self.fan)
+        response = client.post(
+            reverse('recipes-favorite', args=(self.recipes[0].id,))
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = client.get(
+            reverse('recipes-detail', args=(self.recipes[0].id,))
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        response = client.get(reverse('users-me'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_hidden_parents_cannot_be_linked(self):
+        """Deactivated recipes and users are not found when linking."""
+
+        follower = User.objects.create(email='late@ge.au', username='late')
+        client = APIClient()
+        client.force_authenticate(follower)
+        deactivate_recipe(self.kept)
+        deactivate_user(self.author)
+        for url in (
+            reverse('recipes-favorite', args=(self.kept.id,)),
+            reverse('recipes-shopping-cart', args=(self.kept.id,)),
+            reverse('users-subscribe', args=(self.author.id,)),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(
+                    client.post(url).status_code, status.HTTP_404_NOT_FOUND
+                )
+        response = client.post(
+            reverse('recipes-favorite-batch'), {'ids': [self.kept.id]},
+            format='json',
+        )
+        self.assertEqual(response.data['results'], [
+            {'id': self.kept.id, 'status': 'not_found'},
+        ])
+        response = self.client.delete(
+            reverse('recipes-favorite-batch'), {'ids': [self.kept.id]},
+            format='json',
+        )
+        self.assertEqual(response.data['results'], [
+            {'id': self.kept.id, 'status': 'deleted'},
+        ])
+
+    def test_recipe_is_hidden_then_purged(self):
+        """The recipe leaves the count at once, the purge does not recount."""
+
+        recipe = self.recipes[0]
+        url = reverse('recipes-detail', args=(recipe.id,))
+        self.assertEqual(
+            self.client.delete(url).status_code,
+            status.HTTP_204_NO_CONTENT,
+        )
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(
+            User.objects.get(pk=self.author.pk).recipes_count, 2
+        )
+        self.run_jobs()
+        self.assertFalse(Recipe.objects.filter(pk=recipe.pk).exists())
+        self.assertFalse(Favorite.objects.filter(recipe=recipe).exists())
+        self.assertEqual(
+            User.objects.get(pk=self.author.pk).recipes_count, 2
+        )
+        self.assertEqual(recount(), 0)
+
+    def test_admin_delete(self):
+        """Admin deletion queues a purge without collecting dependents."""
+
+        admin = User.objects.create_superuser(
+            email='admin@purge.au', username='purgeadmin', password='secret'
+        )
+        client = APIClient()
+        client.force_login(admin)
+        url = reverse('admin:users_user_delete', args=(self.author.pk,))
+        with self.assertNumQueries(5):
+            response = client.get(url)
+        self.assertContains(response, 'purge')
+        response = client.post(url, {'post': 'yes'})
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        job = Job.objects.get()
+        self.assertEqual(
+            (job.kind, job.user, job.params),
+            ('purge_user', admin, {'pk': self.author.pk}),
+        )
+        self.assertFalse(User.objects.get(pk=self.author.pk).is_active)
+        self.assertTrue(Recipe.objects.filter(author=self.author).exists())
+        url = reverse('admin:recipes_recipe_delete', args=(self.kept.pk,))
+        response = client.post(url, {'post': 'yes'})
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(
+            Job.objects.get(kind='purge_recipe').params, {'pk': self.kept.pk}
+        )
+        self.assertFalse(Recipe.objects.get(pk=self.kept.pk).is_active)
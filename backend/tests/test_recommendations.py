@@ -0,0 +1,101 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from recipes.models import Favorite, Recipe, Recommendation
+from users.models import User
+
+
+class RecommendationTests(APITestCase):
+    """Recipes favorited together, precomputed with sparse matrices."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create(
+                email=f'rec@us.er{number}', username=f'rec{number}'
+            )
+            for number in range(3)
+        ]
+        cls.a, cls.b, cls.c, cls.d = (
+            Recipe.objects.create(
+                author=cls.users[0], name=f'rec{number}', cooking_time=1,
+                image='1.jpg',
+            ).pk
+            for number in range(4)
+        )
+        favorites = (
+            (cls.a, cls.b, cls.c), (cls.a, cls.b), (cls.a, cls.c, cls.d)
+        )
+        for user, recipes in zip(cls.users, favorites):
+            for recipe in recipes:
+                Favorite.objects.create(user=user, recipe_id=recipe)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def build(self, *args):
+        call_command('build_recommendations', *args, stdout=StringIO())
+
+    def recommended(self):
+        recommendations = {}
+        for recipe, recommended in Recommendation.objects.order_by(
+            'recipe_id', '-score', 'recommended_id'
+        ).values_list('recipe_id', 'recommended_id'):
+            recommendations.setdefault(recipe, []).append(recommended)
+        return recommendations
+
+    def test_build(self):
+        """Top-K cosine neighbours, self and rare pairs left out."""
+
+        self.build('--top-k=2', '--min-common=1', '--batch-size=3')
+        self.assertEqual(self.recommended(), {
+            self.a: [self.b, self.c],
+            self.b: [self.a, self.c],
+            self.c: [self.a, self.d],
+            self.d: [self.c, self.a],
+        })
+        score = Recommendation.objects.get(
+            recipe_id=self.a, recommended_id=self.b
+        ).score
+        self.assertAlmostEqual(score, 2 / 6 ** 0.5, places=5)
+        self.build('--top-k=2', '--min-common=2')
+        self.assertEqual(self.recommended(), {
+            self.a: [self.b, self.c], self.b: [self.a], self.c: [self.a],
+        })
+
+    def test_refresh_some_recipes(self):
+        """Only the requested recipes are recomputed."""
+
+        self.build('--min-common=2')
+        Favorite.objects.create(user=self.users[1], recipe_id=self.d)
+        self.build('--min-common=2', f'--recipe={self.d}')
+        self.assertEqual(self.recommended(), {
+            self.a: [self.b, self.c],
+            self.b: [self.a],
+            self.c: [self.a],
+            self.d: [self.a],
+        })
+
+    def test_endpoint(self):
+        """Recommendations are served with a single query."""
+
+        self.build('--min-common=1')
+        url = reverse('recipes-recommendations', args=(self.c,))
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data],
+            [self.a, self.d, self.b],
+        )
+        self.assertEqual(
+            set(response.data[0]), {'id', 'name', 'image', 'cooking_time'}
+        )
+        response = self.client.get(
+            reverse('recipes-recommendations', args=('nope',))
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,121 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import router
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from foodgram.middleware import (PIN_COOKIE, ReplicaRoutingMiddleware,
+                                 check_shared_cache)
+from foodgram.routers import query_metrics, reset_metrics
+from recipes.models import Recipe
+from users.models import User
+
+
+@override_settings(DATABASE_REPLICAS=('replica1',), REPLICA_PIN_SECONDS=60)
+class ReplicaRoutingTests(TestCase):
+    """Reads go to replicas until a client writes something."""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.routed = []
+
+    def route(self, request, write=False):
+        """Pass a request through the middleware, record the read alias."""
+
+        def view(request):
+            if write:
+                router.db_for_write(Recipe)
+            self.routed.append(router.db_for_read(Recipe))
+            return HttpResponse()
+
+        self.response = ReplicaRoutingMiddleware(view)(request)
+        return self.routed[-1]
+
+    def test_reads_and_stickiness(self):
+        """Safe reads use replicas, writers are pinned to the primary."""
+
+        auth = {'HTTP_AUTHORIZATION': 'Token writer'}
+        self.assertEqual(self.route(self.factory.get('/', **auth)), 'replica1')
+        self.assertEqual(self.route(self.factory.post('/', **auth)), 'default')
+        self.assertEqual(
+            self.route(self.factory.get('/', **auth), write=True), 'default'
+        )
+        self.assertEqual(self.route(self.factory.get('/', **auth)), 'default')
+        self.assertEqual(
+            self.route(self.factory.get(
+                '/', HTTP_AUTHORIZATION='Token reader'
+            )),
+            'replica1',
+        )
+        self.assertEqual(router.db_for_read(Recipe), 'default')
+
+    def test_pin_is_seen_by_every_worker(self):
+        """The pin cookie of one worker pins the client in another one."""
+
+        auth = {'HTTP_AUTHORIZATION': 'Token writer'}
+        with mock.patch(
+            'foodgram.middleware.cache', LocMemCache('worker-a', {})
+        ):
+            self.route(self.factory.post('/', **auth), write=True)
+        cookie = self.response.cookies[PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], 60)
+        with mock.patch(
+            'foodgram.middleware.cache', LocMemCache('worker-b', {})
+        ):
+            self.assertEqual(
+                self.route(self.factory.get('/', **auth)), 'replica1'
+            )
+            request = self.factory.get('/', **auth)
+            request.COOKIES[PIN_COOKIE] = cookie.value
+            self.assertEqual(self.route(request), 'default')
+            request = self.factory.get('/', **auth)
+            request.COOKIES[PIN_COOKIE] = '1:forged:signature'
+            self.assertEqual(self.route(request), 'replica1')
+
+    def test_process_local_cache_is_reported(self):
+        """Replicas with a process local cache give a warning."""
+
+        warning, = check_shared_cache(None)
+        self.assertEqual(warning.id, 'foodgram.W001')
+        with override_settings(DATABASE_REPLICAS=()):
+            self.assertEqual(check_shared_cache(None), [])
+
+    @override_settings(DATABASE_REPLICAS=())
+    def test_without_replicas(self):
+        """Everything goes to the primary when there are no replicas."""
+
+        self.assertEqual(self.route(self.factory.get('/')), 'default')
+
+
+class QueryMetricsTests(TestCase):
+    """Queries are counted per database alias."""
+
+    def test_metrics_endpoint(self):
+        """Only admins can see the metrics."""
+
+        reset_metrics()
+        admin = User.objects.create(
+            email='metrics@admin.com', username='metrics', is_staff=True
+        )
+        client = APIClient()
+        client.force_authenticate(admin)
+        url = reverse('metrics-db')
+        response = client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['replicas'], ())
+        response = client.get(reverse('recipes-list'))
+        stats = query_metrics()['default']
+        self.assertGreaterEqual(stats['queries'], 2)
+        self.assertEqual(stats['errors'], 0)
+        self.assertGreater(stats['seconds'], 0)
+        client.force_authenticate(
+            User.objects.create(email='not@admin.com', username='notadmin')
+        )
+        response = client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,102 @@
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from api.serializers import RecipeSerializer
+from recipes.models import (Ingredient, Recipe, RecipeIngredient,
+                            RecipeSignature, SimilarityBucket, Tag)
+from recipes.similarity import nearest, signature
+from users.models import User
+
+
+class SimilarityIndexTests(TestCase):
+    """MinHash signatures and LSH buckets of recipe ingredients."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(email='sim@auth.or', username='sim')
+        cls.tag = Tag.objects.create(name='sim', slug='sim', color='#515151')
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'sim{i}', measurement_unit='g')
+            for i in range(8)
+        ]
+        cls.recipes = [
+            Recipe.objects.create(
+                author=cls.author, name=f'sim{i}', cooking_time=1,
+                image='1.jpg',
+            )
+            for i in range(3)
+        ]
+
+    def set_ingredients(self, recipe, ingredients):
+        serializer = RecipeSerializer(
+            recipe,
+            data={
+                'tags': [self.tag.id],
+                'ingredients': [
+                    {'id': ingredient.id, 'amount': 1}
+                    for ingredient in ingredients
+                ],
+            },
+            partial=True,
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+    def test_signature_estimates_jaccard(self):
+        """Equal positions of signatures estimate the Jaccard index."""
+
+        first, second = signature(range(100)), signature(range(50, 150))
+        self.assertEqual(
+            len(first),
+            settings.SIMILARITY_BANDS * settings.SIMILARITY_BAND_ROWS,
+        )
+        self.assertEqual((first == signature(range(100))).mean(), 1.0)
+        self.assertAlmostEqual((first == second).mean(), 1 / 3, delta=0.15)
+
+    def test_index_follows_ingredients(self):
+        """Creating and changing ingredients keeps the index current."""
+
+        first, second, third = self.recipes
+        self.set_ingredients(first, self.ingredients[:4])
+        self.set_ingredients(second, self.ingredients[:4])
+        self.set_ingredients(third, self.ingredients[4:])
+        self.assertEqual(
+            SimilarityBucket.objects.filter(recipe=first).count(),
+            settings.SIMILARITY_BANDS,
+        )
+        self.assertEqual(nearest(second.id, 10), [(first.id, 1.0)])
+        self.set_ingredients(first, self.ingredients[5:])
+        self.assertEqual(nearest(second.id, 10), [])
+        self.assertEqual(
+            [pk for pk, _ in nearest(third.id, 10)], [first.id]
+        )
+
+    def test_endpoint_and_commands(self):
+        """Similar recipes are served in three queries, rebuilt, measured."""
+
+        for recipe in self.recipes:
+            self.set_ingredients(recipe, self.ingredients[:4])
+        RecipeSignature.objects.all().delete()
+        SimilarityBucket.objects.all().delete()
+        call_command('build_similarity_index', stdout=StringIO())
+        self.assertEqual(
+            SimilarityBucket.objects.count(), 3 * settings.SIMILARITY_BANDS
+        )
+        first, second, third = self.recipes
+        url = reverse('recipes-similar', args=(first.id,))
+        with self.assertNumQueries(3):
+            response = APIClient().get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data], [second.id, third.id]
+        )
+        RecipeIngredient.objects.filter(recipe=third).delete()
+        output = StringIO()
+        call_command('benchmark_similarity', '--top-k=1', stdout=output)
+        self.assertIn('Recall@1: 1.000 over 2 recipes.', output.getvalue())
@@ -0,0 +1,119 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.snapshots import SnapshotLoader, dump, read
+from users.models import User
+
+PRESETS = os.path.join(settings.BASE_DIR, 'fixtures', 'presets.json')
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SnapshotTests(TestCase):
+    """Snapshots are loaded in bulk and merge into existing data."""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_load_presets_twice(self):
+        """Presets load with images, and a second load adds nothing."""
+
+        output = StringIO()
+        call_command(
+            'load_snapshot',
+            PRESETS,
+            media_dir=os.path.join(settings.BASE_DIR, 'fixtures', 'images'),
+            stdout=output,
+        )
+        self.assertEqual(read(PRESETS)['skipped'], {
+            'admin.logentry': 9, 'authtoken.token': 1, 'sessions.session': 2,
+        })
+        self.assertIn(
+            'authtoken.token: 1 objects skipped', output.getvalue()
+        )
+        counts = [
+            model.objects.count()
+            for model in (User, Tag, Ingredient, Recipe, RecipeIngredient)
+        ]
+        recipe = Recipe.objects.get(name='Basic Chicken Roast')
+        self.assertTrue(os.path.isfile(recipe.image.path))
+        self.assertEqual(recipe.pub_date.year, 2023)
+        reports = SnapshotLoader().load(read(PRESETS))
+        self.assertEqual(sum(report.created for report in reports), 0)
+        self.assertEqual(counts, [
+            model.objects.count()
+            for model in (User, Tag, Ingredient, Recipe, RecipeIngredient)
+        ])
+
+    def test_dump_and_merge(self):
+        """A dumped snapshot merges into a database with other ids."""
+
+        user = User.objects.create(email='snap@shot.com', username='snap')
+        ingredient = Ingredient.objects.create(
+            name='unobtainium', measurement_unit='g'
+        )
+        recipe = Recipe.objects.create(
+            author=user, name='Snapshot stew', cooking_time=5, image='1.jpg'
+        )
+        RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=ingredient, amount=3
+        )
+        buffer = io.StringIO()
+        media = dump(buffer)
+        self.assertIn('1.jpg', media)
+        snapshot = json.loads(buffer.getvalue())
+        recipe.delete()
+        ingredient.delete()
+        Ingredient.objects.create(name='placeholder', measurement_unit='g')
+        SnapshotLoader().load(snapshot)
+        merged = Recipe.objects.get(author=user, name='Snapshot stew')
+        self.assertEqual(
+            list(merged.ingredients.values_list('name', flat=True)),
+            ['unobtainium'],
+        )
+        self.assertEqual(User.objects.filter(email=user.email).count(), 1)
+
+    def test_rows_clashing_on_other_fields_are_skipped(self):
+        """A tag taken under another slug is skipped with its links."""
+
+        user = User.objects.create(email='clash@shot.com', username='clash')
+        kept = Tag.objects.create(name='Kept', slug='kept', color='#010')
+        clashing = Tag.objects.create(
+            name='Snap', slug='snap', color='#020'
+        )
+        recipe = Recipe.objects.create(
+            author=user, name='Clash stew', cooking_time=5, image='1.jpg'
+        )
+        recipe.tags.set((kept, clashing))
+        buffer = io.StringIO()
+        dump(buffer)
+        snapshot = json.loads(buffer.getvalue())
+        recipe.delete()
+        clashing.delete()
+        live = Tag.objects.create(name='Live', slug='live', color='#020')
+        reports = {
+            report.label: report
+            for report in SnapshotLoader().load(snapshot)
+        }
+        self.assertEqual(
+            (reports['recipes.tag'].created, reports['recipes.tag'].skipped),
+            (0, 1),
+        )
+        self.assertEqual(reports['recipes.recipe_tags'].skipped, 1)
+        merged = Recipe.objects.get(author=user, name='Clash stew')
+        self.assertEqual(
+            list(merged.tags.values_list('slug', flat=True)), ['kept']
+        )
+        self.assertFalse(live.recipes.exists())
+        self.assertFalse(Tag.objects.filter(slug='snap').exists())
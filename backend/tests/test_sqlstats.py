@@ -0,0 +1,79 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from foodgram import sqlstats
+
+SQL_STATS_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(
+    SQL_STATS_ENABLED=True,
+    SQL_STATS_DIR=SQL_STATS_DIR,
+    SQL_SLOW_MS=0,
+    SQL_EXPLAIN_SAMPLE_RATE=1,
+    SQL_EXPLAIN_IN_BACKGROUND=False,
+)
+class SqlStatsTests(TestCase):
+    """Statements aggregated by fingerprint, slow ones explained."""
+
+    def setUp(self):
+        sqlstats.reset()
+        sqlstats.process_pending()
+
+    def tearDown(self):
+        sqlstats.reset()
+        sqlstats.process_pending()
+        shutil.rmtree(SQL_STATS_DIR, ignore_errors=True)
+
+    def test_fingerprint(self):
+        """Literals, parameters and lists are normalized."""
+
+        self.assertEqual(
+            sqlstats.fingerprint(
+                'SELECT "t"."a1" FROM "t"\n WHERE "t"."id" IN (%s, %s, %s) '
+                "AND \"t\".\"name\" = 'it''s' LIMIT 21"
+            ),
+            'SELECT "t"."a1" FROM "t" WHERE "t"."id" IN (...) '
+            'AND "t"."name" = ? LIMIT ?',
+        )
+        self.assertEqual(
+            sqlstats.fingerprint('INSERT INTO "t" VALUES (%s, %s), (%s, %s)'),
+            sqlstats.fingerprint('INSERT INTO "t" VALUES (%s, %s)'),
+        )
+        self.assertEqual(sqlstats.percentile([3, 1, 2] * 10, 0.95), 3)
+
+    def test_requests_are_aggregated_and_explained(self):
+        """The viewer lists fingerprints and shows their plans."""
+
+        client = APIClient()
+        for limit in (1, 2):
+            client.get(reverse('recipes-list'), {'limit': limit})
+        sqlstats.flush()
+        self.assertGreater(sqlstats.process_pending(), 0)
+        statements = {
+            stats['fingerprint']: stats for stats in sqlstats.load()
+        }
+        count, = [
+            stats for key, stats in statements.items()
+            if key.startswith('SELECT COUNT(*)')
+            and 'FROM "recipes_recipe"' in key
+        ]
+        self.assertEqual(count['count'], 2)
+        self.assertGreaterEqual(count['p95'], 0)
+        output = StringIO()
+        call_command('show_slow_queries', '--sort=count', stdout=output)
+        self.assertIn(f'{count["id"]}*', output.getvalue())
+        output = StringIO()
+        call_command('show_slow_queries', count['id'], stdout=output)
+        self.assertIn('recipes_recipe', output.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('show_slow_queries', 'nope', stdout=StringIO())
+        call_command('show_slow_queries', '--reset', stdout=StringIO())
+        self.assertEqual(sqlstats.load(), [])
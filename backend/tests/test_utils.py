@@ -1,8 +1,17 @@
+import os
+import shutil
+import tempfile
+import zipfile
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
+from api.recipebook import draw_recipe_book, get_recipe_book, prepare_images
 from api.utils import ShoppingCartItem, get_grocery_list
-from recipes.models import Ingredient, Recipe, RecipeIngredient, ShoppingCart
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart)
+from recipes.purge import deactivate_recipe
 
 User = get_user_model()
 
@@ -88,3 +97,106 @@ class TestShoppingList(TestCase):
             ),
             result,
         )
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+IMAGES_DIR = os.path.join(settings.BASE_DIR, 'fixtures', 'images')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class TestRecipeBook(TestCase):
+    """Recipe book rendering and image preparation."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@mail.com', password='pas$W0rd'
+        )
+        os.makedirs(os.path.join(TEMP_MEDIA_ROOT, 'recipes'), exist_ok=True)
+        ingredient = Ingredient.objects.create(
+            name='Chicken', measurement_unit='g.'
+        )
+        for number, name in enumerate(sorted(os.listdir(IMAGES_DIR))[:3]):
+            shutil.copy(
+                os.path.join(IMAGES_DIR, name),
+                os.path.join(TEMP_MEDIA_ROOT, 'recipes', name),
+            )
+            recipe = Recipe.objects.create(
+                author=cls.user,
+                name=f'Recipe {number}',
+                text='Cook it well. ' * 50,
+                cooking_time=number + 1,
+                image=f'recipes/{name}',
+            )
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=100
+            )
+            Favorite.objects.create(user=cls.user, recipe=recipe)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_images_are_downscaled_and_cached(self):
+        """The pool downscales images once and reuses the cache."""
+
+        with self.assertNumQueries(2):
+            entries = get_recipe_book(self.user)
+        paths = [entry.image for entry in entries] + [None, '/no/such.jpg']
+        prepared = prepare_images(paths, workers=2)
+        self.assertEqual(prepared[-2:], [None, None])
+        for path in prepared[:-2]:
+            self.assertTrue(path.endswith('.jpg'))
+            self.assertTrue(os.path.isfile(path))
+        modified = [os.path.getmtime(path) for path in prepared[:-2]]
+        self.assertEqual(prepare_images(paths), prepared)
+        self.assertEqual(
+            modified, [os.path.getmtime(path) for path in prepared[:-2]]
+        )
+
+    def test_draw_recipe_book(self):
+        """The book is written into a file, a page per recipe."""
+
+        entries = get_recipe_book(self.user)
+        self.assertEqual(len(entries), 3)
+        self.assertEqual(
+            entries[0].ingredients,
+            [ShoppingCartItem('Chicken', 'g.', 100)],
+        )
+        path = os.path.join(TEMP_MEDIA_ROOT, 'book.pdf')
+        self.assertEqual(
+            draw_recipe_book(entries, path, workers=2), 'RecipeBook.pdf'
+        )
+        with open(path, 'rb') as ifile:
+            content = ifile.read()
+        self.assertTrue(content.startswith(b'%PDF'))
+        self.assertGreaterEqual(content.count(b'/Type /Page\n'), 3)
+
+    def test_hidden_favorites_are_left_out(self):
+        """Recipes being deleted do not go into the book."""
+
+        recipe = Recipe.objects.filter(favorites__user=self.user).first()
+        deactivate_recipe(recipe)
+        names = [entry.name for entry in get_recipe_book(self.user)]
+        self.assertEqual(len(names), 2)
+        self.assertNotIn(recipe.name, names)
+
+    @override_settings(RECIPE_BOOK_VOLUME_SIZE=2)
+    def test_big_books_are_split_into_volumes(self):
+        """Volumes are rendered in the pool and zipped in order."""
+
+        entries = get_recipe_book(self.user)
+        path = os.path.join(TEMP_MEDIA_ROOT, 'book.zip')
+        filename = draw_recipe_book(entries, path, workers=2)
+        self.assertEqual(filename, 'RecipeBook.zip')
+        with zipfile.ZipFile(path) as archive:
+            self.assertEqual(
+                archive.namelist(),
+                ['RecipeBook-001.pdf', 'RecipeBook-002.pdf'],
+            )
+            pages = [
+                archive.read(name).count(b'/Type /Page\n')
+                for name in archive.namelist()
+            ]
+        self.assertEqual(pages, [2, 1])
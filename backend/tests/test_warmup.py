@@ -0,0 +1,44 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import TestCase
+
+from api.views import TagViewSet
+from foodgram.warmup import memory_usage, warmup
+from recipes.catalogs import cache_key
+from recipes.models import Ingredient, Tag
+
+
+class WarmupTests(TestCase):
+    """Warmup before forking workers."""
+
+    def test_warmup_loads_catalogs(self):
+        """Catalogs are cached by warmup and dropped when they change."""
+
+        tag = Tag.objects.create(name='warm', slug='warm', color='#0ff')
+        self.assertEqual(
+            list(warmup()), ['preimport', 'build_metadata', 'load_catalogs']
+        )
+        self.assertIn('warm', [item['slug'] for item in cache.get(
+            cache_key(Tag)
+        )])
+        self.assertIsNotNone(cache.get(cache_key(Ingredient)))
+        tag.delete()
+        self.assertIsNone(cache.get(cache_key(Tag)))
+        self.assertGreater(memory_usage()['rss'], 0)
+
+    def test_changes_reach_every_worker(self):
+        """A catalog cached before a change elsewhere is not served."""
+
+        tag = Tag.objects.create(name='old', slug='shared', color='#0ff')
+        worker = LocMemCache('catalog-worker', {})
+        with mock.patch('api.views.viewsets.cache', worker):
+            self.assertIn('old', [item['name'] for item in TagViewSet.catalog()])
+        with mock.patch('api.views.viewsets.cache', LocMemCache('other', {})):
+            tag.name = 'new'
+            tag.save()
+        with mock.patch('api.views.viewsets.cache', worker):
+            names = [item['name'] for item in TagViewSet.catalog()]
+        self.assertIn('new', names)
+        self.assertNotIn('old', names)
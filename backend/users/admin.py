@@ -1,41 +1,76 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 
+from foodgram.admin_tools import (BackgroundDeleteMixin, InputFilter,
+                                  LargeTableMixin, LimitedInline)
 from recipes.models import Favorite, ShoppingCart
+from recipes.purge import deactivate_user
 from users.forms import CustomUserChangeForm, CustomUserCreationForm
 from users.models import Subscription, User
 
 
-class SubscriptionInline(admin.TabularInline):
+class UsernameFilter(InputFilter):
+    """Users by the username prefix."""
+
+    title = 'username'
+    parameter_name = 'username'
+    lookup = 'username__istartswith'
+
+
+class EmailFilter(InputFilter):
+    """Users by the exact email."""
+
+    title = 'email'
+    parameter_name = 'email'
+    lookup = 'email'
+
+
+class SubscriberFilter(InputFilter):
+    """Subscriptions by the username prefix of the subscriber."""
+
+    title = 'user'
+    parameter_name = 'user'
+    lookup = 'user__username__istartswith'
+
+
+class AuthorFilter(InputFilter):
+    """Subscriptions by the username prefix of the author."""
+
+    title = 'author'
+    parameter_name = 'author'
+    lookup = 'author__username__istartswith'
+
+
+class SubscriptionInline(LimitedInline):
     """Inline for subscriptions."""
 
     model = Subscription
-    extra = 0
     fk_name = 'user'
+    raw_id_fields = ('author',)
 
 
-class FavoriteInline(admin.TabularInline):
+class FavoriteInline(LimitedInline):
     """Inline for favorites."""
 
     model = Favorite
-    extra = 0
+    raw_id_fields = ('recipe',)
 
 
-class ShoppingCartInline(admin.TabularInline):
+class ShoppingCartInline(LimitedInline):
     """Inline for shopping cart."""
 
     model = ShoppingCart
-    extra = 0
+    raw_id_fields = ('recipe',)
 
 
 @admin.register(User)
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(BackgroundDeleteMixin, LargeTableMixin, UserAdmin):
     """"Admin interface for the custom User."""
 
     add_form = CustomUserCreationForm
     form = CustomUserChangeForm
     list_display_links = ('username',)
-    list_filter = ('email', 'username')
+    list_filter = ('is_active', EmailFilter, UsernameFilter)
     list_display = ('email', 'username', 'is_active')
     list_editable = ('is_active',)
     inlines = (SubscriptionInline, FavoriteInline, ShoppingCartInline)
@@ -44,16 +79,20 @@ class CustomUserAdmin(UserAdmin):
         ('Personal info', {'fields': ('first_name', 'last_name', 'email')}),
         ('Permissions', {'fields': ('is_active', 'is_superuser',)}),
     )
+    deactivate_function = deactivate_user
+    purge_kind = 'purge_user'
 
 
 @admin.register(Subscription)
-class SubscriptionAdmin(admin.ModelAdmin):
+class SubscriptionAdmin(LargeTableMixin, admin.ModelAdmin):
     """Admin interface for subscriptions."""
 
-    list_filter = ('author', 'user')
+    list_filter = (AuthorFilter, SubscriberFilter)
     list_display = (
         'id',
         'user',
         'author',
     )
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
     search_fields = ('author__username', 'user__username')
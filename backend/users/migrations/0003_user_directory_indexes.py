@@ -0,0 +1,39 @@
+# Generated by Django 2.2.16 on 2026-10-19 12:25
+
+from django.db import migrations, models
+
+PREFIX_INDEXED = ('username', 'first_name', 'last_name')
+
+
+def create_prefix_indexes(apps, schema_editor):
+    """Indexes for istartswith, which is UPPER(column) LIKE on PostgreSQL."""
+
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in PREFIX_INDEXED:
+        schema_editor.execute(
+            f'CREATE INDEX user_{field}_upper_idx ON users_user '
+            f'(UPPER({field}::text) text_pattern_ops)'
+        )
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in PREFIX_INDEXED:
+        schema_editor.execute(f'DROP INDEX user_{field}_upper_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_auto_20230210_1840'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['username', 'id'], name='user_username_id_idx'),
+        ),
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-19 13:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_user_recipes_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='relations_modified',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='relations modified'),
+        ),
+    ]
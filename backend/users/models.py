@@ -13,10 +13,22 @@ class User(AbstractUser):
     first_name = models.CharField('first name', max_length=150)
     last_name = models.CharField('last name', max_length=150)
     password = models.CharField('password', max_length=150)
+    recipes_count = models.PositiveIntegerField(
+        'recipes count', default=0, editable=False
+    )
+    modified = models.DateTimeField('modified', auto_now=True)
+    relations_modified = models.DateTimeField(
+        'relations modified', null=True, blank=True, editable=False
+    )
 
     class Meta:
         verbose_name = 'user'
         verbose_name_plural = 'users'
+        indexes = (
+            models.Index(
+                fields=('username', 'id'), name='user_username_id_idx'
+            ),
+        )
 
     def __str__(self) -> str:
         return self.username